@@ -1,8 +1,18 @@
 from aiosocketproto.client import AsyncSocketClient
+from aiosocketproto.client.codec import Codec, register_codec
+from aiosocketproto.client.compression import train_dictionary
+from aiosocketproto.client.metrics import ConnectionMetrics, Instrumentation
+from aiosocketproto.client.pool import AsyncSocketClientPool
+from aiosocketproto.client.rpc import RpcError
+from aiosocketproto.client.schema import register_schema
 from aiosocketproto.client.serializer import SerializerType
 from aiosocketproto.server import AsyncSocketServer
 
 connect = AsyncSocketClient.connect
+connect_unix = AsyncSocketClient.connect_unix
+connect_memory = AsyncSocketClient.connect_memory
 start_server = AsyncSocketServer.start
+start_unix_server = AsyncSocketServer.start_unix
+start_memory_server = AsyncSocketServer.start_memory
 
 __version__ = '0.0.15'
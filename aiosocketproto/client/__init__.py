@@ -1 +1,2 @@
-from .client import AsyncSocketClient
\ No newline at end of file
+from .client import AsyncSocketClient
+from .pool import AsyncSocketClientPool
@@ -0,0 +1,54 @@
+"""
+Pool of reusable receive buffers.
+
+A connection holds a receive buffer only while what it has read is not parsed to the end: the buffer
+goes back to the pool once every complete frame is handed out (small frames are copied out of it).
+Idle connections hold none, and busy ones take turns with the same few buffers instead of each keeping its own.
+"""
+from typing import Dict, List
+
+
+class BufferPool:
+    """ Free buffers of one size, at most `limit` of them are kept """
+
+    size: int
+    limit: int
+    allocated: int # buffers created because none was free
+    reused: int # buffers taken from the pool
+    _free: List[memoryview]
+
+    def __init__(self, size: int, limit: int):
+        self.size = size
+        self.limit = limit
+        self.allocated = 0
+        self.reused = 0
+        self._free = []
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def acquire(self) -> memoryview:
+        if self._free:
+            self.reused += 1
+            return self._free.pop()
+        self.allocated += 1
+        return memoryview(bytearray(self.size))
+
+    def release(self, buffer: memoryview):
+        if len(self._free) < self.limit:
+            self._free.append(buffer)
+
+    def __repr__(self):
+        return f'<BufferPool size={self.size} free={len(self._free)} allocated={self.allocated} reused={self.reused}>'
+
+
+_pools: Dict[int, BufferPool] = {}
+
+
+def get_pool(size: int, limit: int) -> BufferPool:
+    """ Pool of the process for buffers of `size` bytes """
+
+    pool = _pools.get(size)
+    if pool is None:
+        pool = _pools[size] = BufferPool(size, limit)
+    return pool
@@ -1,40 +1,86 @@
 import asyncio
-import logging
-import os
+from typing import Optional
 
+from .log import SessionLogger
 from .methods import Methods
+from .metrics import ConnectionMetrics, Instrumentation
+from .offload import Offload
 from .processor import Processor
+from .protocol import FrameProtocol
+from .resume import Resume
+from .rpc import Rpc
 from .serializer import Serializer
+from .stream import Streams
 
 
-class AsyncSocketClient(Serializer, Processor, Methods):
+class AsyncSocketClient(Serializer, Processor, Methods, Rpc, Streams, Offload, Resume):
     SIGNAL_ACT = -100
     SIGNAL_PING = -200
-    ACT_TIMEOUT = 15
-    PING_INTERVAL = 30
+    SIGNAL_PONG = -201
+    SIGNAL_HELLO = -300
+    SIGNAL_BYE = -400 # the session is closed on purpose, not resumed
+    ACT_TIMEOUT = 15 # seconds to wait for an answer to a ping (or for anything while data frames are in flight) before the peer is lost
+    PING_INTERVAL = 30 # seconds without anything from the peer before it is pinged
 
-    reader: asyncio.StreamReader
-    writer: asyncio.StreamWriter
+    PROTOCOL_VERSION = 1
+    LEGACY = False # no handshake, speak the legacy protocol only (for old peers)
+    HANDSHAKE_TIMEOUT = 1 # seconds a server session waits for the handshake of a silent client before the legacy protocol
+    WINDOW_SIZE = 64 # data frames in flight without acknowledge
+    ACK_DELAY = 0 # seconds to coalesce acknowledges, 0 - acknowledge once the current read is processed
+    ACK_EVERY = 64 # acknowledge at once after this many received frames
+    SEND_QUEUE_SIZE = 1024 # packets queued for sending from which send waits, 0 - no limit
+    SEND_QUEUE_BYTES = 16 * 1024 * 1024 # bytes queued for sending from which send waits, 0 - no limit
+    RECEIVE_QUEUE_SIZE = 1024 # packets not taken by receive from which acknowledges are held back, 0 - no limit
+    RECEIVE_QUEUE_BYTES = 16 * 1024 * 1024 # bytes not taken by receive from which acknowledges are held back, 0 - no limit
+    LOW_WATERMARK = 0.5 # fraction of the limits below which a waiting send or held back acknowledges resume
+    COALESCE_SIZE = 64 # most data frames written together
+    COALESCE_LINGER = 0 # microseconds the sender waits for more packets to write them together, 0 - only the queued ones
+    CODECS = ('binary', 'json') # payload codecs in order of preference
+    ATTACHMENT_SIZE = 64 * 1024 # bytes-like values from this size are sent out of band (binary codec), 0 - never
+    COMPRESSION = () # payload compression algorithms in order of preference: 'zlib', 'lzma', 'bz2'
+    COMPRESSION_THRESHOLD = 512 # payloads from this size are compressed
+    COMPRESSION_LEVEL = None # algorithm default
+    COMPRESSION_DICTIONARY = None # preset zlib dictionary, the same on both peers (see `train_dictionary`)
+    MAX_FRAME_SIZE = 256 * 1024 * 1024 # longest frame accepted from the peer, a longer one aborts the connection
+    STREAM_WINDOW = 256 * 1024 # bytes of a stream the peer may send before the application takes them
+    STREAM_CHUNK_SIZE = 16 * 1024 # largest stream frame, chunks of different streams are interleaved
+    SLOW_CONSUMER_BYTES = 4 * 1024 * 1024 # bytes queued for sending from which published messages are not queued, 0 - no limit
+    SLOW_CONSUMER = 'drop' # published messages over the limit: 'drop' skips them, 'disconnect' closes the session
+    OFFLOAD_THRESHOLD = 0 # message bytes from which encoding and decoding run in an executor, off the event loop, 0 - never
+    OFFLOAD_EXECUTOR = None # 'thread', 'process' or a concurrent.futures executor, None - threads for codecs releasing the GIL, else processes
+    RESUME_TIMEOUT = 0 # seconds a session with a lost connection waits to be resumed on a new one (both peers), 0 - never
+    INSTRUMENTATION: Optional[Instrumentation] = None # hooks of connection events for monitoring
+
+    protocol: FrameProtocol
+    transport: asyncio.Transport
     is_connected: bool
+    session_id: Optional[int] = None # id of a server session in the registry of its server
+
+    logger: SessionLogger
+    metrics: ConnectionMetrics
+
+    def __init__(self, protocol: FrameProtocol, debug_mode: bool = False, **options):
+        self.protocol = protocol
+        self.transport = protocol.transport
 
-    logger: logging.Logger
+        # per connection overrides of the class settings
+        for name, value in self.check_options(options).items():
+            setattr(self, name, value)
+        protocol.max_frame_size = self.MAX_FRAME_SIZE
 
-    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, debug_mode: bool = False):
-        self.reader = reader
-        self.writer = writer
+        self.logger = SessionLogger(debug_mode)
+        self.metrics = ConnectionMetrics(self)
 
-        rand_session_id = os.urandom(2).hex()
-        self.logger = logging.getLogger('{}.{}'.format(__name__, rand_session_id))
-        log_format = '%(asctime)s :: %(levelname)s :: [{}] %(message)s'.format(rand_session_id)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter(log_format)
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        super().__init__()
 
-        if debug_mode:
-            self.logger.setLevel('DEBUG')
-        else:
-            self.logger.setLevel('ERROR')
+    @classmethod
+    def check_options(cls, options: dict) -> dict:
+        """ Map connection options (`window_size=128`) to the class settings they override """
 
-        super().__init__()
\ No newline at end of file
+        settings = {}
+        for name, value in options.items():
+            setting = name.upper()
+            if setting.startswith('_') or setting.startswith('SIGNAL_') or not hasattr(cls, setting):
+                raise ValueError(f'unsupported option: {name}')
+            settings[setting] = value
+        return settings
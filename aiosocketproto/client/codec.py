@@ -0,0 +1,295 @@
+import base64
+import json
+import struct
+from abc import ABC
+from typing import TYPE_CHECKING, Dict, List, Sequence, Type
+
+from .schema import SCHEMAS, SCHEMAS_BY_ID
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+
+class Codec(ABC):
+    """ Converts a message to the packet payload and back, negotiated per connection """
+
+    NAME: str
+    RELEASES_GIL = False # encoding and decoding run mostly without the GIL: large messages are offloaded to threads, not processes
+    client: "AsyncSocketClient"
+
+    def __init__(self, client: "AsyncSocketClient"):
+        self.client = client
+
+    def encode(self, data: dict, attachments: List[memoryview]) -> bytes:
+        """ Return the payload, large binary values may be moved to `attachments` instead """
+        raise NotImplementedError
+
+    def decode(self, payload: memoryview, attachments: Sequence[memoryview]) -> dict:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """ Serialized types as JSON in base64, the legacy protocol payload """
+
+    NAME = 'json'
+
+    def encode(self, data: dict, attachments: List[memoryview]) -> bytes:
+        # serialize
+        data = self.client.serialize(data)
+
+        # convert to JSON object
+        json_data = json.dumps(data)
+
+        # convert to bytes
+        return base64.b64encode(json_data.encode('utf-8'))
+
+    def decode(self, payload: memoryview, attachments: Sequence[memoryview]) -> dict:
+        # read JSON from bytes
+        json_string = base64.b64decode(payload)
+        data = json.loads(json_string)
+
+        # deserialize
+        return self.client.deserialize(data)
+
+
+TAG_NONE = 0x00
+TAG_FALSE = 0x01
+TAG_TRUE = 0x02
+TAG_INT = 0x03 # 8 bytes signed
+TAG_BIG_INT = 0x04 # length + signed bytes
+TAG_FLOAT = 0x05
+TAG_STR = 0x06
+TAG_BYTES = 0x07
+TAG_BYTEARRAY = 0x08
+TAG_LIST = 0x09
+TAG_TUPLE = 0x0A
+TAG_SET = 0x0B
+TAG_DICT = 0x0C
+TAG_CUSTOM = 0x0D # type name + serialized object
+TAG_ATTACHMENT = 0x0E # index of an attachment, sent after the payload as is
+TAG_SCHEMA = 0x0F # schema id + packed fields + other fields (see `register_schema`)
+
+TAG_LENGTH = struct.Struct('!BI')
+TAG_INT64 = struct.Struct('!Bq')
+TAG_FLOAT64 = struct.Struct('!Bd')
+TAG_INDEX = struct.Struct('!BI')
+LENGTH = struct.Struct('!I')
+INT64 = struct.Struct('!q')
+FLOAT64 = struct.Struct('!d')
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# subclasses of builtin types without own serializer are sent as the builtin type
+BUILTIN_TYPES = (bool, int, float, str, bytes, bytearray, dict, list, tuple, set)
+
+MALFORMED = 'malformed binary payload'
+
+
+class BinaryCodec(Codec):
+    """
+    Compact tagged binary encoding.
+    Every value is a tag byte followed by a fixed size value, or by a length and the content.
+    Bytes are written as is, without hex or base64.
+    Bytes-like values from ATTACHMENT_SIZE are not copied into the payload at all,
+    they are sent as attachments and received as memoryviews into the receive buffer.
+    """
+
+    NAME = 'binary'
+
+    def encode(self, data: dict, attachments: List[memoryview]) -> bytes:
+        buffer = bytearray()
+        self._encode(data, buffer, attachments)
+        return bytes(buffer)
+
+    def decode(self, payload: memoryview, attachments: Sequence[memoryview]) -> dict:
+        payload = memoryview(payload)
+        try:
+            data, end = self._decode(payload, 0, attachments)
+        except (IndexError, struct.error, RecursionError):
+            # a value is cut off, or nested too deep
+            raise ValueError(MALFORMED) from None
+        if end != len(payload):
+            raise ValueError(MALFORMED)
+        return data
+
+    def _encode(self, value: any, buffer: bytearray, attachments: List[memoryview]):
+        value_type = type(value)
+
+        if value is None:
+            buffer.append(TAG_NONE)
+
+        elif value_type is bool:
+            buffer.append(TAG_TRUE if value else TAG_FALSE)
+
+        elif value_type is int:
+            if INT64_MIN <= value <= INT64_MAX:
+                buffer += TAG_INT64.pack(TAG_INT, value)
+            else:
+                length = (value.bit_length() + 8) // 8
+                buffer += TAG_LENGTH.pack(TAG_BIG_INT, length)
+                buffer += value.to_bytes(length, 'big', signed=True)
+
+        elif value_type is float:
+            buffer += TAG_FLOAT64.pack(TAG_FLOAT, value)
+
+        elif value_type is str:
+            encoded = value.encode('utf-8')
+            buffer += TAG_LENGTH.pack(TAG_STR, len(encoded))
+            buffer += encoded
+
+        elif value_type is bytes or value_type is bytearray or value_type is memoryview:
+            view = memoryview(value)
+            if view.format != 'B' or view.ndim != 1:
+                view = view.cast('B')
+
+            # large binary goes out of band
+            if self.client.ATTACHMENT_SIZE and view.nbytes >= self.client.ATTACHMENT_SIZE:
+                buffer += TAG_INDEX.pack(TAG_ATTACHMENT, len(attachments))
+                attachments.append(view)
+            else:
+                buffer += TAG_LENGTH.pack(TAG_BYTEARRAY if value_type is bytearray else TAG_BYTES, view.nbytes)
+                buffer += view
+
+        elif value_type is dict:
+            buffer += TAG_LENGTH.pack(TAG_DICT, len(value))
+            for name, item in value.items():
+                self._encode(name, buffer, attachments)
+                self._encode(item, buffer, attachments)
+
+        elif value_type is list or value_type is tuple or value_type is set:
+            tag = TAG_LIST if value_type is list else TAG_TUPLE if value_type is tuple else TAG_SET
+            buffer += TAG_LENGTH.pack(tag, len(value))
+            for item in value:
+                self._encode(item, buffer, attachments)
+
+        else:
+            schema = SCHEMAS.get(value_type)
+            if schema is not None:
+                self.client._check_schema(schema)
+                buffer += schema.pack(TAG_SCHEMA, value)
+                for item in schema.other_values(value):
+                    self._encode(item, buffer, attachments)
+                return
+
+            custom = self.client._custom_type(value_type)
+
+            if not custom:
+                for builtin_type in BUILTIN_TYPES:
+                    if isinstance(value, builtin_type):
+                        return self._encode(builtin_type(value), buffer, attachments)
+                raise ValueError(f'unsupported data type: {self.client.get_data_type_str(value_type)}')
+
+            data_type, serializer = custom
+            encoded_type = data_type.encode('utf-8')
+            buffer += TAG_LENGTH.pack(TAG_CUSTOM, len(encoded_type))
+            buffer += encoded_type
+            self._encode(serializer.serialize(value), buffer, attachments)
+
+    def _decode(self, payload: memoryview, offset: int, attachments: Sequence[memoryview]) -> (any, int):
+        tag = payload[offset]
+        offset += 1
+
+        # the most frequent scalars first
+        if tag == TAG_STR:
+            end = offset + LENGTH.size + LENGTH.unpack_from(payload, offset)[0]
+            if end > len(payload):
+                raise ValueError(MALFORMED)
+            return str(payload[offset + LENGTH.size:end], 'utf-8'), end
+
+        elif tag == TAG_INT:
+            return INT64.unpack_from(payload, offset)[0], offset + INT64.size
+
+        elif tag == TAG_NONE:
+            return None, offset
+
+        elif tag == TAG_FALSE or tag == TAG_TRUE:
+            return tag == TAG_TRUE, offset
+
+        elif tag == TAG_FLOAT:
+            return FLOAT64.unpack_from(payload, offset)[0], offset + FLOAT64.size
+
+        length = LENGTH.unpack_from(payload, offset)[0]
+        offset += LENGTH.size
+        decode = self._decode
+
+        if tag == TAG_DICT:
+            data = {}
+            for _ in range(length):
+                # keys are strings almost always
+                if payload[offset] == TAG_STR:
+                    end = offset + 1 + LENGTH.size + LENGTH.unpack_from(payload, offset + 1)[0]
+                    if end > len(payload):
+                        raise ValueError(MALFORMED)
+                    name = str(payload[offset + 1 + LENGTH.size:end], 'utf-8')
+                    offset = end
+                else:
+                    name, offset = decode(payload, offset, attachments)
+                data[name], offset = decode(payload, offset, attachments)
+            return data, offset
+
+        elif tag == TAG_LIST or tag == TAG_TUPLE or tag == TAG_SET:
+            items = []
+            append = items.append
+            for _ in range(length):
+                item, offset = decode(payload, offset, attachments)
+                append(item)
+            if tag == TAG_TUPLE:
+                return tuple(items), offset
+            elif tag == TAG_SET:
+                return set(items), offset
+            return items, offset
+
+        elif tag == TAG_SCHEMA:
+            schema = SCHEMAS_BY_ID.get(length)
+            if schema is None:
+                raise ValueError(f'unknown schema: {length:08x}')
+            packed, offset = schema.unpack(payload, offset)
+            other = []
+            for _ in schema.other:
+                item, offset = decode(payload, offset, attachments)
+                other.append(item)
+            return schema.build(packed, other), offset
+
+        elif tag == TAG_ATTACHMENT:
+            if length >= len(attachments):
+                raise ValueError(MALFORMED)
+            return attachments[length], offset
+
+        # the other values are followed by `length` bytes
+        if offset + length > len(payload):
+            raise ValueError(MALFORMED)
+
+        if tag == TAG_BYTES:
+            return payload[offset:offset + length].tobytes(), offset + length
+
+        elif tag == TAG_BYTEARRAY:
+            return bytearray(payload[offset:offset + length]), offset + length
+
+        elif tag == TAG_BIG_INT:
+            return int.from_bytes(payload[offset:offset + length], 'big', signed=True), offset + length
+
+        elif tag == TAG_CUSTOM:
+            data_type = str(payload[offset:offset + length], 'utf-8')
+            deserializer = self.client._deserializers.get(data_type)
+            if not deserializer:
+                raise ValueError(f'unsupported data type: {data_type}')
+            serialized_object, offset = decode(payload, offset + length, attachments)
+            return deserializer(serialized_object), offset
+
+        else:
+            raise ValueError(f'unsupported binary tag: {tag}')
+
+
+REGISTRY: Dict[str, Type[Codec]] = {
+    JsonCodec.NAME: JsonCodec,
+    BinaryCodec.NAME: BinaryCodec,
+}
+
+
+def register_codec(codec: Type[Codec]):
+    """ Make a codec available for negotiation (list its NAME in the `codecs` option to prefer it) """
+
+    if not issubclass(codec, Codec):
+        raise ValueError('Unsupported codec type')
+    REGISTRY[codec.NAME] = codec
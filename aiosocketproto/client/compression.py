@@ -0,0 +1,165 @@
+import bz2
+import lzma
+import zlib
+from abc import ABC
+from collections import Counter
+from typing import Dict, Iterable, Optional, Type
+
+from .frame import FLAG_COMPRESSED, MAX_FRAME_LENGTH
+
+
+class Compression(ABC):
+    """ Payload compression algorithm, negotiated per connection """
+
+    NAME: str
+
+    def __init__(self, level: Optional[int] = None, dictionary: Optional[bytes] = None, max_size: int = MAX_FRAME_LENGTH):
+        self.level = level
+        self.dictionary = dictionary
+        self.max_size = max_size # longest decompressed payload, a few compressed bytes may expand to gigabytes
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        """ Decompressing stops past `max_size` bytes, a longer payload raises ValueError """
+
+        decompressed = self._decompress(data, self.max_size + 1)
+        if len(decompressed) > self.max_size:
+            raise ValueError(f'decompressed payload is over the limit of {self.max_size} bytes')
+        return decompressed
+
+    def _decompress(self, data: bytes, max_length: int) -> bytes:
+        """ Up to `max_length` bytes of the decompressed data """
+        raise NotImplementedError
+
+
+class ZlibCompression(Compression):
+    """ Deflate, the only algorithm which supports a preset dictionary """
+
+    NAME = 'zlib'
+
+    def compress(self, data: bytes) -> bytes:
+        level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+        if self.dictionary:
+            compressor = zlib.compressobj(level, zdict=self.dictionary)
+            return compressor.compress(data) + compressor.flush()
+        return zlib.compress(data, level)
+
+    def _decompress(self, data: bytes, max_length: int) -> bytes:
+        decompressor = zlib.decompressobj(zdict=self.dictionary) if self.dictionary else zlib.decompressobj()
+        decompressed = decompressor.decompress(data, max_length)
+        if decompressor.unconsumed_tail:
+            return decompressed
+        return decompressed + decompressor.flush()
+
+
+class LzmaCompression(Compression):
+    NAME = 'lzma'
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.level)
+
+    def _decompress(self, data: bytes, max_length: int) -> bytes:
+        return lzma.LZMADecompressor().decompress(data, max_length)
+
+
+class Bz2Compression(Compression):
+    NAME = 'bz2'
+
+    def compress(self, data: bytes) -> bytes:
+        return bz2.compress(data, 9 if self.level is None else self.level)
+
+    def _decompress(self, data: bytes, max_length: int) -> bytes:
+        return bz2.BZ2Decompressor().decompress(data, max_length)
+
+
+ALGORITHMS: Dict[str, Type[Compression]] = {
+    ZlibCompression.NAME: ZlibCompression,
+    LzmaCompression.NAME: LzmaCompression,
+    Bz2Compression.NAME: Bz2Compression,
+}
+
+
+class CompressionStats:
+    """ Compression counters of a connection """
+
+    compressed_frames: int
+    skipped_frames: int # below threshold or not compressible
+    original_bytes: int # payload bytes of compressed frames before compression
+    compressed_bytes: int
+    compress_seconds: float
+    decompressed_frames: int
+    decompress_seconds: float
+
+    def __init__(self):
+        self.compressed_frames = 0
+        self.skipped_frames = 0
+        self.original_bytes = 0
+        self.compressed_bytes = 0
+        self.compress_seconds = 0.
+        self.decompressed_frames = 0
+        self.decompress_seconds = 0.
+
+    def count(self, original: int, size: int, flags: int, seconds: float):
+        """ Count a payload of `original` bytes sent as `size` bytes """
+
+        self.compress_seconds += seconds
+        if not flags & FLAG_COMPRESSED:
+            self.skipped_frames += 1
+            return
+        self.compressed_frames += 1
+        self.original_bytes += original
+        self.compressed_bytes += size
+
+    @property
+    def ratio(self) -> float:
+        """ Compressed size to original size of the compressed frames """
+        return self.compressed_bytes / self.original_bytes if self.original_bytes else 1.
+
+    def __repr__(self):
+        return (
+            f'<CompressionStats compressed={self.compressed_frames} skipped={self.skipped_frames}'
+            f' ratio={self.ratio:.3f} compress={self.compress_seconds:.3f}s decompress={self.decompress_seconds:.3f}s>'
+        )
+
+
+def compress(compression: Compression, threshold: int, payload: bytes) -> (bytes, int):
+    """ Compress payload from the threshold size, return payload and frame flags """
+
+    if len(payload) < threshold:
+        return payload, 0
+    compressed = compression.compress(payload)
+
+    # not compressible
+    if len(compressed) >= len(payload):
+        return payload, 0
+    return compressed, FLAG_COMPRESSED
+
+
+def dictionary_id(dictionary: Optional[bytes]) -> Optional[int]:
+    """ Identifier of a dictionary exchanged in the handshake """
+    return zlib.adler32(dictionary) if dictionary else None
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 32 * 1024, fragment: int = 16) -> bytes:
+    """
+    Build a preset zlib dictionary from sample payloads (example: `client.codec.encode(message, [])`).
+    The fragments found in most samples are kept, the most frequent ones at the end
+    of the dictionary, where deflate reaches them with the shortest distances.
+    """
+
+    counter = Counter()
+    for sample in samples:
+        sample = bytes(sample)
+        counter.update({sample[offset:offset + fragment] for offset in range(0, max(len(sample) - fragment, 0) + 1)})
+
+    dictionary = []
+    length = 0
+    for chunk, count in counter.most_common():
+        if count < 2 or length + len(chunk) > size:
+            break
+        dictionary.append(chunk)
+        length += len(chunk)
+
+    return b''.join(reversed(dictionary))
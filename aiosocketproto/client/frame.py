@@ -0,0 +1,92 @@
+"""
+Wire format.
+
+Every frame starts with a signed 4-byte length, negative values are signals.
+Legacy data frames carry base64 text, so their first byte is never below `LEGACY_FRAME_MIN`.
+Frames of the current protocol start with a header whose first byte is the frame kind.
+"""
+import struct
+from typing import List, Sequence, Tuple
+
+LEGACY_FRAME_MIN = 0x2B # lowest byte of the base64 alphabet ('+')
+
+FRAME_LENGTH = struct.Struct('!i')
+MAX_FRAME_LENGTH = 2 ** 31 - 1
+FRAME_HEADER = struct.Struct('!BBI') # kind, flags, sequence
+FRAME_HEAD = struct.Struct('!iBBI') # length and header, packed at once
+ACK_FRAME = struct.Struct('!iBBI') # length, kind, flags, sequence
+CREDIT = struct.Struct('!I') # bytes granted, body of a credit frame
+CALL_ID = struct.Struct('!Q') # leads the payload of call, result and error frames, ahead of the encoded message
+CREDIT_FRAME = struct.Struct('!iBBII') # length, kind, flags, stream, bytes
+
+KIND_DATA = 0x01 # application packet, acknowledged cumulatively by sequence
+KIND_ACK = 0x02 # acknowledges all sequenced frames up to the sequence
+KIND_CALL = 0x03 # remote procedure call
+KIND_RESULT = 0x04 # result of a call
+KIND_ERROR = 0x05 # exception raised by a call
+KIND_STREAM_OPEN = 0x06 # opens the stream with id in the sequence field, payload is its name
+KIND_STREAM = 0x07 # chunk of a stream message, stream id in the sequence field
+KIND_CREDIT = 0x08 # grants bytes to the sender of the stream with id in the sequence field
+
+# frames numbered in one sequence and acknowledged
+SEQUENCED_KINDS = frozenset((KIND_DATA, KIND_CALL, KIND_RESULT, KIND_ERROR))
+
+# frames of multiplexed streams, flow controlled by credit instead of acknowledges
+STREAM_KINDS = frozenset((KIND_STREAM_OPEN, KIND_STREAM, KIND_CREDIT))
+
+# Data frame flags
+FLAG_ATTACHMENTS = 0x01 # header is followed by attachments table, attachments follow the payload
+FLAG_COMPRESSED = 0x02 # payload is compressed with the negotiated algorithm, attachments are not
+
+# Stream frame flags, data frame flags apply to the whole message
+FLAG_END = 0x04 # last chunk of a message
+FLAG_CLOSE = 0x08 # no more messages on the stream from the sender
+FLAG_RESET = 0x10 # with FLAG_CLOSE: the sender failed, the data is incomplete
+FLAG_RAW = 0x20 # stream open: the stream carries chunks of bytes instead of messages
+
+ATTACHMENTS_COUNT = struct.Struct('!H')
+ATTACHMENT_LENGTH = struct.Struct('!I')
+
+SEQUENCE_MODULO = 2 ** 32
+
+
+def is_legacy_frame(frame: memoryview) -> bool:
+    return not frame or frame[0] >= LEGACY_FRAME_MIN
+
+
+def next_sequence(sequence: int) -> int:
+    return (sequence + 1) % SEQUENCE_MODULO
+
+
+def sequence_reached(sequence: int, acknowledged: int) -> bool:
+    """ Whether `sequence` is covered by a cumulative acknowledge of `acknowledged` """
+    return (acknowledged - sequence) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2
+
+
+def pack_frame(kind: int, flags: int, sequence: int, payload: bytes) -> bytes:
+    return FRAME_HEAD.pack(FRAME_HEADER.size + len(payload), kind, flags, sequence) + payload
+
+
+def pack_attachments_table(attachments: Sequence[memoryview]) -> bytes:
+    return struct.pack(f'!H{len(attachments)}I', len(attachments), *(attachment.nbytes for attachment in attachments))
+
+
+def split_attachments(body: memoryview) -> Tuple[memoryview, List[memoryview]]:
+    """ Split a data frame body (after the header) to payload and views of its attachments """
+
+    if len(body) < ATTACHMENTS_COUNT.size:
+        raise ConnectionError('malformed attachments table')
+    count = ATTACHMENTS_COUNT.unpack_from(body)[0]
+    offset = ATTACHMENTS_COUNT.size + ATTACHMENT_LENGTH.size * count
+    if offset > len(body):
+        raise ConnectionError('malformed attachments table')
+    lengths = struct.unpack_from(f'!{count}I', body, ATTACHMENTS_COUNT.size)
+    payload_end = end = len(body) - sum(lengths)
+    if payload_end < offset:
+        raise ConnectionError('malformed attachments table')
+
+    attachments = []
+    for length in lengths:
+        attachments.append(body[end:end + length])
+        end += length
+    return body[offset:payload_end], attachments
@@ -0,0 +1,49 @@
+import itertools
+import logging
+from typing import Optional
+
+# one logger for the library, configure it as any other: `logging.getLogger('aiosocketproto')`
+logger = logging.getLogger('aiosocketproto')
+
+# sessions in `debug_mode` log at every level, their messages go to the handlers of the library logger
+debug_logger = logger.getChild('debug')
+debug_logger.setLevel(logging.DEBUG)
+
+_session_numbers = itertools.count(1)
+_debug_handler: Optional[logging.Handler] = None
+
+
+class SessionLogger(logging.LoggerAdapter):
+    """
+    The library logger with the session in every message.
+    Messages below the level of the session are dropped before they are formatted:
+    pass arguments instead of f-strings (`logger.debug('frame %d', sequence)`).
+    """
+
+    def __init__(self, debug_mode: bool = False):
+        super().__init__(debug_logger if debug_mode else logger, {'session': next(_session_numbers)})
+        self.session_level = logging.DEBUG if debug_mode else logging.ERROR
+        if debug_mode:
+            _install_debug_handler()
+
+    def isEnabledFor(self, level: int) -> bool:
+        # the level of the library logger counts once the application sets it
+        return level >= self.session_level or bool(self.logger.level) and self.logger.isEnabledFor(level)
+
+    def log(self, level: int, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            self.logger.log(level, msg, *args, **kwargs)
+
+    def process(self, msg, kwargs):
+        return f'[{self.extra["session"]:x}] {msg}', kwargs
+
+
+def _install_debug_handler():
+    """ Output of `debug_mode` sessions, added once """
+
+    global _debug_handler
+    if _debug_handler is None:
+        _debug_handler = logging.StreamHandler()
+        _debug_handler.setFormatter(logging.Formatter('%(asctime)s :: %(levelname)s :: %(message)s'))
+        logger.addHandler(_debug_handler)
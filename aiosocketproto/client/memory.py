@@ -0,0 +1,243 @@
+"""
+In-memory transport for peers in the same process and event loop.
+
+A pair of transports hands written bytes to the protocol of the other side from the event loop,
+with the flow control, EOF and close semantics of a stream socket, without a socket or a system call.
+Servers are registered by name in the process: `create_memory_server(factory, name)`
+is reached with `create_memory_connection(factory, name)`, like `loop.create_server` and
+`loop.create_connection`.
+"""
+import asyncio
+from asyncio import constants, transports
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+DELIVERY_SIZE = 1024 * 1024 # bytes handed to a protocol in one callback, the rest after other callbacks
+
+_servers: Dict[str, "MemoryServer"] = {}
+
+
+class MemoryTransport(transports._FlowControlMixin):
+    """ One side of an in-memory connection, its write buffer is the unread data of the peer """
+
+    _sendfile_compatible = constants._SendfileMode.FALLBACK # `loop.sendfile` reads the file and writes it
+
+    _protocol: asyncio.BaseProtocol
+    _peer: Optional["MemoryTransport"]
+    _incoming: Deque[memoryview] # written by the peer, not given to the protocol yet
+    _incoming_size: int
+    _offset: int # consumed part of the first incoming chunk
+    _reading: bool
+    _delivering: bool # delivery is scheduled
+    _eof: bool # the peer closed its side
+    _closing: bool
+    _lost: bool # connection_lost is called
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, protocol: asyncio.BaseProtocol, name: str):
+        super().__init__({'peername': name, 'sockname': name}, loop)
+        self._protocol = protocol
+        self._peer = None
+        self._incoming = deque()
+        self._incoming_size = 0
+        self._offset = 0
+        self._reading = True
+        self._delivering = False
+        self._eof = False
+        self._closing = False
+        self._lost = False
+
+    def get_protocol(self) -> asyncio.BaseProtocol:
+        return self._protocol
+
+    def set_protocol(self, protocol: asyncio.BaseProtocol):
+        self._protocol = protocol
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def is_reading(self) -> bool:
+        return self._reading and not self._closing
+
+    def pause_reading(self):
+        self._reading = False
+
+    def resume_reading(self):
+        if not self._reading:
+            self._reading = True
+            self._schedule_delivery()
+
+    def get_write_buffer_size(self) -> int:
+        return self._peer._incoming_size if self._peer is not None else 0
+
+    def write(self, data):
+        # like a socket, writes after either side closed are lost
+        if self._closing or self._peer is None or self._peer._closing or not data:
+            return
+
+        # bytes are immutable, other buffers may be reused by the writer
+        chunk = memoryview(data if isinstance(data, bytes) else bytes(data)).cast('B')
+        peer = self._peer
+        peer._incoming.append(chunk)
+        peer._incoming_size += len(chunk)
+        peer._schedule_delivery()
+        self._maybe_pause_protocol()
+
+    def writelines(self, list_of_data):
+        for data in list_of_data:
+            self.write(data)
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def close(self):
+        """ The peer gets what is written, then EOF """
+
+        if self._closing:
+            return
+        self._closing = True
+        peer, self._peer = self._peer, None
+        if peer is not None:
+            peer._eof = True
+            peer._schedule_delivery()
+        self._loop.call_soon(self._connection_lost, None)
+
+    def abort(self):
+        """ Unread data is dropped, the peer gets a connection reset """
+
+        if self._closing:
+            return
+        self._closing = True
+        peer, self._peer = self._peer, None
+        self._incoming.clear()
+        if peer is not None and not peer._closing:
+            peer._closing = True
+            peer._peer = None
+            peer._incoming.clear()
+            self._loop.call_soon(peer._connection_lost, ConnectionResetError('connection reset by peer'))
+        self._loop.call_soon(self._connection_lost, None)
+
+    def _schedule_delivery(self):
+        if not self._delivering and self._reading and not self._lost:
+            self._delivering = True
+            self._loop.call_soon(self._deliver)
+
+    def _deliver(self):
+        self._delivering = False
+        protocol = self._protocol
+        budget = DELIVERY_SIZE
+        consumed = 0
+        try:
+            while self._incoming and self._reading and not self._lost and consumed < budget:
+                chunk = self._incoming[0]
+                if isinstance(protocol, asyncio.BufferedProtocol):
+                    remaining = len(chunk) - self._offset
+                    buffer = protocol.get_buffer(remaining)
+                    size = min(len(buffer), remaining)
+                    buffer[:size] = chunk[self._offset:self._offset + size]
+                else:
+                    size = len(chunk) - self._offset
+                    buffer = bytes(chunk[self._offset:])
+
+                self._offset += size
+                if self._offset == len(chunk):
+                    self._incoming.popleft()
+                    self._offset = 0
+                self._incoming_size -= size
+                consumed += size
+
+                if isinstance(protocol, asyncio.BufferedProtocol):
+                    protocol.buffer_updated(size)
+                else:
+                    protocol.data_received(buffer)
+        finally:
+            if self._peer is not None and not self._peer._lost:
+                self._peer._maybe_resume_protocol()
+
+        if self._incoming and self._reading:
+            self._schedule_delivery()
+        elif not self._incoming and self._eof and not self._closing:
+            if not protocol.eof_received():
+                self.close()
+
+    def _connection_lost(self, exc: Optional[BaseException]):
+        if self._lost:
+            return
+        self._lost = True
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            self._protocol = None
+
+
+class MemoryServer(asyncio.AbstractServer):
+    """ Accepts in-memory connections by name until closed """
+
+    name: str
+    _protocol_factory: Callable[[], asyncio.BaseProtocol]
+    _loop: asyncio.AbstractEventLoop
+    _closed: asyncio.Event
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, protocol_factory: Callable[[], asyncio.BaseProtocol], name: str):
+        self.name = name
+        self._protocol_factory = protocol_factory
+        self._loop = loop
+        self._closed = asyncio.Event()
+
+    @property
+    def sockets(self) -> tuple:
+        return ()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def is_serving(self) -> bool:
+        return _servers.get(self.name) is self
+
+    def close(self):
+        """ Stop accepting, connections are not closed """
+
+        if self.is_serving():
+            del _servers[self.name]
+        self._closed.set()
+
+    async def start_serving(self):
+        pass
+
+    async def serve_forever(self):
+        await self._closed.wait()
+
+    async def wait_closed(self):
+        await self._closed.wait()
+
+    def _connect(self, protocol: asyncio.BaseProtocol, name: str) -> MemoryTransport:
+        server_protocol = self._protocol_factory()
+        client = MemoryTransport(self._loop, protocol, self.name)
+        server = MemoryTransport(self._loop, server_protocol, name)
+        client._peer, server._peer = server, client
+
+        protocol.connection_made(client)
+        server_protocol.connection_made(server)
+        return client
+
+
+async def create_memory_server(protocol_factory: Callable[[], asyncio.BaseProtocol], name: str) -> MemoryServer:
+    """ Accept in-memory connections to `name` in this process """
+
+    if name in _servers:
+        raise OSError(f'in-memory server {name!r} already exists')
+    server = _servers[name] = MemoryServer(asyncio.get_running_loop(), protocol_factory, name)
+    return server
+
+
+async def create_memory_connection(
+    protocol_factory: Callable[[], asyncio.BaseProtocol], name: str
+) -> (MemoryTransport, asyncio.BaseProtocol):
+    """ Connect to the in-memory server `name` of this process and event loop """
+
+    server = _servers.get(name)
+    if server is None or server.get_loop() is not asyncio.get_running_loop():
+        raise ConnectionRefusedError(f'no in-memory server {name!r}')
+
+    protocol = protocol_factory()
+    transport = server._connect(protocol, f'{name}-client')
+    return transport, protocol
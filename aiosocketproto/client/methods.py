@@ -1,36 +1,94 @@
 import asyncio
-import base64
-import json
-import struct
+import functools
+import inspect
 from abc import ABC
-from typing import TYPE_CHECKING, Type, Dict
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Type
 
+from .memory import create_memory_connection
+from .protocol import FrameProtocol, unix_address
 from .send_packet import SendPacket
 from .serializer import SerializerType
 
 if TYPE_CHECKING:
     from .client import AsyncSocketClient
+    from ..server.broker import Broker
 
 
 class Methods(ABC):
     custom_serializers: Dict[str, Type[SerializerType]]
+    subscriptions: Set[str] # topics published by the server to this session
+    broker: Optional["Broker"] # publisher of a server session
+    _dispatcher: Optional[asyncio.Task] # calls the message handler of `on_message`
 
     def __init__(self):
         super().__init__()
         self.custom_serializers = {}
+        self.subscriptions = set()
+        self.broker = None
+        self._dispatcher = None
 
     @classmethod
-    async def connect(cls: Type["AsyncSocketClient"], host: str, port: int, debug_mode: bool = False):
-        """ Connect to a server and Create socket client instance """
+    async def connect(cls: Type["AsyncSocketClient"], host: str, port: int, debug_mode: bool = False, **options):
+        """
+        Connect to a server and Create socket client instance.
+        Options override class settings for this connection (example: `window_size=128`, `legacy=True`).
+        """
 
-        reader, writer = await asyncio.open_connection(host, port)
-        session = cls(reader, writer, debug_mode=debug_mode)
-        await session._keep_alive()
+        cls.check_options(options)
+        connect = functools.partial(asyncio.get_running_loop().create_connection, FrameProtocol, host, port)
+        return await cls._start(connect, debug_mode, options)
+
+    @classmethod
+    async def connect_unix(cls: Type["AsyncSocketClient"], path: str, debug_mode: bool = False, **options):
+        """
+        Connect to a server on a Unix domain socket, options as for `connect`.
+        A path starting with '@' (or a NUL byte) is in the abstract namespace of Linux.
+        """
+
+        cls.check_options(options)
+        connect = functools.partial(asyncio.get_running_loop().create_unix_connection, FrameProtocol, unix_address(path))
+        return await cls._start(connect, debug_mode, options)
+
+    @classmethod
+    async def connect_memory(cls: Type["AsyncSocketClient"], name: str, debug_mode: bool = False, **options):
+        """ Connect to an in-memory server of this process by name, options as for `connect` """
+
+        cls.check_options(options)
+        return await cls._start(functools.partial(create_memory_connection, FrameProtocol, name), debug_mode, options)
+
+    @classmethod
+    async def _start(cls: Type["AsyncSocketClient"], connect: Callable[[], Awaitable[tuple]], debug_mode: bool, options: dict):
+        """ Session of a new connection, the same on every transport, `connect` is kept to resume it """
+
+        _, protocol = await connect()
+        session = cls(protocol, debug_mode=debug_mode, **options)
+        session._connector = connect
+        session._keep_alive()
+        if not session.LEGACY:
+            await session._handshake()
+        if session.INSTRUMENTATION is not None:
+            session.INSTRUMENTATION.connected(session)
         return session
 
     @property
     def is_connected(self: "AsyncSocketClient") -> bool:
-        return self._keep_alive_task and not self._keep_alive_task.done() and not self.reader.at_eof()
+        return self._keep_alive_task and not self._keep_alive_task.done() and not self.protocol.is_closed
+
+    def subscribe(self: "AsyncSocketClient", topic: str):
+        """ Receive what the server publishes to the topic (sessions of a server only) """
+
+        if self.broker is None:
+            raise RuntimeError('topics are published to server sessions only')
+        self.broker.subscribe(self, topic)
+
+    def unsubscribe(self: "AsyncSocketClient", topic: str):
+        if self.broker is not None:
+            self.broker.unsubscribe(self, topic)
+
+    @property
+    def unacknowledged(self: "AsyncSocketClient") -> int:
+        """ Packets queued for sending or sent and not acknowledged yet """
+        return self._in_flight + self._queue_send.qsize()
 
     def add_serializer(self: "AsyncSocketClient", serializer: Type[SerializerType]):
         if not issubclass(serializer, SerializerType):
@@ -38,59 +96,158 @@ class Methods(ABC):
         data_type = self.get_data_type_str(serializer.INSTANCE)
         serializer.default = self
         self.custom_serializers[data_type] = serializer
+        self._reset_dispatch()
 
     async def send(self: "AsyncSocketClient", **data):
         """ Serialize and put Packet to send queue """
 
-        # serialize
-        data = self.serialize(data)
-
-        # convert to JSON object
-        json_data = json.dumps(data)
+        # wait for room in the queue before the packet gets its sequence
+        await self._wait_send_queue()
 
-        # convert to bytes
-        encoded_json_data = base64.b64encode(json_data.encode('utf-8'))
-
-        # Send JSON response
-        packet_length = struct.pack("!i", len(encoded_json_data))
-
-        # put to queue
-        packet = SendPacket(packet_length + encoded_json_data)
-        await self._queue_send.put(packet)
+        # encode, frame and put to queue
+        if self.OFFLOAD_THRESHOLD:
+            packet = await self._offload_send(data)
+        else:
+            packet = self._encode_packet(data)
+            self._enqueue(packet)
 
         # waiting for execute
-        while self.is_connected:
-            try:
-                await asyncio.wait_for(packet.sent.wait(), timeout=1)
-                break
-            except asyncio.TimeoutError:
-                pass
-        else:
+        if not await self._wait_sent(packet):
             raise ConnectionRefusedError('connection refused')
 
-    async def receive(self: "AsyncSocketClient"):
-        """ Waiting for income Packet """
-
-        while self.is_connected:
-            try:
-                packet_data = await asyncio.wait_for(self._received_packets.get(), timeout=1)
-                break
-            except asyncio.TimeoutError:
-                pass
+    async def send_many(self: "AsyncSocketClient", messages: Iterable[dict]) -> List[Optional[Exception]]:
+        """
+        Serialize messages in one pass and send them with one write, confirmed by one acknowledge.
+        Return a result for every message: None when delivered, otherwise the exception.
+        """
+
+        await self._wait_send_queue()
+
+        results = []
+        packets = await self._in_send_order(self._queue_batch, messages, results)
+
+        delivered = [await self._wait_sent(packet) for packet in packets]
+
+        # messages of packets lost with the connection
+        index = 0
+        for packet, sent in zip(packets, delivered):
+            count = packet.count
+            while count:
+                if results[index] is None:
+                    if not sent:
+                        results[index] = ConnectionRefusedError('connection refused')
+                    count -= 1
+                index += 1
+        return results
+
+    def _queue_batch(self: "AsyncSocketClient", messages: Iterable[dict], results: List[Optional[Exception]]) -> List[SendPacket]:
+        if self.peer_version:
+            packets = self._encode_batch(messages, results)
         else:
+            # legacy packets are acknowledged one by one
+            packets = []
+            for data in messages:
+                try:
+                    packets.append(self._encode_packet(data))
+                    results.append(None)
+                except Exception as exc:
+                    results.append(exc)
+
+        # queued at once, in order of sequences
+        for packet in packets:
+            self._enqueue(packet)
+        return packets
+
+    async def _wait_sent(self: "AsyncSocketClient", packet: SendPacket) -> bool:
+        """ Waiting for acknowledge of the packet, False when the connection is over before it """
+
+        if not packet.sent.done() and not self.is_connected and not self._suspended and not self._resumable:
+            # queued after the connection was over, a resumable session writes it again on the next one
+            return False
+        return await packet.sent
+
+    async def receive(self: "AsyncSocketClient"):
+        """ Waiting for income Packet, the ones received before the connection is over are returned first """
+
+        packet = await self._received_packets.get()
+        if packet is None:
+            # wake the next receiver too
+            self._received_packets.put_nowait(None)
             raise ConnectionRefusedError('connection refused')
 
-        # read JSON from bytes
-        json_string = base64.b64decode(packet_data)
-        data = json.loads(json_string)
+        self._taken(packet)
+        if self.OFFLOAD_THRESHOLD:
+            return await self._offload_receive(packet)
+        return self._decode_packet(packet)
+
+    def __aiter__(self):
+        return self
 
-        # deserialize
-        return self.deserialize(data)
+    async def __anext__(self: "AsyncSocketClient") -> dict:
+        """ Next received message, until the connection is over """
+
+        try:
+            return await self.receive()
+        except ConnectionRefusedError:
+            raise StopAsyncIteration
+
+    def on_message(self: "AsyncSocketClient", handler: Callable, concurrency: int = 1) -> asyncio.Task:
+        """
+        Call `handler(session, message)`, sync or async, for every received message.
+        Up to `concurrency` handlers run at once, one by one in order of arrival by default; the next message
+        is taken when a handler is done, so the peer is slowed down by the receive window.
+        Return the dispatching task, it is done once the connection is over and the handlers are done.
+        """
+
+        if not callable(handler):
+            raise ValueError('Unsupported handler type')
+        if concurrency < 1:
+            raise ValueError('concurrency must be positive')
+        if self._dispatcher is not None and not self._dispatcher.done():
+            raise RuntimeError('messages are dispatched already')
+
+        self._dispatcher = asyncio.create_task(self._dispatch(handler, concurrency))
+        return self._dispatcher
+
+    async def _dispatch(self: "AsyncSocketClient", handler: Callable, concurrency: int):
+        slots = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        def _done(task: asyncio.Task):
+            tasks.discard(task)
+            slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    message = await self.receive()
+                except ConnectionRefusedError:
+                    break
+                task = asyncio.create_task(self._handle_message(handler, message))
+                tasks.add(task)
+                task.add_done_callback(_done)
+
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _handle_message(self: "AsyncSocketClient", handler: Callable, message: dict):
+        try:
+            result = handler(self, message)
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.logger.exception('message handler failed')
 
     async def close(self: "AsyncSocketClient"):
-        self.writer.close()
+        self._end_session()
         try:
-            await asyncio.wait_for(self.writer.wait_closed(), timeout=10)
+            await asyncio.wait_for(self.protocol.wait_closed(), timeout=10)
         except asyncio.TimeoutError:
             pass
         self._keep_alive_task.cancel()
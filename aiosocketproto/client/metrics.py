@@ -0,0 +1,170 @@
+import bisect
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+# upper bounds of histogram buckets in seconds: 50 us .. ~26 s, doubling
+BUCKETS = tuple(0.00005 * 2 ** power for power in range(20))
+
+
+class Histogram:
+    """ Distribution of durations in exponential buckets, constant memory """
+
+    counts: List[int] # by bucket, the last one is above the highest bound
+    count: int
+    total: float
+    max: float
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.
+
+    def percentile(self, fraction: float) -> float:
+        """ Upper bound of the bucket of the percentile (`0.99`) """
+
+        if not self.count:
+            return 0.
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def __repr__(self):
+        return (
+            f'<Histogram count={self.count} mean={self.mean * 1000:.3f}ms'
+            f' p50={self.percentile(.5) * 1000:.3f}ms p99={self.percentile(.99) * 1000:.3f}ms max={self.max * 1000:.3f}ms>'
+        )
+
+
+class ConnectionMetrics:
+    """
+    Counters of a connection.
+    Frames are length-prefixed frames and legacy packets, signals (pings, legacy acknowledges) are not counted.
+    """
+
+    frames_in: int
+    frames_out: int
+    ack_rtt: Histogram # seconds from the write of a data frame to its acknowledge
+    send_latency: Histogram # seconds from `send` to the acknowledge, queueing included
+
+    _session: "AsyncSocketClient"
+
+    def __init__(self, session: "AsyncSocketClient"):
+        self._session = session
+        self.frames_in = 0
+        self.frames_out = 0
+        self.ack_rtt = Histogram()
+        self.send_latency = Histogram()
+
+    @property
+    def bytes_in(self) -> int:
+        return self._session.protocol.bytes_received
+
+    @property
+    def bytes_out(self) -> int:
+        return self._session.protocol.bytes_sent
+
+    @property
+    def send_queue(self) -> int:
+        """ Packets queued for sending """
+        return self._session._queue_send.qsize()
+
+    @property
+    def send_queue_bytes(self) -> int:
+        return self._session._send_queue_bytes
+
+    @property
+    def in_flight(self) -> int:
+        """ Data frames sent and not acknowledged """
+        return self._session._in_flight
+
+    @property
+    def receive_queue(self) -> int:
+        """ Packets received and not taken by `receive` """
+        return self._session._received_packets.qsize()
+
+    @property
+    def receive_queue_bytes(self) -> int:
+        return self._session._received_bytes
+
+    @property
+    def offloaded_messages(self) -> int:
+        """ Messages encoded or decoded in an executor """
+        stats = self._session.offload_stats
+        return stats.encoded_messages + stats.decoded_messages
+
+    @property
+    def offloaded_seconds(self) -> float:
+        """ Encoding and decoding time moved off the event loop """
+        return self._session.offload_stats.offloaded_seconds
+
+    @property
+    def resumes(self) -> int:
+        """ Times the session continued on a new connection """
+        return self._session.resume_stats.resumed
+
+    def snapshot(self) -> Dict[str, float]:
+        """ Current values as a flat dict for exporters """
+
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'send_queue': self.send_queue,
+            'send_queue_bytes': self.send_queue_bytes,
+            'in_flight': self.in_flight,
+            'receive_queue': self.receive_queue,
+            'receive_queue_bytes': self.receive_queue_bytes,
+            'ack_rtt_p50': self.ack_rtt.percentile(.5),
+            'ack_rtt_p99': self.ack_rtt.percentile(.99),
+            'send_latency_p50': self.send_latency.percentile(.5),
+            'send_latency_p99': self.send_latency.percentile(.99),
+            'offloaded_messages': self.offloaded_messages,
+            'offloaded_seconds': self.offloaded_seconds,
+            'resumes': self.resumes,
+        }
+
+    def __repr__(self):
+        return '<ConnectionMetrics {}>'.format(' '.join(
+            f'{name}={value}' for name, value in self.snapshot().items() if not name.startswith(('ack_', 'send_latency', 'offloaded_'))
+        ))
+
+
+class Instrumentation:
+    """
+    Hooks of connection events for monitoring, pass an instance as the `instrumentation` option.
+    Hooks are called synchronously in the event loop: keep them cheap, never block.
+    """
+
+    def connected(self, session: "AsyncSocketClient"):
+        """ Handshake is over (or the peer speaks the legacy protocol) """
+
+    def disconnected(self, session: "AsyncSocketClient", exc: Optional[BaseException]):
+        """ Connection is over, `exc` is the error which ended it. A resumable session may go on (`resumed`) """
+
+    def resumed(self, session: "AsyncSocketClient"):
+        """ A session continues on a new connection after its connection was lost """
+
+    def frame_sent(self, session: "AsyncSocketClient", kind: int, size: int, frames: int):
+        """ A packet is written: frame kind (0 for legacy packets), bytes, frames of a batch """
+
+    def frame_received(self, session: "AsyncSocketClient", kind: int, size: int):
+        """ A frame is received: frame kind (0 for legacy packets), bytes """
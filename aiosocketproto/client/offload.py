@@ -0,0 +1,307 @@
+"""
+Encoding and decoding of large messages in an executor.
+
+Messages from OFFLOAD_THRESHOLD bytes are serialized, encoded and compressed (received ones decompressed
+and decoded) in a `concurrent.futures` executor, so one large message does not stall the other sessions
+of the event loop and their keep-alive. Codecs which release the GIL run in a thread pool, the other ones
+in a process pool: the process gets the codec class, the custom serializers and the schemas of the peer,
+and works on copies of the message.
+
+Framing and sequence numbers stay in the event loop: messages are queued for sending, and returned
+by receive, in the order of the calls. While an offloaded message is encoded every other message of the
+connection (sends, batches, calls and their results, published messages) waits for its turn to be framed.
+"""
+import asyncio
+import multiprocessing
+import time
+from abc import ABC
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from .codec import Codec
+from .compression import Compression, compress
+from .frame import FLAG_ATTACHMENTS, pack_attachments_table
+from .received_packet import ReceivedPacket
+from .send_packet import SendPacket
+from .serializer import Serializer, SerializerType
+from .stats import OffloadStats
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+T = TypeVar('T')
+
+THREAD = 'thread'
+PROCESS = 'process'
+ITEM_SIZE = 8 # estimated bytes of a number, a custom object or a dict key
+
+_executors: Dict[str, Executor] = {}
+_hosts: Dict[tuple, "CodecHost"] = {} # codecs of a worker process by their spec
+
+
+def get_executor(kind: str) -> Executor:
+    """ Executor of the process shared by all connections, started on first use """
+
+    executor = _executors.get(kind)
+    if executor is None:
+        if kind == THREAD:
+            executor = ThreadPoolExecutor(thread_name_prefix='aiosocketproto-offload')
+        elif kind == PROCESS:
+            # started from the running loop, forked processes would keep the open sockets of the connections
+            executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        else:
+            raise ValueError(f'unsupported offload executor: {kind}')
+        _executors[kind] = executor
+    return executor
+
+
+def message_size(data: dict, limit: int) -> int:
+    """ Estimated encoded size of a message, values are walked until the size reaches `limit` """
+
+    size = 0
+    values = [data]
+    while values and size < limit:
+        value = values.pop()
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, memoryview):
+            size += value.nbytes
+        elif isinstance(value, dict):
+            size += len(value) * ITEM_SIZE
+            values.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            values.extend(value)
+        else:
+            size += ITEM_SIZE
+    return size
+
+
+class CodecHost(Serializer):
+    """ Stand-in of the client for a codec in a worker process """
+
+    custom_serializers: Dict[str, Type[SerializerType]]
+    codec: Codec
+
+    def __init__(self, codec_type: Type[Codec], custom_serializers: tuple, peer_schemas: frozenset, attachment_size: int):
+        self.custom_serializers = dict(custom_serializers)
+        self._peer_schemas = peer_schemas
+        self.ATTACHMENT_SIZE = attachment_size
+        super().__init__()
+        self.codec = codec_type(self)
+
+    def add_serializer(self, serializer: Type[SerializerType]):
+        serializer.default = self
+        self.custom_serializers[self.get_data_type_str(serializer.INSTANCE)] = serializer
+        self._reset_dispatch()
+
+
+def _codec(codec: Union[Codec, tuple]) -> Codec:
+    """ Codec of the connection in a thread, rebuilt from its spec in a process """
+
+    if isinstance(codec, Codec):
+        return codec
+    host = _hosts.get(codec)
+    if host is None:
+        host = _hosts[codec] = CodecHost(*codec)
+    return host.codec
+
+
+def encode(
+    codec: Union[Codec, tuple], data: dict, compression: Optional[Compression], threshold: int
+) -> Tuple[int, List[bytes], int, int, float, float]:
+    """
+    Encode a data frame body like `Processor._encode_body`. Return flags, body segments,
+    payload size before and after compression, encoding and compression seconds.
+    """
+
+    begin = time.perf_counter()
+    attachments = []
+    payload = _codec(codec).encode(data, attachments)
+    encoded = time.perf_counter()
+
+    original, flags = len(payload), 0
+    if compression is not None:
+        payload, flags = compress(compression, threshold, payload)
+    compressed = time.perf_counter()
+
+    if not attachments:
+        return flags, [payload], original, len(payload), encoded - begin, compressed - encoded
+
+    body = [pack_attachments_table(attachments) + payload]
+    if isinstance(codec, Codec):
+        body.extend(attachments)
+    else:
+        # views are not sent back from a process
+        body.extend(attachment.tobytes() for attachment in attachments)
+    return flags | FLAG_ATTACHMENTS, body, original, len(payload), encoded - begin, compressed - encoded
+
+
+def decode(
+    codec: Union[Codec, tuple], payload: memoryview, attachments: Sequence[memoryview], compression: Optional[Compression]
+) -> Tuple[dict, float, float]:
+    """ Decompress and decode a payload, return the message, decoding and decompression seconds """
+
+    begin = time.perf_counter()
+    if compression is not None:
+        payload = compression.decompress(payload)
+    decompressed = time.perf_counter()
+
+    data = _codec(codec).decode(payload, attachments)
+    return data, time.perf_counter() - decompressed, decompressed - begin
+
+
+class Offload(ABC):
+    """ Sends and receives of large messages encoded and decoded off the event loop """
+
+    offload_stats: OffloadStats
+    _send_turns: Deque[asyncio.Future] # messages waiting to be framed in the order of the calls, the first one's turn is now
+    _receive_order: asyncio.Lock # held by the receives decoding in the executor, the later ones wait for it
+    _receives_ordered: int # receives holding or waiting for the receive order
+
+    def __init__(self: "AsyncSocketClient"):
+        super().__init__()
+        self.offload_stats = OffloadStats()
+        self._send_turns = deque()
+        self._receive_order = asyncio.Lock()
+        self._receives_ordered = 0
+
+    async def _offload_send(self: "AsyncSocketClient", data: dict) -> SendPacket:
+        """ Encode, frame and queue a message after the messages of the sends before it """
+
+        threshold = self.OFFLOAD_THRESHOLD
+        if message_size(data, threshold) < threshold:
+            return await self._in_send_order(self._queue_message, data)
+
+        # the place is taken at once, the message is encoded while the ones before it are
+        turn = self._take_send_turn()
+        try:
+            codec, compression = (self.codec, self.compression) if self.peer_version else (self._legacy_codec, None)
+            flags, body, original, size, seconds, compress_seconds = await self._offload(
+                encode, codec, data, compression, self.COMPRESSION_THRESHOLD
+            )
+            if compression is not None:
+                self.compression_stats.count(original, size, flags, compress_seconds)
+
+            await turn
+            packet = self._frame_body(flags, body)
+            self._enqueue(packet)
+        finally:
+            self._pass_send_turn(turn)
+
+        stats = self.offload_stats
+        stats.encoded_messages += 1
+        stats.encoded_bytes += packet.size
+        stats.offloaded_seconds += seconds + compress_seconds
+        return packet
+
+    def _queue_message(self: "AsyncSocketClient", data: dict) -> SendPacket:
+        packet = self._encode_packet(data)
+        self._enqueue(packet)
+        return packet
+
+    async def _in_send_order(self: "AsyncSocketClient", queue: Callable[..., T], *args) -> T:
+        """ Frame and queue with `queue(*args)` after the messages before it, at once when none is waiting """
+
+        if not self._send_turns:
+            return queue(*args)
+
+        turn = self._take_send_turn()
+        try:
+            await turn
+            return queue(*args)
+        finally:
+            self._pass_send_turn(turn)
+
+    def _queue_in_send_order(self: "AsyncSocketClient", queue: Callable, *args):
+        """ `_in_send_order` for callers which do not wait, errors of a message framed later are logged """
+
+        if not self._send_turns:
+            queue(*args)
+            return
+
+        def framed(turn: asyncio.Future):
+            try:
+                if not turn.cancelled():
+                    queue(*args)
+            except Exception:
+                self.logger.exception('message is not queued')
+            finally:
+                self._pass_send_turn(turn)
+
+        self._take_send_turn().add_done_callback(framed)
+
+    def _take_send_turn(self: "AsyncSocketClient") -> asyncio.Future:
+        """ Place of a message in the send order, done when the message may be framed """
+
+        turn = asyncio.get_running_loop().create_future()
+        if not self._send_turns:
+            turn.set_result(None)
+        self._send_turns.append(turn)
+        return turn
+
+    def _pass_send_turn(self: "AsyncSocketClient", turn: asyncio.Future):
+        """ The message is queued or given up, the next one may be framed """
+
+        turns = self._send_turns
+        if not turns or turns[0] is not turn:
+            # given up before its turn
+            if turn in turns:
+                turns.remove(turn)
+            return
+
+        turns.popleft()
+        while turns and turns[0].cancelled():
+            turns.popleft()
+        if turns:
+            turns[0].set_result(None)
+
+    async def _offload_receive(self: "AsyncSocketClient", packet: ReceivedPacket) -> dict:
+        """ Decode a taken packet, the message is returned after the messages of the receives before it """
+
+        large = packet.size >= self.OFFLOAD_THRESHOLD
+        if not large and not self._receives_ordered:
+            return self._decode_packet(packet)
+
+        self._receives_ordered += 1
+        try:
+            async with self._receive_order:
+                if not large:
+                    return self._decode_packet(packet)
+
+                data, seconds, decompress_seconds = await self._offload(
+                    decode, packet.codec, packet.payload, packet.attachments, self.compression if packet.compressed else None
+                )
+                if packet.compressed:
+                    self.compression_stats.decompressed_frames += 1
+                    self.compression_stats.decompress_seconds += decompress_seconds
+
+                stats = self.offload_stats
+                stats.decoded_messages += 1
+                stats.decoded_bytes += packet.size
+                stats.offloaded_seconds += seconds + decompress_seconds
+                return data
+        except asyncio.CancelledError:
+            # the message is not lost, the next receive returns it
+            self._returned(packet)
+            raise
+        finally:
+            self._receives_ordered -= 1
+
+    async def _offload(self: "AsyncSocketClient", function, codec: Codec, *args):
+        """ Run `encode` or `decode` in the executor of the codec """
+
+        executor = self.OFFLOAD_EXECUTOR
+        if executor is None:
+            executor = THREAD if codec.RELEASES_GIL else PROCESS
+        if isinstance(executor, str):
+            executor = get_executor(executor)
+
+        if isinstance(executor, ProcessPoolExecutor):
+            # the process rebuilds the codec, views are copied to be pickled
+            codec = type(codec), tuple(self.custom_serializers.items()), self._peer_schemas, self.ATTACHMENT_SIZE
+            args = [arg.tobytes() if isinstance(arg, memoryview) else arg for arg in args]
+            if function is decode:
+                args[1] = [attachment.tobytes() for attachment in args[1]]
+
+        return await asyncio.get_running_loop().run_in_executor(executor, function, codec, *args)
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
+
+from .client import AsyncSocketClient
+from .stats import PoolStats
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """ Server of a pool and its connections """
+
+    host: str
+    port: int
+    connections: List[AsyncSocketClient]
+    connecting: int # connections being opened
+    failures: int # connect failures in a row
+    retry_at: float # no connects before, after failures
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.connections = []
+        self.connecting = 0
+        self.failures = 0
+        self.retry_at = 0.
+
+    def __repr__(self):
+        return f'<Endpoint {self.host}:{self.port} connections={len(self.connections)}>'
+
+
+class PoolAcquire:
+    """ Result of `acquire`: awaitable, or an async context manager which releases the connection """
+
+    def __init__(self, pool: "AsyncSocketClientPool"):
+        self.pool = pool
+        self.client = None
+
+    def __await__(self):
+        return self.pool._acquire().__await__()
+
+    async def __aenter__(self) -> AsyncSocketClient:
+        self.client = await self.pool._acquire()
+        return self.client
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.pool.release(self.client)
+
+
+class AsyncSocketClientPool:
+    """
+    Connections to one or several servers shared by many coroutines.
+    Every acquire gets the live connection with the fewest packets in flight, a new connection is opened
+    in the background while all of them are busy (up to `max_size` per server).
+    Dead connections are evicted, `min_size` connections per server are kept open and warmed up in advance.
+    """
+
+    HEALTH_INTERVAL = 1 # seconds between checks of the connections
+    RECONNECT_DELAY = 0.5 # seconds before reconnecting to a failed server, doubled after every failure
+    RECONNECT_DELAY_MAX = 30
+    IDLE_TIMEOUT = 60 # seconds a connection above `min_size` may stay unused before it is closed
+    ACQUIRE_TIMEOUT = 10 # seconds to wait for a connection when none is alive
+
+    endpoints: List[Endpoint]
+    min_size: int
+    max_size: int
+    client_class: Type[AsyncSocketClient]
+    debug_mode: bool
+    options: dict
+    stats: PoolStats
+
+    _leases: Dict[AsyncSocketClient, int] # acquired and not released
+    _last_used: Dict[AsyncSocketClient, float]
+    _changed: asyncio.Event # set when a connection is added
+    _health_task: Optional[asyncio.Task]
+    _connect_tasks: set
+    _close_tasks: set # connections evicted or closed for being idle, until they are closed
+
+    def __init__(
+        self, endpoints: Union[Tuple[str, int], Sequence[Tuple[str, int]]], min_size: int = 1, max_size: int = 10,
+        client_class: Type[AsyncSocketClient] = AsyncSocketClient, debug_mode: bool = False, **options
+    ):
+        """
+        Endpoints are `(host, port)` of one server or a list of them.
+        Options are applied to every connection (see `AsyncSocketClient.connect`).
+        """
+
+        if isinstance(endpoints, tuple) and len(endpoints) == 2 and isinstance(endpoints[1], int):
+            endpoints = [endpoints]
+        if not 0 <= min_size <= max_size or not max_size:
+            raise ValueError(f'invalid pool size: {min_size}..{max_size}')
+
+        client_class.check_options(options)
+        self.endpoints = [Endpoint(host, port) for host, port in endpoints]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.client_class = client_class
+        self.debug_mode = debug_mode
+        self.options = options
+        self.stats = PoolStats()
+
+        self._leases = {}
+        self._last_used = {}
+        self._changed = asyncio.Event()
+        self._health_task = None
+        self._connect_tasks = set()
+        self._close_tasks = set()
+
+    @property
+    def size(self) -> int:
+        """ Open connections """
+        return sum(len(endpoint.connections) for endpoint in self.endpoints)
+
+    @property
+    def connections(self) -> List[AsyncSocketClient]:
+        return [client for endpoint in self.endpoints for client in endpoint.connections]
+
+    async def start(self):
+        """ Open `min_size` connections to every server and start health checks """
+
+        await asyncio.gather(*(self._connect(endpoint) for endpoint in self.endpoints for _ in range(self.min_size)))
+        self._health_task = asyncio.create_task(self._health())
+
+    def acquire(self) -> PoolAcquire:
+        """
+        Get the least busy connection: `client = await pool.acquire()` and `pool.release(client)`,
+        or `async with pool.acquire() as client`.
+        Connections are shared, a connection may be acquired by several coroutines at once.
+        """
+        return PoolAcquire(self)
+
+    def release(self, client: AsyncSocketClient):
+        leases = self._leases.get(client)
+        if leases is None:
+            return
+        self._leases[client] = leases - 1
+        self._last_used[client] = time.monotonic()
+
+        # lost while it was used
+        if not client.is_connected:
+            self._evict(client)
+
+    async def send(self, **data):
+        """ Send with the least busy connection """
+
+        async with self.acquire() as client:
+            await client.send(**data)
+
+    async def send_many(self, messages: Iterable[dict]) -> List[Optional[Exception]]:
+        async with self.acquire() as client:
+            return await client.send_many(messages)
+
+    async def call(self, method: str, timeout: Optional[float] = None, **args):
+        """ Call a handler of a server with the least busy connection """
+
+        async with self.acquire() as client:
+            return await client.call(method, timeout=timeout, **args)
+
+    async def close(self):
+        """ Close every connection and stop health checks """
+
+        if self._health_task:
+            self._health_task.cancel()
+        for task in list(self._connect_tasks):
+            task.cancel()
+
+        clients = self.connections
+        for endpoint in self.endpoints:
+            endpoint.connections.clear()
+        await asyncio.gather(*(client.close() for client in clients), *self._close_tasks, return_exceptions=True)
+        self._leases.clear()
+        self._last_used.clear()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _load(self, client: AsyncSocketClient) -> int:
+        return client.unacknowledged + self._leases[client]
+
+    def _least_busy(self) -> Optional[AsyncSocketClient]:
+        best, best_load = None, 0
+        for endpoint in self.endpoints:
+            for client in endpoint.connections:
+                if not client.is_connected:
+                    continue
+                load = self._load(client)
+                if best is None or load < best_load:
+                    best, best_load = client, load
+        return best
+
+    async def _acquire(self) -> AsyncSocketClient:
+        self.stats.acquires += 1
+        deadline = time.monotonic() + self.ACQUIRE_TIMEOUT
+        while True:
+            client = self._least_busy()
+
+            # every connection is busy: open one more for the next acquires
+            if client is None or self._load(client):
+                self._grow()
+
+            if client is not None:
+                self._leases[client] += 1
+                return client
+
+            # none is alive: wait for a connect
+            self.stats.acquire_waits += 1
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise ConnectionRefusedError('no connection available') from None
+
+    def _grow(self):
+        """ Start opening a connection to the server with the fewest ones, one connect at a time """
+
+        if any(endpoint.connecting for endpoint in self.endpoints):
+            return
+
+        now = time.monotonic()
+        candidates = [
+            endpoint for endpoint in self.endpoints
+            if len(endpoint.connections) < self.max_size and endpoint.retry_at <= now
+        ]
+        if candidates:
+            self._spawn_connect(min(candidates, key=lambda endpoint: len(endpoint.connections)))
+
+    def _spawn_connect(self, endpoint: Endpoint):
+        endpoint.connecting += 1
+        task = asyncio.create_task(self._connect(endpoint, counted=True))
+        self._connect_tasks.add(task)
+        task.add_done_callback(self._connect_tasks.discard)
+
+    async def _connect(self, endpoint: Endpoint, counted: bool = False) -> Optional[AsyncSocketClient]:
+        if not counted:
+            endpoint.connecting += 1
+        try:
+            client = await self.client_class.connect(endpoint.host, endpoint.port, self.debug_mode, **self.options)
+        except (OSError, asyncio.TimeoutError):
+            self.stats.connect_failures += 1
+            endpoint.failures += 1
+            delay = min(self.RECONNECT_DELAY * 2 ** (endpoint.failures - 1), self.RECONNECT_DELAY_MAX)
+            endpoint.retry_at = time.monotonic() + delay
+            return None
+        finally:
+            endpoint.connecting -= 1
+
+        endpoint.failures = 0
+        endpoint.connections.append(client)
+        self._leases[client] = 0
+        self._last_used[client] = time.monotonic()
+        self.stats.opened += 1
+        self._changed.set()
+        return client
+
+    def _evict(self, client: AsyncSocketClient):
+        for endpoint in self.endpoints:
+            if client in endpoint.connections:
+                endpoint.connections.remove(client)
+                self._leases.pop(client, None)
+                self._last_used.pop(client, None)
+                self.stats.evicted += 1
+                self._spawn_close(client)
+                return
+
+    def _spawn_close(self, client: AsyncSocketClient):
+        task = asyncio.create_task(client.close())
+        self._close_tasks.add(task)
+        task.add_done_callback(self._close_done)
+
+    def _close_done(self, task: asyncio.Task):
+        self._close_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning('connection of the pool is not closed cleanly: %r', task.exception())
+
+    async def _health(self):
+        """ Evict dead connections, close idle ones above `min_size`, keep `min_size` open """
+
+        while True:
+            await asyncio.sleep(self.HEALTH_INTERVAL)
+            now = time.monotonic()
+
+            for endpoint in self.endpoints:
+                # lost connections, every connection pings its server itself
+                for client in [client for client in endpoint.connections if not client.is_connected]:
+                    self._evict(client)
+
+                # unused for a while
+                idle = [
+                    client for client in endpoint.connections
+                    if not self._load(client) and now - self._last_used[client] > self.IDLE_TIMEOUT
+                ]
+                for client in idle[:max(len(endpoint.connections) - self.min_size, 0)]:
+                    endpoint.connections.remove(client)
+                    self._leases.pop(client, None)
+                    self._last_used.pop(client, None)
+                    self.stats.closed_idle += 1
+                    self._spawn_close(client)
+
+                # warm up
+                missing = self.min_size - len(endpoint.connections) - endpoint.connecting
+                if missing > 0 and endpoint.retry_at <= now:
+                    for _ in range(missing):
+                        self._spawn_connect(endpoint)
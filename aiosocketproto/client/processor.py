@@ -1,11 +1,22 @@
 import asyncio
+import json
 import struct
 import time
-import traceback
 from abc import ABC
-from typing import TYPE_CHECKING, Optional
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Optional, Sequence
 
+from .codec import REGISTRY as CODECS, Codec, JsonCodec
+from .compression import ALGORITHMS, Compression, CompressionStats, compress, dictionary_id
+from .frame import (
+    ACK_FRAME, FLAG_ATTACHMENTS, FLAG_COMPRESSED, FRAME_HEAD, FRAME_HEADER, FRAME_LENGTH, KIND_ACK, KIND_DATA, MAX_FRAME_LENGTH,
+    SEQUENCED_KINDS, STREAM_KINDS, is_legacy_frame, next_sequence, pack_attachments_table, pack_frame, sequence_reached, split_attachments,
+)
+from .received_packet import ReceivedPacket, ReceiveQueue
+from .schema import SCHEMAS_BY_ID
 from .send_packet import SendPacket
+from .stats import FlowStats
+from .timers import Timer, get_timers
 
 if TYPE_CHECKING:
     from .client import AsyncSocketClient
@@ -13,150 +24,845 @@ if TYPE_CHECKING:
 
 class Processor(ABC):
     _queue_send: asyncio.Queue["SendPacket"] # queue of send tasks
-    _pending_packets: asyncio.Queue["SendPacket"] # queue of sent packets which waiting for acknowledging signals
-    _received_packets: asyncio.Queue[bytes] # queue of received packets
-    _keep_alive_task: Optional[asyncio.Task] # keep alive control and queue executor
-    _last_ping_timestamp: float
-    _recv_buffer: bytes
+    _pending_packets: Deque["SendPacket"] # sent packets which waiting for acknowledging signals, in send order
+    _received_packets: ReceiveQueue # queue of received packets, None - connection is over
+    _keep_alive_task: Optional[asyncio.Task] # keep alive control and queue executor of the current connection
+    _connection_tasks: List[asyncio.Task] # senders of the current connection
+    _carried: Optional[SendPacket] # taken from the send queue, but not written yet
+    last_activity: float # monotonic time of the last frame from the peer, pings excluded
+    _last_received: float # monotonic time of the last frame or signal from the peer
+    _ping_sent: Optional[float] # monotonic time of the ping not answered yet
+    _busy_since: float # monotonic time the first data frame in flight was written
+    _keep_alive_timer: Optional[Timer] # next keep-alive check in the timers of the loop
+
+    flow_stats: FlowStats
+    _send_queue_bytes: int
+    _send_blocked: bool # the send queue reached the high watermark and is not below the low one yet
+    _send_waiters: Deque[asyncio.Future] # senders waiting for the queue, in order
+    _received_bytes: int # received packets not taken by the application
+    _receive_blocked_at: Optional[float] # acknowledges held back by the full receive queue since
+    _withheld_acks: int # legacy acknowledge signals held back
+
+    peer_version: int # negotiated protocol version, 0 - legacy protocol
+    codec: Codec # negotiated payload codec
+    _legacy_codec: JsonCodec
+    compression: Optional[Compression] # negotiated payload compression
+    compression_stats: CompressionStats
+    _hello: asyncio.Future # handshake of the peer
+    _hello_sent: bool
+    _hello_expected: bool # next frame is the handshake payload
+    _pong_waiter: Optional[asyncio.Future]
+    _peer_schemas: frozenset # ids of the message schemas registered by the peer
+    _peer_max_frame_size: int # longest frame the peer accepts
+
+    _window_open: asyncio.Event # set when a data frame may be sent without exceeding the window
+    _in_flight: int # data frames (legacy packets) sent and not acknowledged
+    _send_sequence: int # sequence of the last framed data packet
+    _recv_sequence: int # sequence of the last received data frame
+    _acked_sequence: int # sequence of the last acknowledge sent
+    _unacknowledged: int # received data frames not acknowledged yet
+    _ack_handle: Optional[asyncio.Handle] # scheduled acknowledge
 
     def __init__(self: "AsyncSocketClient"):
         super().__init__()
         self._queue_send = asyncio.Queue()
-        self._pending_packets = asyncio.Queue()
-        self._received_packets = asyncio.Queue()
+        self._pending_packets = deque()
+        self._received_packets = ReceiveQueue()
         self._keep_alive_task = None
-        self._last_ping_timestamp = time.time()
-        self._recv_buffer = b''
+        self._connection_tasks = []
+        self._carried = None
+        self.last_activity = self._last_received = self._busy_since = time.monotonic()
+        self._ping_sent = None
+        self._keep_alive_timer = None
+
+        self.flow_stats = FlowStats()
+        self._send_queue_bytes = 0
+        self._send_blocked = False
+        self._send_waiters = deque()
+        self._received_bytes = 0
+        self._receive_blocked_at = None
+        self._withheld_acks = 0
+
+        self.peer_version = 0
+        self.codec = self._legacy_codec = JsonCodec(self)
+        self.compression = None
+        self.compression_stats = CompressionStats()
+        self._hello = asyncio.get_running_loop().create_future()
+        self._hello_sent = False
+        self._hello_expected = False
+        self._pong_waiter = None
+        self._peer_schemas = frozenset()
+        self._peer_max_frame_size = MAX_FRAME_LENGTH
 
-    async def _recv(self: "AsyncSocketClient", length: int, timeout: int = None) -> Optional[bytes]:
-        async def _recv_wrapper():
-            while left_bytes := length - len(self._recv_buffer):
-                self._recv_buffer += await self.reader.read(left_bytes)
-                await asyncio.sleep(.1)
-            return self._recv_buffer
+        self._window_open = asyncio.Event()
+        self._in_flight = 0
+        self._send_sequence = 0
+        self._recv_sequence = 0
+        self._acked_sequence = 0
+        self._unacknowledged = 0
+        self._ack_handle = None
 
-        if timeout is not None:
+    def _encode_packet(self: "AsyncSocketClient", data: dict, kind: int = KIND_DATA) -> SendPacket:
+        """ Encode with the negotiated codec and frame """
+
+        attachments = []
+        payload = self.codec.encode(data, attachments)
+        return self._make_packet(payload, attachments, kind)
+
+    async def _wait_send_queue(self: "AsyncSocketClient"):
+        """ Wait until the send queue is below the low watermark, if it reached the high one """
+
+        if not self._send_blocked and not self._send_waiters:
+            return
+
+        self.flow_stats.send_waits += 1
+        begin = time.perf_counter()
+        waiters = self._send_waiters
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        while True:
             try:
-                data = await asyncio.wait_for(_recv_wrapper(), timeout=timeout)
-                self._recv_buffer = b''
-                return data
-            except asyncio.TimeoutError:
-                return None
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_sender()
+                elif waiter in waiters:
+                    waiters.remove(waiter)
+                raise
+            if not self._send_blocked or self.protocol.is_closed:
+                break
+            # blocked again by the ones woken before, keep the turn
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.appendleft(waiter)
+        self.flow_stats.send_wait_seconds += time.perf_counter() - begin
+
+        # the next one checks the queue once this packet is queued
+        self._wake_sender()
+
+    def _wake_sender(self: "AsyncSocketClient"):
+        while self._send_waiters:
+            waiter = self._send_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _enqueue(self: "AsyncSocketClient", packet: SendPacket):
+        """ Put to send queue, the high watermark makes senders wait """
+
+        self._queue_send.put_nowait(packet)
+        self._send_queue_bytes += packet.size
+        self.flow_stats.send_queue_peak = max(self.flow_stats.send_queue_peak, self._send_queue_bytes)
+        if not self._send_blocked:
+            self._send_blocked = self._above_limits(self._queue_send.qsize(), self._send_queue_bytes, self.SEND_QUEUE_SIZE, self.SEND_QUEUE_BYTES, 1)
+
+    def _dequeued(self: "AsyncSocketClient", packet: SendPacket):
+        self._send_queue_bytes -= packet.size
+        if self._send_blocked and not self._above_limits(
+            self._queue_send.qsize(), self._send_queue_bytes, self.SEND_QUEUE_SIZE, self.SEND_QUEUE_BYTES, self.LOW_WATERMARK
+        ):
+            self._send_blocked = False
+            self._wake_sender()
+
+    def _received(self: "AsyncSocketClient", packet: ReceivedPacket):
+        """
+        Put to receive queue, acknowledges are held back above the high watermark.
+        The peer stops once its window is full and its `send` waits, so the queue stays bounded.
+        Reading goes on: acknowledges, pongs and call results of the own sends must still arrive.
+        """
+
+        self._received_packets.put_nowait(packet)
+        self._received_bytes += packet.size
+        self.flow_stats.receive_queue_peak = max(self.flow_stats.receive_queue_peak, self._received_bytes)
+
+        if self._receive_blocked_at is None and self._above_limits(
+            self._received_packets.qsize(), self._received_bytes, self.RECEIVE_QUEUE_SIZE, self.RECEIVE_QUEUE_BYTES, 1
+        ):
+            self._receive_blocked_at = time.perf_counter()
+            self.flow_stats.receive_pauses += 1
+
+    def _taken(self: "AsyncSocketClient", packet: ReceivedPacket):
+        self._received_bytes -= packet.size
+        if self._receive_blocked_at is not None and not self._above_limits(
+            self._received_packets.qsize(), self._received_bytes, self.RECEIVE_QUEUE_SIZE, self.RECEIVE_QUEUE_BYTES, self.LOW_WATERMARK
+        ):
+            self.flow_stats.receive_pause_seconds += time.perf_counter() - self._receive_blocked_at
+            self._receive_blocked_at = None
+
+            # release the held back acknowledges
+            if self._withheld_acks and not self.transport.is_closing():
+                self.protocol.write(struct.pack("!i", self.SIGNAL_ACT) * self._withheld_acks)
+                self._withheld_acks = 0
+            self._send_sequence_ack()
+
+    def _returned(self: "AsyncSocketClient", packet: ReceivedPacket):
+        """ A taken packet is not returned by receive (cancelled), the next receive gets it """
+
+        self._received_packets.put_back(packet)
+        self._received_bytes += packet.size
+
+    @staticmethod
+    def _above_limits(count: int, size: int, count_limit: int, size_limit: int, watermark: float) -> bool:
+        """ Whether a queue reached the watermark fraction of a limit, 0 - no limit """
+        return bool(count_limit and count >= count_limit * watermark or size_limit and size >= size_limit * watermark)
+
+    def _decode_packet(self: "AsyncSocketClient", packet: ReceivedPacket) -> dict:
+        """ Decode with the codec of the packet """
+
+        payload = self._decompress(packet.payload) if packet.compressed else packet.payload
+        return packet.codec.decode(payload, packet.attachments)
+
+    def _make_packet(self: "AsyncSocketClient", payload: bytes, attachments: Sequence[memoryview] = (), kind: int = KIND_DATA) -> SendPacket:
+        """ Frame payload for the negotiated protocol """
+
+        if not self.peer_version:
+            return SendPacket(FRAME_LENGTH.pack(len(payload)) + payload, kind=0)
+
+        segments = []
+        self._frame_segments(payload, attachments, kind, segments)
+        return SendPacket(segments[0], self._send_sequence, segments[1:], kind=kind)
+
+    def _encode_batch(self: "AsyncSocketClient", messages: Iterable[dict], results: List[Optional[Exception]]) -> List[SendPacket]:
+        """
+        Encode messages to packets of up to WINDOW_SIZE data frames, every packet is written at once
+        and confirmed by the acknowledge of its last frame. Appends a result for every message.
+        """
+
+        packets = []
+        segments = []
+        count = 0
+        for data in messages:
+            try:
+                attachments = []
+                payload = self.codec.encode(data, attachments)
+                self._frame_segments(payload, attachments, KIND_DATA, segments)
+            except Exception as exc:
+                results.append(exc)
+                continue
+            results.append(None)
+
+            count += 1
+            if count == self.WINDOW_SIZE:
+                packets.append(self._batch_packet(segments, count))
+                segments, count = [], 0
+
+        if count:
+            packets.append(self._batch_packet(segments, count))
+        return packets
+
+    def _batch_packet(self: "AsyncSocketClient", segments: List[bytes], count: int) -> SendPacket:
+        if all(type(segment) is bytes for segment in segments):
+            return SendPacket(b''.join(segments), self._send_sequence, count=count)
+        return SendPacket(segments[0], self._send_sequence, segments[1:], count)
+
+    def _frame_segments(self: "AsyncSocketClient", payload: bytes, attachments: Sequence[memoryview], kind: int, segments: List[bytes]):
+        """ Number a data frame and append its head and attachments to segments """
+
+        flags = 0
+        if self.compression:
+            payload, flags = self._compress(payload)
+
+        if not attachments:
+            self._check_frame_size(FRAME_HEADER.size + len(payload))
+            self._send_sequence = next_sequence(self._send_sequence)
+            segments.append(pack_frame(kind, flags, self._send_sequence, payload))
+            return
+
+        # attachments are not copied, they are written after the frame head
+        table = pack_attachments_table(attachments)
+        length = FRAME_HEADER.size + len(table) + len(payload) + sum(attachment.nbytes for attachment in attachments)
+        self._check_frame_size(length)
+        self._send_sequence = next_sequence(self._send_sequence)
+        segments.append(FRAME_HEAD.pack(length, kind, flags | FLAG_ATTACHMENTS, self._send_sequence) + table + payload)
+        segments.extend(attachments)
+
+    @property
+    def _encoding(self: "AsyncSocketClient") -> tuple:
+        """ Sessions with equal encodings get the same bytes for the same message """
+
+        if not self.peer_version:
+            return (None,)
+        compression = self.compression
+        if compression is None:
+            return self.codec.NAME, self.ATTACHMENT_SIZE, self._peer_schemas
+        return (
+            self.codec.NAME, self.ATTACHMENT_SIZE, self._peer_schemas, type(compression), compression.level,
+            compression.dictionary, self.COMPRESSION_THRESHOLD,
+        )
+
+    def _encode_body(self: "AsyncSocketClient", data: dict) -> (int, List[bytes]):
+        """ Encode a data frame without its head: flags and body segments, shared by sessions of the same encoding """
+
+        if not self.peer_version:
+            return 0, [self._legacy_codec.encode(data, [])]
+
+        attachments = []
+        payload = self.codec.encode(data, attachments)
+        flags = 0
+        if self.compression:
+            payload, flags = self._compress(payload)
+        if not attachments:
+            return flags, [payload]
+        return flags | FLAG_ATTACHMENTS, [pack_attachments_table(attachments) + payload, *attachments]
+
+    def _frame_body(self: "AsyncSocketClient", flags: int, body: List[bytes]) -> SendPacket:
+        """ Number and frame an encoded body, the body is written as is """
+
+        length = sum(len(segment) for segment in body)
+        if not self.peer_version:
+            return SendPacket(FRAME_LENGTH.pack(length), None, body, kind=0)
+
+        length += FRAME_HEADER.size
+        self._check_frame_size(length)
+        self._send_sequence = next_sequence(self._send_sequence)
+        return SendPacket(FRAME_HEAD.pack(length, KIND_DATA, flags, self._send_sequence), self._send_sequence, body)
+
+    def _check_frame_size(self: "AsyncSocketClient", length: int):
+        """ The peer aborts the connection on a longer frame, refuse it before it gets a sequence """
+
+        if length > self._peer_max_frame_size:
+            raise ValueError(f'packet is too large: bytes({length}), the peer accepts up to {self._peer_max_frame_size}')
+
+    def _compress(self: "AsyncSocketClient", payload: bytes) -> (bytes, int):
+        """ Compress payload from the threshold size, return payload and frame flags """
+
+        begin = time.perf_counter()
+        compressed, flags = compress(self.compression, self.COMPRESSION_THRESHOLD, payload)
+        self.compression_stats.count(len(payload), len(compressed), flags, time.perf_counter() - begin)
+        return compressed, flags
+
+    def _decompress(self: "AsyncSocketClient", payload: memoryview) -> bytes:
+        begin = time.perf_counter()
+        data = self.compression.decompress(payload)
+        self.compression_stats.decompress_seconds += time.perf_counter() - begin
+        self.compression_stats.decompressed_frames += 1
+        return data
+
+    def _write_packets(self: "AsyncSocketClient", packets: List[SendPacket]):
+        """ Write packets with one call and mark them as pending """
+
+        if len(packets) == 1 and not packets[0].attachments:
+            self.protocol.write(packets[0].data)
+        elif not any(packet.attachments for packet in packets):
+            self.protocol.write(b''.join([packet.data for packet in packets]))
         else:
-            data = await _recv_wrapper()
-            self._recv_buffer = b''
-            return data
+            segments = []
+            for packet in packets:
+                segments.append(packet.data)
+                segments.extend(packet.attachments)
+            self.protocol.writelines(segments)
+
+        if not self._in_flight:
+            self._busy_since = time.monotonic()
+            # unacknowledged frames are a reason to check the peer before the ping interval
+            self._keep_alive_schedule(self._busy_since + self.ACT_TIMEOUT)
+
+        written = time.perf_counter()
+        for packet in packets:
+            self._dequeued(packet)
+            self._pending_packets.append(packet)
+            self._in_flight += packet.count
+            packet.written = written
+            if packet.count:
+                self._frames_written(packet.kind, packet.size, packet.count)
 
-    async def _send_ack(self: "AsyncSocketClient"):
+    def _frames_written(self: "AsyncSocketClient", kind: int, size: int, frames: int = 1):
+        self.metrics.frames_out += frames
+        if self.INSTRUMENTATION is not None:
+            self.INSTRUMENTATION.frame_sent(self, kind, size, frames)
+
+    def _frame_counted(self: "AsyncSocketClient", kind: int, packet: memoryview):
+        self.metrics.frames_in += 1
+        if self.INSTRUMENTATION is not None:
+            self.INSTRUMENTATION.frame_received(self, kind, len(packet))
+
+    def _packet_acknowledged(self: "AsyncSocketClient", packet: SendPacket, now: float):
+        self._in_flight -= packet.count
+        packet.finish(True)
+        self.metrics.send_latency.observe(now - packet.created)
+
+    def _send_ack(self: "AsyncSocketClient"):
         """
         Send Acknowledging signal.
         Used to send confirmation that the packet was successfully received.
         """
+
+        # acknowledges are matched in order, so pings wait behind the held back ones too
+        if self._receive_blocked_at is not None or self._withheld_acks:
+            self._withheld_acks += 1
+            return
+
         signal = struct.pack("!i", self.SIGNAL_ACT)
-        self.writer.write(signal)
-        await self.writer.drain()
+        self.protocol.write(signal)
 
-    async def _ping(self: "AsyncSocketClient"):
-        """
-        Send ping signal.
-        And waiting for Acknowledging signal.
-        """
+    def _schedule_sequence_ack(self: "AsyncSocketClient"):
+        """ Acknowledge received data frames: at once every ACK_EVERY frames, otherwise after ACK_DELAY """
+
+        self._unacknowledged += 1
+        if self._receive_blocked_at is not None:
+            return
+        if self._unacknowledged >= self.ACK_EVERY:
+            self._send_sequence_ack()
+        elif self._ack_handle is None:
+            loop = asyncio.get_running_loop()
+            if self.ACK_DELAY:
+                self._ack_handle = loop.call_later(self.ACK_DELAY, self._send_sequence_ack)
+            else:
+                self._ack_handle = loop.call_soon(self._send_sequence_ack)
+
+    def _send_sequence_ack(self: "AsyncSocketClient"):
+        """ Send cumulative acknowledge of all data frames received so far """
+
+        if self._ack_handle is not None:
+            self._ack_handle.cancel()
+            self._ack_handle = None
+
+        if self._unacknowledged and self._receive_blocked_at is None and not self.transport.is_closing():
+            self._unacknowledged = 0
+            self._acked_sequence = self._recv_sequence
+            self.protocol.write(ACK_FRAME.pack(FRAME_HEADER.size, KIND_ACK, 0, self._recv_sequence))
+            self._frames_written(KIND_ACK, ACK_FRAME.size)
+
+    def _send_hello(self: "AsyncSocketClient"):
+        """ Send handshake signal with supported protocol features """
+
+        hello = {
+            'version': self.PROTOCOL_VERSION,
+            'codecs': [name for name in self.CODECS if name in CODECS],
+            'compressions': [name for name in self.COMPRESSION if name in ALGORITHMS],
+            'dictionary': dictionary_id(self.COMPRESSION_DICTIONARY),
+            'stream_window': self.STREAM_WINDOW,
+            'schemas': list(SCHEMAS_BY_ID),
+            'max_frame_size': self.MAX_FRAME_SIZE,
+        }
+
+        # the answer carries the choices made for the initiator
+        if self.peer_version:
+            hello['codec'] = self.codec.NAME
+            hello['compression'] = self.compression and self.compression.NAME
+            hello['dictionary'] = self.compression and dictionary_id(self.compression.dictionary)
+            if self.session_token is not None:
+                hello['session'] = self.session_token
+        elif self.RESUME_TIMEOUT:
+            hello['resumable'] = True
+
+        self._write_hello(hello)
+
+    def _write_hello(self: "AsyncSocketClient", hello: dict):
+        payload = json.dumps(hello).encode('utf-8')
+        self._hello_sent = True
+        self.protocol.write(struct.pack("!ii", self.SIGNAL_HELLO, len(payload)) + payload)
+
+    async def _handshake(self: "AsyncSocketClient"):
+        """ Negotiate protocol with the peer """
+
+        # the initiator opens streams with odd ids, the responder with even ones
+        self._stream_id = -1
+
+        self._send_hello()
+        await asyncio.wait([self._hello, self.protocol.closed], timeout=self.ACT_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        if not self._hello.done():
+            self.transport.close()
+            raise ConnectionRefusedError('handshake failed: the peer may support the legacy protocol only (use legacy=True)')
+        refused = self._hello.result().get('refused')
+        if refused:
+            self.transport.close()
+            raise ConnectionRefusedError(f'connection refused by the server: {refused}')
+
+    async def _wait_handshake(self: "AsyncSocketClient"):
+        """ Wait for the handshake of the initiator, ends early when the peer speaks the legacy protocol """
+
+        if not self.LEGACY:
+            await asyncio.wait([self._hello, self.protocol.closed], timeout=self.HANDSHAKE_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+
+    def _legacy_peer_detected(self: "AsyncSocketClient"):
+        """ The peer started with the legacy protocol instead of the handshake """
+
+        if not self._hello_sent and not self._hello.done():
+            self._hello.set_result(None)
+
+    def _send_ping(self: "AsyncSocketClient") -> Optional[SendPacket]:
+        """ Write ping signal, any frame or signal from the peer after it answers it """
 
         self.logger.debug('ping begin')
-        signal = struct.pack("!i", self.SIGNAL_PING)
-        self.writer.write(signal)
-        await self.writer.drain()
+        if self._ping_sent is None:
+            self._ping_sent = time.monotonic()
+
+        ping_packet = None
+        if not self.peer_version:
+            # legacy peers answer with an acknowledge signal, matched in FIFO order
+            ping_packet = SendPacket(b'__pingdatamock__', count=0, kind=0)
+            self._pending_packets.append(ping_packet)
+
+        self.protocol.write(struct.pack("!i", self.SIGNAL_PING))
+        return ping_packet
+
+    async def _ping(self: "AsyncSocketClient"):
+        """ Send ping signal and wait for the answer """
+
+        ping_packet = self._send_ping()
+        if ping_packet is None:
+            # answered by pong, data acknowledges are not involved
+            self._pong_waiter = asyncio.get_running_loop().create_future()
 
-        ping_packet = SendPacket(b'__pingdatamock__')
-        self._pending_packets.put_nowait(ping_packet)
         try:
-            await asyncio.wait_for(ping_packet.sent.wait(), timeout=self.ACT_TIMEOUT)
+            await asyncio.wait_for(self._pong_waiter if ping_packet is None else ping_packet.sent, timeout=self.ACT_TIMEOUT)
             self.logger.debug('ping done')
         except asyncio.TimeoutError:
             raise ConnectionAbortedError(f'interrupt connection: client is not active')
 
-    async def _keep_alive(self: "AsyncSocketClient"):
-        async def _receiver_task():
-            while self.is_connected:
+    def _keep_alive_deadline(self: "AsyncSocketClient") -> float:
+        """ When the peer is checked next """
+
+        if self._ping_sent is not None:
+            return self._ping_sent + self.ACT_TIMEOUT
+        deadline = self._last_received + self.PING_INTERVAL
+        if self._in_flight:
+            deadline = min(deadline, max(self._last_received, self._busy_since) + self.ACT_TIMEOUT)
+        return deadline
+
+    def _keep_alive_schedule(self: "AsyncSocketClient", when: float):
+        """ Check the peer at `when`, unless a check comes earlier (it schedules the next one itself) """
+
+        timer = self._keep_alive_timer
+        if timer is None or timer.cancelled or timer.when > when:
+            timers = get_timers()
+            if timer is not None:
+                timers.cancel(timer)
+            self._keep_alive_timer = timers.call_at(when, self._keep_alive_check)
+
+    def _ping_answered(self: "AsyncSocketClient"):
+        """ The next ping is due an interval from now, not from the ping timeout """
+
+        if self._ping_sent is not None:
+            self.logger.debug('ping done')
+            self._ping_sent = None
+            if self._keep_alive_timer is not None:
+                self._keep_alive_schedule(self._keep_alive_deadline())
+
+    def _keep_alive_check(self: "AsyncSocketClient"):
+        """
+        Called by the timers of the loop.
+        Frames and signals of the peer are proof of life: a connection with traffic is never pinged.
+        Pinged when nothing came for `PING_INTERVAL`, or for `ACT_TIMEOUT` with data frames in flight;
+        lost when nothing came for `ACT_TIMEOUT` after the ping.
+        """
+
+        self._keep_alive_timer = None
+        if not self.is_connected:
+            return
+
+        now = time.monotonic()
+        if self._ping_sent is not None:
+            if self._last_received >= self._ping_sent:
+                self.logger.debug('ping done')
+                self._ping_sent = None
+            elif now >= self._ping_sent + self.ACT_TIMEOUT:
+                self.logger.warning('ping is not answered for %s seconds', self.ACT_TIMEOUT)
+                return self.protocol.abort(ConnectionAbortedError('interrupt connection: client is not active'))
+
+        if self._ping_sent is None and now >= self._keep_alive_deadline():
+            self._send_ping()
+        self._keep_alive_schedule(self._keep_alive_deadline())
+
+    def _signal_received(self: "AsyncSocketClient", signal: int):
+        """ Called by protocol for every incoming signal """
+
+        self._last_received = time.monotonic()
+
+        # ping
+        if signal == self.SIGNAL_PING:
+            self.logger.debug('ping received')
+            self._legacy_peer_detected()
+            if self.peer_version:
+                self.protocol.write(struct.pack("!i", self.SIGNAL_PONG))
+            else:
+                self._send_ack()
+
+        # answer to ping
+        elif signal == self.SIGNAL_PONG:
+            self.logger.debug('pong received')
+            self._ping_answered()
+            if self._pong_waiter and not self._pong_waiter.done():
+                self._pong_waiter.set_result(None)
+
+        # acknowledging
+        elif signal == self.SIGNAL_ACT:
+            self.logger.debug('ack received')
+            self._legacy_peer_detected()
+            if not self._pending_packets or self._pending_packets[0].sequence is not None:
+                raise ConnectionError('got acknowledge signal, but no pending packet')
+            packet = self._pending_packets.popleft()
+            if packet.count:
+                now = time.perf_counter()
+                self._packet_acknowledged(packet, now)
+                self.metrics.ack_rtt.observe(now - packet.written)
+            else:
+                packet.finish(True)
+                self._ping_answered()
+            self._window_open.set()
+
+            self.logger.debug('packet sent done: bytes(%d)', packet.size)
+
+        # handshake, the payload comes as the next frame
+        elif signal == self.SIGNAL_HELLO and not self.LEGACY:
+            self._hello_expected = True
+
+        # the peer closes the session for good, it is not resumed
+        elif signal == self.SIGNAL_BYE and self.session_token is not None:
+            self.logger.debug('bye received')
+            self._closing = True
+
+        else:
+            raise RuntimeError(f'got unrecognized signal: {signal}')
+
+    def _hello_received(self: "AsyncSocketClient", payload: memoryview):
+        hello = json.loads(payload.tobytes())
+        if 'resumed' in hello or 'refused' in hello:
+            # answer to the resume request of this client, or the server does not serve the connection
+            if not self._hello.done():
+                self._hello.set_result(hello)
+            return
+        if not self._hello_sent and hello.get('session') is not None:
+            return self._resume_requested(hello)
+        if self._resume_only:
+            # not answered, the server decides on the connection
+            if not self._hello.done():
+                self._hello.set_result(hello)
+            return
+        self._negotiate(hello)
+
+    def _negotiate(self: "AsyncSocketClient", hello: dict):
+        """ Use the protocol features of the peer, answer the initiator """
+
+        self.peer_version = min(int(hello['version']), self.PROTOCOL_VERSION)
+
+        if self._hello_sent:
+            # answer of the peer: use its choices
+            self.session_token = hello.get('session')
+            codec_name = hello.get('codec') or JsonCodec.NAME
+            compression_name = hello.get('compression')
+            shared_dictionary = hello.get('dictionary') is not None
+        else:
+            # first options of the initiator which are supported here
+            codec_name = self._choose(hello.get('codecs', ()), self.CODECS, CODECS) or JsonCodec.NAME
+            compression_name = self._choose(hello.get('compressions', ()), self.COMPRESSION, ALGORITHMS)
+            shared_dictionary = hello.get('dictionary') is not None and hello['dictionary'] == dictionary_id(self.COMPRESSION_DICTIONARY)
 
-                # check income packets
-                try:
-                    # receive packet header
-                    assert (packet_length := await self._recv(4, timeout=1)) is not None
-                    packet_length = struct.unpack("!i", packet_length)[0]
-
-                    # it is signal
-                    if packet_length < 0:
-                        # ping
-                        if packet_length == self.SIGNAL_PING:
-                            self.logger.debug('ping received')
-                            self._last_ping_timestamp = time.time()
-                            await self._send_ack()
-
-                        # acknowledging
-                        elif packet_length == self.SIGNAL_ACT:
-                            self.logger.debug('ack received')
-                            try:
-                                packet = await asyncio.wait_for(self._pending_packets.get(), timeout=5)
-                                packet.sent.set()
-                            except asyncio.TimeoutError:
-                                raise ConnectionError('got acknowle signal, but no pending packet')
-
-                            self.logger.debug(f'packet sent done: bytes({len(packet.data)})')
-                            self._last_ping_timestamp = time.time()
-
-                        else:
-                            raise RuntimeError(f'got unrecognized signal: {packet_length}')
-
-                    else:
-                        # receive a full packet
-                        packet = await self._recv(packet_length)
-                        self.logger.debug(f'packet received: {packet}')
-
-                        # send act signal
-                        await self._send_ack()
-
-                        # put to received packets queue
-                        self._received_packets.put_nowait(packet)
-                except (asyncio.TimeoutError, AssertionError):
-                    pass
+        self.codec = CODECS[codec_name](self)
+        self._peer_stream_window = int(hello.get('stream_window') or 0)
+        self._peer_schemas = frozenset(hello.get('schemas') or ())
+        self._peer_max_frame_size = int(hello.get('max_frame_size') or MAX_FRAME_LENGTH)
+        if compression_name:
+            dictionary = self.COMPRESSION_DICTIONARY if shared_dictionary else None
+            self.compression = ALGORITHMS[compression_name](self.COMPRESSION_LEVEL, dictionary, self.MAX_FRAME_SIZE)
+        self.logger.debug('handshake received: version %d, codec %s, compression %s', self.peer_version, codec_name, compression_name)
+
+        # answer to the initiator
+        if not self._hello_sent:
+            if hello.get('resumable'):
+                self._issue_token()
+            self._send_hello()
+
+        if not self._hello.done():
+            self._hello.set_result(hello)
+
+    @staticmethod
+    def _choose(offered: Iterable[str], accepted: Iterable[str], registry: Dict[str, type]) -> Optional[str]:
+        """ First offered name which is accepted and known """
+        return next((name for name in offered if name in accepted and name in registry), None)
+
+    def _sequence_acknowledged(self: "AsyncSocketClient", sequence: int):
+        """ Release every pending data frame up to the sequence """
+
+        pending = self._pending_packets
+        now = time.perf_counter()
+        packet = None
+        while pending and pending[0].sequence is not None and sequence_reached(pending[0].sequence, sequence):
+            packet = pending.popleft()
+            self._packet_acknowledged(packet, now)
+
+        # the acknowledge answers the last frame, the ones before may have waited for it
+        if packet is not None:
+            self.metrics.ack_rtt.observe(now - packet.written)
+
+        self.logger.debug('frames acknowledged up to %d', sequence)
+        self._window_open.set()
+
+    def _frame_received(self: "AsyncSocketClient", packet: memoryview):
+        """ Called by protocol for every complete incoming packet """
+
+        self.last_activity = self._last_received = time.monotonic()
+        if self._hello_expected:
+            self._hello_expected = False
+            return self._hello_received(packet)
+
+        if is_legacy_frame(packet):
+            self.logger.debug('packet received: bytes(%d)', len(packet))
+            self._legacy_peer_detected()
+            self._frame_counted(0, packet)
+
+            # send act signal
+            self._send_ack()
+
+            # put to received packets queue
+            self._received(ReceivedPacket(self._legacy_codec, packet))
+            return
+
+        kind, flags, sequence = FRAME_HEADER.unpack_from(packet)
+        self._frame_counted(kind, packet)
+
+        if kind == KIND_ACK:
+            return self._sequence_acknowledged(sequence)
+
+        if kind in STREAM_KINDS:
+            return self._stream_frame_received(kind, flags, sequence, packet[FRAME_HEADER.size:])
+
+        if kind not in SEQUENCED_KINDS:
+            raise RuntimeError(f'got unrecognized frame kind: {kind}')
+
+        if sequence != next_sequence(self._recv_sequence):
+            if self.session_token is not None and sequence_reached(sequence, self._recv_sequence):
+                # written again after a resume, it was received on the lost connection
+                return
+            raise ConnectionError(f'got frame {sequence}, expected {next_sequence(self._recv_sequence)}')
+        self.logger.debug('frame %d received: bytes(%d)', sequence, len(packet))
+
+        self._recv_sequence = sequence
+        self._schedule_sequence_ack()
+
+        payload, attachments = packet[FRAME_HEADER.size:], ()
+        if flags & FLAG_ATTACHMENTS:
+            payload, attachments = split_attachments(payload)
+        received_packet = ReceivedPacket(self.codec, payload, attachments, bool(flags & FLAG_COMPRESSED))
+
+        if kind == KIND_DATA:
+            self._received(received_packet)
+        else:
+            self._rpc_received(kind, received_packet)
+
+    def _packets_closed(self: "AsyncSocketClient"):
+        """ Wake senders of the packets which will not be acknowledged and receivers when the connection is over """
+
+        for packet in self._pending_packets:
+            packet.finish(False)
+        if self._carried is not None:
+            self._carried.finish(False)
+            self._carried = None
+        queue = self._queue_send
+        while not queue.empty():
+            queue.get_nowait().finish(False)
+        self._received_packets.put_nowait(None)
+
+    def _stop_connection(self: "AsyncSocketClient"):
+        """ Stop the tasks and timers of the current connection at once """
+
+        for task in self._connection_tasks:
+            task.cancel()
+        if self._keep_alive_task is not None and self._keep_alive_task is not asyncio.current_task():
+            self._keep_alive_task.cancel()
+        if self._ack_handle is not None:
+            # a connection still open is stopped on purpose, the peer gets the deferred acknowledge
+            if not self.transport.is_closing():
+                self._send_sequence_ack()
+            else:
+                self._ack_handle.cancel()
+                self._ack_handle = None
+        if self._keep_alive_timer is not None:
+            get_timers().cancel(self._keep_alive_timer)
+            self._keep_alive_timer = None
+
+    def _connection_lost(self: "AsyncSocketClient", error: Optional[BaseException]):
+        """ The connection is over: a resumable session waits for a new one, otherwise it is over too """
+
+        self._stop_connection()
+        if self.INSTRUMENTATION is not None:
+            self.INSTRUMENTATION.disconnected(self, error)
+        if self._resumable:
+            self._suspend()
+        else:
+            self._session_closed()
+
+    def _session_closed(self: "AsyncSocketClient"):
+        """ Fail and wake everything waiting for the peer """
+
+        self._suspension_over()
+        self._packets_closed()
+        self._rpc_closed()
+        self._streams_closed()
+        self._send_blocked = False
+        for waiter in self._send_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _keep_alive(self: "AsyncSocketClient"):
+        """ Start the senders and the keep-alive of the current connection and read it """
+
+        protocol = self.protocol
+
+        def _fits_window(packet: SendPacket, frames: int) -> bool:
+            """ Whether the packet may be written after `frames` more data frames """
+
+            in_flight = self._in_flight + frames
+            # a packet larger than the window goes alone
+            return not in_flight or in_flight + packet.count <= self.WINDOW_SIZE
 
         async def _sender_task():
-            ping_task = None
+            queue = self._queue_send
             while self.is_connected:
-                try:
-                    await asyncio.sleep(.01)
-
-                    # time to ping
-                    if time.time() > self._last_ping_timestamp + self.PING_INTERVAL:
-                        if not ping_task:
-                            ping_task = asyncio.create_task(self._ping())
-                        elif ping_task.done():
-                            if ping_task.exception():
-                                self.logger.debug(f'ping exception: {ping_task.exception()}')
-                                raise ping_task.exception()
-                            ping_task = None
-                            self._last_ping_timestamp = time.time()
-
-                    # execute send
-                    if self._queue_send.qsize():
-                        send_packet = await self._queue_send.get()
-                        self.logger.debug(f'sending packet: bytes({len(send_packet.data)})')
-
-                        # send
-                        self.writer.write(send_packet.data)
-                        await self.writer.drain()
-
-                        # packet status: pending
-                        self._pending_packets.put_nowait(send_packet)
-
-                except asyncio.TimeoutError:
-                    continue
+                # sleep until a packet is queued, the one taken before a lost connection goes first
+                send_packet = self._carried = self._carried or await queue.get()
+                self.logger.debug('sending packet: bytes(%d)', send_packet.size)
+
+                # data frames wait for a free slot in the window
+                while not _fits_window(send_packet, 0):
+                    self._window_open.clear()
+                    await self._window_open.wait()
+
+                # packets queued meanwhile are written together, optionally after waiting for more (Nagle)
+                packets, frames = [send_packet], send_packet.count
+                if self.COALESCE_LINGER and frames < self.COALESCE_SIZE and queue.qsize() < self.COALESCE_SIZE - frames:
+                    await asyncio.sleep(self.COALESCE_LINGER / 1000000)
+                self._carried = None
+                while frames < self.COALESCE_SIZE and not queue.empty():
+                    packet = queue.get_nowait()
+                    if not _fits_window(packet, frames):
+                        self._carried = packet
+                        break
+                    packets.append(packet)
+                    frames += packet.count
+
+                # send and mark as pending before yielding, so the order matches acknowledges
+                self._write_packets(packets)
+                await protocol.drain()
 
         async def _keep_alive_task():
+            tasks = self._connection_tasks = [
+                asyncio.create_task(_sender_task()),
+                asyncio.create_task(self._stream_sender()),
+            ]
             try:
-                await asyncio.gather(_receiver_task(), _sender_task())
-            except:
-                self.logger.warning(traceback.format_exc())
+                # any finished task or lost connection means the connection is over
+                done, _ = await asyncio.wait([*tasks, protocol.closed], return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if exc := task.result():
+                        raise exc
+            except BaseException as exc:
+                error = exc
+                if self.protocol is protocol and not self._handed_over:
+                    self.logger.warning('connection is over', exc_info=True)
+            else:
+                error = protocol.closed.result() if protocol.closed.done() else None
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # a connection handed over to another session, or replaced by a resume, is not this one's anymore
+                if not self._handed_over:
+                    protocol.transport.close()
+                    if self.protocol is protocol:
+                        self._connection_lost(error)
+
+        self._keep_alive_task = asyncio.create_task(_keep_alive_task())
+        self._keep_alive_schedule(self._keep_alive_deadline())
 
-        self._keep_alive_task = asyncio.create_task(_keep_alive_task())
\ No newline at end of file
+        # incoming packets are processed by protocol callbacks
+        protocol.attach(self._frame_received, self._signal_received)
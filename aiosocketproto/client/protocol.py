@@ -0,0 +1,265 @@
+import asyncio
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+from .buffers import BufferPool, get_pool
+from .frame import FRAME_LENGTH as HEADER, MAX_FRAME_LENGTH
+
+
+def unix_address(path: str) -> str:
+    """ Path of a Unix domain socket, a leading '@' stands for the NUL byte of the abstract namespace """
+    return '\0' + path[1:] if path.startswith('@') else path
+
+
+class FrameProtocol(asyncio.BufferedProtocol):
+    """
+    Receiver of length-prefixed frames and negative signal codes.
+
+    Data is read straight into a buffer of a process-wide pool, held only until the read is parsed to the end.
+    Small frames are copied out of it, large frames get a buffer of their exact size
+    and the socket reads the rest of the frame directly into it.
+    Complete frames are handed out as memoryviews. A length over `max_frame_size` aborts the connection
+    before anything is buffered for it.
+
+    All writes go through the protocol, so they can be held while a file is sent with `sendfile`.
+    """
+
+    BUFFER_SIZE = 256 * 1024 # reusable receive buffer
+    POOLED_BUFFERS = 16 # free receive buffers kept for the connections of the process
+    LARGE_FRAME_SIZE = 64 * 1024 # frames from this size are read into their own buffer
+
+    transport: Optional[asyncio.Transport]
+    closed: asyncio.Future # result is the exception that closed the connection (or None)
+    bytes_received: int
+    bytes_sent: int # handed to the transport (or held during sendfile)
+    max_frame_size: int # longest frame accepted, header included
+
+    _pool: BufferPool
+    _view: Optional[memoryview] # receive buffer taken from the pool, None - nothing to parse
+    _start: int # first not parsed byte in buffer
+    _end: int # end of received data in buffer
+    _frame: Optional[bytearray] # buffer of a large frame in progress
+    _frame_view: Optional[memoryview]
+    _frame_filled: int
+    _frame_received: Optional[Callable[[memoryview], None]]
+    _signal_received: Optional[Callable[[int], None]]
+    _exception: Optional[BaseException]
+    _paused: bool
+    _drain_waiters: deque
+    _sendfile: Optional[asyncio.Future] # set while a file is sent
+    _held_writes: list # written during sendfile, flushed after it
+
+    def __init__(self, connection_made_callback: Callable[["FrameProtocol"], None] = None):
+        self._connection_made_callback = connection_made_callback
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.max_frame_size = MAX_FRAME_LENGTH
+
+        self._pool = get_pool(self.BUFFER_SIZE, self.POOLED_BUFFERS)
+        self._view = None
+        self._start = 0
+        self._end = 0
+        self._frame = None
+        self._frame_view = None
+        self._frame_filled = 0
+
+        self._frame_received = None
+        self._signal_received = None
+        self._exception = None
+        self._paused = False
+        self._drain_waiters = deque()
+        self._sendfile = None
+        self._held_writes = []
+
+    def attach(self, frame_received: Callable[[memoryview], None], signal_received: Callable[[int], None]):
+        """ Set consumers of incoming frames and signals and start reading """
+
+        self._frame_received = frame_received
+        self._signal_received = signal_received
+        if not self.closed.done():
+            self.transport.resume_reading()
+
+    @property
+    def is_closed(self) -> bool:
+        return self.closed.done()
+
+    async def drain(self):
+        """ Wait until the transport write buffer is flushed below the high-water mark """
+
+        if self.closed.done():
+            raise ConnectionResetError('connection lost')
+        while self._sendfile is not None:
+            await asyncio.shield(self._sendfile)
+        if not self._paused:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._drain_waiters.append(waiter)
+        await waiter
+
+    def write(self, data: bytes):
+        self.bytes_sent += len(data)
+        if self._sendfile is not None:
+            self._held_writes.append(data)
+        else:
+            self.transport.write(data)
+
+    def writelines(self, segments: Sequence[bytes]):
+        """ Write buffers without joining them, scatter-gather where the transport supports it """
+
+        self.bytes_sent += sum(len(segment) for segment in segments)
+        self._writelines(segments)
+
+    def _writelines(self, segments: Sequence[bytes]):
+        if self._sendfile is not None:
+            self._held_writes.extend(segments)
+        elif type(self.transport).writelines is asyncio.WriteTransport.writelines:
+            # default implementation concatenates the buffers
+            for segment in segments:
+                self.transport.write(segment)
+        else:
+            self.transport.writelines(segments)
+
+    async def sendfile(self, head: bytes, file, offset: int, count: int):
+        """
+        Write head and `count` bytes of a binary file from `offset` as is.
+        The kernel copies the file to the socket where the transport supports it (`os.sendfile`),
+        other writes are held until the file is sent.
+        """
+
+        loop = asyncio.get_running_loop()
+        self.bytes_sent += len(head) + count
+        self.transport.write(head)
+        self._sendfile = loop.create_future()
+        try:
+            await loop.sendfile(self.transport, file, offset, count)
+        finally:
+            sendfile, self._sendfile = self._sendfile, None
+            sendfile.set_result(None)
+            held, self._held_writes = self._held_writes, []
+            if not self.transport.is_closing():
+                self._writelines(held)
+
+    def abort(self, exc: BaseException):
+        """ Close the connection at once, `closed` gets the exception """
+
+        self._exception = exc
+        self.transport.abort()
+
+    async def wait_closed(self):
+        await asyncio.shield(self.closed)
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+        # nothing is read until consumers are attached
+        transport.pause_reading()
+
+        if self._connection_made_callback:
+            self._connection_made_callback(self)
+
+    def connection_lost(self, exc: Optional[Exception]):
+        if not self.closed.done():
+            self.closed.set_result(self._exception or exc)
+        self._wake_drain_waiters(ConnectionResetError('connection lost'))
+        self._release_buffer()
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain_waiters()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._frame is not None:
+            return self._frame_view[self._frame_filled:]
+
+        if self._view is None:
+            self._view = self._pool.acquire()
+
+        # no space left: move the incomplete tail to the beginning
+        elif self._end == len(self._view):
+            self._compact()
+
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int):
+        self.bytes_received += nbytes
+        try:
+            if self._frame is not None:
+                self._frame_filled += nbytes
+                if self._frame_filled == len(self._frame):
+                    frame = self._frame_view
+                    self._frame = self._frame_view = None
+                    self._frame_received(frame)
+                return
+
+            self._end += nbytes
+            self._parse()
+        except Exception as exc:
+            self.abort(exc)
+
+    def eof_received(self):
+        return False
+
+    def _parse(self):
+        buffer = self._view
+        while (available := self._end - self._start) >= HEADER.size:
+            length = HEADER.unpack_from(buffer, self._start)[0]
+
+            # signal
+            if length < 0:
+                self._start += HEADER.size
+                self._signal_received(length)
+                continue
+            if length > self.max_frame_size:
+                raise ConnectionError(f'frame of {length} bytes is over the limit of {self.max_frame_size}')
+
+            # complete frame in buffer
+            frame_start = self._start + HEADER.size
+            if available - HEADER.size >= length:
+                self._start = frame_start + length
+                self._frame_received(memoryview(self._view[frame_start:self._start].tobytes()))
+                continue
+
+            # incomplete large frame, the rest is read directly into its own buffer
+            if length >= self.LARGE_FRAME_SIZE or length > len(buffer) - HEADER.size:
+                self._frame = bytearray(length)
+                self._frame_view = memoryview(self._frame)
+                self._frame_filled = self._end - frame_start
+                self._frame_view[:self._frame_filled] = self._view[frame_start:self._end]
+                self._release_buffer()
+                return
+
+            # incomplete small frame, make sure it fits the buffer tail
+            if frame_start + length > len(buffer):
+                self._compact()
+            return
+
+        if self._start == self._end:
+            self._release_buffer()
+
+    def _compact(self):
+        tail = self._end - self._start
+        self._view[:tail] = self._view[self._start:self._end].tobytes()
+        self._start, self._end = 0, tail
+
+    def _release_buffer(self):
+        """ Give the receive buffer back to the pool, nothing in it is waiting to be parsed """
+
+        if self._view is not None:
+            self._pool.release(self._view)
+            self._view = None
+        self._start = self._end = 0
+
+    def _wake_drain_waiters(self, exc: Exception = None):
+        while self._drain_waiters:
+            waiter = self._drain_waiters.popleft()
+            if waiter.done():
+                continue
+            if exc is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(exc)
@@ -0,0 +1,27 @@
+import asyncio
+from typing import Sequence
+
+from .codec import Codec
+
+
+class ReceivedPacket:
+    codec: Codec # codec the payload was encoded with
+    payload: memoryview
+    attachments: Sequence[memoryview]
+    compressed: bool # payload is compressed with the negotiated compression
+    size: int # bytes held by the packet
+
+    def __init__(self, codec: Codec, payload: memoryview, attachments: Sequence[memoryview] = (), compressed: bool = False):
+        self.codec = codec
+        self.payload = payload
+        self.attachments = attachments
+        self.compressed = compressed
+        self.size = len(payload) + sum(attachment.nbytes for attachment in attachments)
+
+
+class ReceiveQueue(asyncio.Queue):
+    """ Received packets, a packet taken and not returned by receive is put back in front of the others """
+
+    def put_back(self, packet: ReceivedPacket):
+        self.put_nowait(packet)
+        self._queue.rotate(1)
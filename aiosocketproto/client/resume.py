@@ -0,0 +1,240 @@
+"""
+Sessions resumed on a new connection.
+
+When both peers set RESUME_TIMEOUT the server issues a session token in the handshake. A lost connection
+suspends the session instead of closing it: sends, calls and receives keep waiting, and the frames written
+and not acknowledged stay pending. They are the replay buffer, bounded by WINDOW_SIZE on both sides.
+The client connects again with the token and the last sequence it received, the server answers with its own,
+and both sides write again only the frames after the sequence the other one received.
+
+A session not resumed within RESUME_TIMEOUT is closed. `close()` on either side tells the peer not to wait.
+Streams are not resumed, they fail with the lost connection.
+"""
+import asyncio
+import secrets
+import struct
+import time
+from abc import ABC
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, Tuple
+
+from .protocol import FrameProtocol
+from .stats import ResumeStats
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+RETRY_DELAY = 0.05 # seconds before the next connection attempt of a client, doubled after every failed one
+MAX_RETRY_DELAY = 2
+
+
+class Resume(ABC):
+    session_token: Optional[str] # issued by the server in the handshake, None - the session is not resumable
+    resume_stats: ResumeStats
+    _connector: Optional[Callable[[], Awaitable[Tuple[asyncio.Transport, FrameProtocol]]]] # connects to the server again (clients)
+    _resumable_sessions: Optional[Dict[str, "AsyncSocketClient"]] # sessions of the server by token (server sessions)
+    _suspended: bool # the connection is lost, the session waits for a new one
+    _suspended_at: float # monotonic time the connection was lost
+    _closing: bool # closed on purpose by either peer, not resumed
+    _handed_over: bool # the connection asked to resume another session of the server, this one is dropped
+    _resume_only: bool # the handshake is read to resume a session, any other one is not answered (server connections over a limit)
+    _resume_handle: Optional[asyncio.TimerHandle] # end of the wait of a server session
+    _resume_task: Optional[asyncio.Task] # connection attempts of a client
+
+    def __init__(self: "AsyncSocketClient"):
+        super().__init__()
+        self.session_token = None
+        self.resume_stats = ResumeStats()
+        self._connector = None
+        self._resumable_sessions = None
+        self._suspended = False
+        self._suspended_at = 0.
+        self._closing = False
+        self._handed_over = False
+        self._resume_only = False
+        self._resume_handle = None
+        self._resume_task = None
+
+    @property
+    def _resumable(self: "AsyncSocketClient") -> bool:
+        return self.session_token is not None and not self._closing
+
+    def _issue_token(self: "AsyncSocketClient"):
+        """ Make the session resumable for the initiator of the handshake (server sessions) """
+
+        if self.RESUME_TIMEOUT and self._resumable_sessions is not None:
+            self.session_token = secrets.token_urlsafe(16)
+            self._resumable_sessions[self.session_token] = self
+
+    def _suspend(self: "AsyncSocketClient"):
+        """ Wait for a new connection, the client makes it """
+
+        self._suspended = True
+        self._suspended_at = time.monotonic()
+        self.resume_stats.suspended += 1
+        self._streams_failed(ConnectionResetError('connection lost, streams are not resumed'))
+        self.logger.info('connection lost, the session may be resumed for %s seconds', self.RESUME_TIMEOUT)
+
+        if self._connector is not None:
+            self._resume_task = asyncio.create_task(self._reconnect())
+        else:
+            self._resume_handle = asyncio.get_running_loop().call_later(self.RESUME_TIMEOUT, self._resume_expired)
+
+    def _resume_expired(self: "AsyncSocketClient"):
+        self._resume_handle = None
+        self.logger.info('session is not resumed in %s seconds', self.RESUME_TIMEOUT)
+        self._session_closed()
+
+    def _suspension_over(self: "AsyncSocketClient"):
+        """ Stop waiting for a new connection, the session is not resumable anymore """
+
+        self._suspended = False
+        if self._resume_handle is not None:
+            self._resume_handle.cancel()
+            self._resume_handle = None
+        if self._resume_task is not None and self._resume_task is not asyncio.current_task():
+            self._resume_task.cancel()
+        self._resume_task = None
+        if self.session_token is not None and self._resumable_sessions is not None:
+            if self._resumable_sessions.get(self.session_token) is self:
+                del self._resumable_sessions[self.session_token]
+
+    async def _reconnect(self: "AsyncSocketClient"):
+        """ Connect again until the session is resumed, refused or RESUME_TIMEOUT is over """
+
+        deadline = self._suspended_at + self.RESUME_TIMEOUT
+        delay = RETRY_DELAY
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                if not await self._resume_connection(remaining):
+                    break
+                return
+            except (OSError, asyncio.TimeoutError) as exc:
+                self.logger.debug('session is not resumed: %r', exc)
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+        self._session_closed()
+
+    async def _resume_connection(self: "AsyncSocketClient", timeout: float) -> bool:
+        """ Ask the server to resume the session on a new connection, False when it does not know it """
+
+        _, protocol = await asyncio.wait_for(self._connector(), timeout)
+        try:
+            self._use_protocol(protocol)
+            self._hello = asyncio.get_running_loop().create_future()
+            self._write_hello({'version': self.PROTOCOL_VERSION, 'session': self.session_token, 'received': self._resume_sequence()})
+            protocol.attach(self._frame_received, self._signal_received)
+            await asyncio.wait([self._hello, protocol.closed], timeout=min(self.ACT_TIMEOUT, timeout), return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            protocol.transport.abort()
+            raise
+
+        if not self._hello.done():
+            protocol.transport.abort()
+            raise ConnectionResetError('no answer to resume the session')
+        hello = self._hello.result()
+        if hello.get('refused'):
+            protocol.transport.close()
+            raise ConnectionRefusedError(f'connection refused by the server: {hello["refused"]}')
+        if not hello.get('resumed'):
+            self.logger.info('session is not resumed: the server does not know it')
+            protocol.transport.close()
+            return False
+
+        self._resumed(int(hello['received']))
+        return True
+
+    def _resume_requested(self: "AsyncSocketClient", hello: dict):
+        """ Handshake of a client resuming a session: the connection is handed over to it (server sessions) """
+
+        sessions = self._resumable_sessions
+        session = sessions.get(hello['session']) if sessions is not None else None
+        if not self._hello.done():
+            self._hello.set_result(hello)
+
+        self._handed_over = True
+        self._stop_connection()
+        if session is None or session._closing:
+            self.logger.info('session to resume is not found')
+            self._write_hello({'version': self.PROTOCOL_VERSION, 'resumed': False})
+            self.transport.close()
+            return
+        session._resume(self.protocol, int(hello.get('received') or 0))
+
+    def _resume(self: "AsyncSocketClient", protocol: FrameProtocol, received: int):
+        """ Continue on the connection of a resume request (server sessions) """
+
+        if not self._suspended:
+            # the lost connection is not noticed here yet
+            error = ConnectionResetError('session is resumed on a new connection')
+            self.protocol.abort(error)
+            self._connection_lost(error)
+        if self._resume_handle is not None:
+            self._resume_handle.cancel()
+            self._resume_handle = None
+
+        self._use_protocol(protocol)
+        self._write_hello({'version': self.PROTOCOL_VERSION, 'session': self.session_token, 'resumed': True, 'received': self._resume_sequence()})
+        self._resumed(received)
+
+    def _use_protocol(self: "AsyncSocketClient", protocol: FrameProtocol):
+        """ Move the session to a new connection, byte counters go on """
+
+        protocol.bytes_received += self.protocol.bytes_received
+        protocol.bytes_sent += self.protocol.bytes_sent
+        protocol.max_frame_size = self.MAX_FRAME_SIZE
+        self.protocol = protocol
+        self.transport = protocol.transport
+
+    def _resume_sequence(self: "AsyncSocketClient") -> int:
+        """ Received sequence for the resume handshake, it acknowledges the frames up to it """
+
+        # held back acknowledges stay held back
+        if self._receive_blocked_at is not None:
+            return self._acked_sequence
+        self._unacknowledged = 0
+        self._acked_sequence = self._recv_sequence
+        return self._recv_sequence
+
+    def _resumed(self: "AsyncSocketClient", received: int):
+        """ Release the frames the peer received, write the other pending ones again and go on """
+
+        self._sequence_acknowledged(received)
+
+        now = time.monotonic()
+        stats = self.resume_stats
+        stats.resumed += 1
+        stats.suspended_seconds += now - self._suspended_at
+        if self._pending_packets:
+            segments = []
+            written = time.perf_counter()
+            for packet in self._pending_packets:
+                segments.append(packet.data)
+                segments.extend(packet.attachments)
+                packet.written = written
+                stats.replayed_frames += packet.count
+                stats.replayed_bytes += packet.size
+            self.protocol.writelines(segments)
+
+        self._suspended = False
+        self._resume_task = None
+        self._ping_sent = None
+        self._last_received = self._busy_since = now
+        self._keep_alive()
+        self.logger.info('session resumed, %d frames pending', self._in_flight)
+        if self.INSTRUMENTATION is not None:
+            self.INSTRUMENTATION.resumed(self)
+
+    def _end_session(self: "AsyncSocketClient"):
+        """ Close the session for good, the peer does not wait for a new connection """
+
+        if self._handed_over:
+            return
+        self._closing = True
+        if self._suspended:
+            self._session_closed()
+        elif not self.transport.is_closing():
+            # frames taken just before the close are acknowledged, the peer's sends succeed
+            self._send_sequence_ack()
+            if self.session_token is not None:
+                self.protocol.write(struct.pack("!i", self.SIGNAL_BYE))
+            self.transport.close()
@@ -0,0 +1,165 @@
+import asyncio
+import inspect
+from abc import ABC
+from collections import ChainMap
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set
+
+from .frame import CALL_ID, KIND_CALL, KIND_ERROR, KIND_RESULT
+from .received_packet import ReceivedPacket
+from .send_packet import SendPacket
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+
+class RpcError(Exception):
+    """ Exception raised by a remote handler """
+
+    type: str # class name of the remote exception
+
+    def __init__(self, type: str, message: str):
+        super().__init__(f'{type}: {message}')
+        self.type = type
+
+
+class Rpc(ABC):
+    """
+    Request/response calls multiplexed on the connection.
+    Every call has a correlation id, so any number of calls may be in flight and complete in any order.
+    The id is written ahead of the encoded message: a message which cannot be decoded still gets its answer.
+    """
+
+    handlers: ChainMap # method name -> handler(session, **args)
+    _calls: Dict[int, asyncio.Future] # calls waiting for result by id
+    _call_id: int
+    _handler_tasks: Set[asyncio.Task]
+
+    def __init__(self: "AsyncSocketClient"):
+        super().__init__()
+        self.handlers = ChainMap({})
+        self._calls = {}
+        self._call_id = 0
+        self._handler_tasks = set()
+
+    def add_handler(self: "AsyncSocketClient", method: str, handler: Callable):
+        """ Register a handler of calls from the peer: `handler(session, **args)`, sync or async """
+
+        if not callable(handler):
+            raise ValueError('Unsupported handler type')
+        self.handlers[method] = handler
+
+    async def call(self: "AsyncSocketClient", method: str, timeout: Optional[float] = None, **args):
+        """ Call a handler of the peer and return its result """
+
+        if not self.peer_version:
+            raise RuntimeError('calls are not supported by the legacy protocol')
+
+        self._call_id += 1
+        call_id = self._call_id
+        result = self._calls[call_id] = asyncio.get_running_loop().create_future()
+
+        try:
+            await self._wait_send_queue()
+            await self._in_send_order(self._queue_rpc, call_id, {'method': method, 'args': args}, KIND_CALL)
+            return await asyncio.wait_for(result, timeout=timeout)
+        finally:
+            self._calls.pop(call_id, None)
+
+    def _rpc_received(self: "AsyncSocketClient", kind: int, packet: ReceivedPacket):
+        """ Called for every incoming call, result and error frame """
+
+        if kind == KIND_CALL:
+            # handlers run concurrently
+            task = asyncio.create_task(self._handle_call(packet))
+            self._handler_tasks.add(task)
+            task.add_done_callback(self._handler_tasks.discard)
+            return
+
+        try:
+            call_id, body = self._rpc_envelope(packet)
+        except Exception:
+            self.logger.exception('call answer without a readable id is dropped')
+            return
+        result = self._calls.get(call_id)
+
+        # caller has gone (timeout)
+        if result is None or result.done():
+            return
+
+        try:
+            message = packet.codec.decode(body, packet.attachments)
+        except Exception as exc:
+            # the call fails, the connection goes on
+            result.set_exception(exc)
+            return
+
+        if kind == KIND_RESULT:
+            result.set_result(message['result'])
+        else:
+            result.set_exception(RpcError(message['type'], message['message']))
+
+    async def _handle_call(self: "AsyncSocketClient", packet: ReceivedPacket):
+        try:
+            call_id, body = self._rpc_envelope(packet)
+        except Exception:
+            self.logger.exception('call without a readable id is dropped')
+            return
+
+        try:
+            message = packet.codec.decode(body, packet.attachments)
+            handler = self.handlers.get(message['method'])
+            if handler is None:
+                raise LookupError(f'unknown method: {message["method"]}')
+
+            result = handler(self, **message['args'])
+            if inspect.isawaitable(result):
+                result = await result
+
+            answer, kind = {'result': result}, KIND_RESULT
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.logger.debug('call %d failed', call_id, exc_info=True)
+            answer, kind = self._rpc_error(exc), KIND_ERROR
+
+        # a suspended session sends it once resumed
+        if self.is_connected or self._suspended:
+            await self._in_send_order(self._queue_rpc, call_id, answer, kind)
+
+    def _encode_rpc(self: "AsyncSocketClient", call_id: int, data: dict, kind: int) -> SendPacket:
+        """ Encode and frame a call, result or error message after its call id """
+
+        attachments = []
+        payload = CALL_ID.pack(call_id) + self.codec.encode(data, attachments)
+        return self._make_packet(payload, attachments, kind)
+
+    def _queue_rpc(self: "AsyncSocketClient", call_id: int, data: dict, kind: int):
+        if kind == KIND_CALL:
+            packet = self._encode_rpc(call_id, data, kind)
+        else:
+            # a result which cannot be sent is an error of the call
+            try:
+                packet = self._encode_rpc(call_id, data, kind)
+            except Exception as exc:
+                self.logger.debug('result of call %d is not sent', call_id, exc_info=True)
+                packet = self._encode_rpc(call_id, self._rpc_error(exc), KIND_ERROR)
+        self._enqueue(packet)
+
+    @staticmethod
+    def _rpc_error(exc: Exception) -> dict:
+        return {'type': type(exc).__name__, 'message': str(exc)}
+
+    def _rpc_envelope(self: "AsyncSocketClient", packet: ReceivedPacket) -> (int, memoryview):
+        """ Call id and the encoded message of a call, result or error frame """
+
+        payload = self._decompress(packet.payload) if packet.compressed else packet.payload
+        return CALL_ID.unpack_from(payload)[0], memoryview(payload)[CALL_ID.size:]
+
+    def _rpc_closed(self: "AsyncSocketClient"):
+        """ Fail calls in flight and stop handlers when the connection is over """
+
+        for result in self._calls.values():
+            if not result.done():
+                result.set_exception(ConnectionRefusedError('connection refused'))
+        for task in self._handler_tasks:
+            task.cancel()
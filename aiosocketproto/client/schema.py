@@ -0,0 +1,156 @@
+"""
+Message schemas.
+
+A dataclass, NamedTuple or `__slots__` class registered as a schema is sent as its schema id followed by
+the field values in declared order, without field names. Fields annotated as `int`, `float` or `bool`
+are packed together with one `struct` call, the other fields are encoded as usual.
+Peers exchange the ids of their schemas in the handshake, a record is sent only to a peer which has its schema.
+"""
+import dataclasses
+import struct
+import sys
+import typing
+import zlib
+from operator import attrgetter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+PACKED_TYPES = {int: 'q', float: 'd', bool: '?'} # annotations of fields packed with struct
+SCHEMA_HEAD = '!BI' # binary tag, schema id
+
+SCHEMAS: Dict[type, "Schema"] = {} # by class
+SCHEMAS_BY_ID: Dict[int, "Schema"] = {}
+
+
+def module_name(cls: type) -> str:
+    """ Module of a class, the main module of a spawned process (`__mp_main__`) is named as in the parent """
+    return '__main__' if cls.__module__ == '__mp_main__' else cls.__module__
+
+
+class Schema:
+    """ Compiled encoder and decoder of a message type """
+
+    cls: type
+    name: str
+    id: int # crc32 of the name and the field layout, the same on peers with the same definition
+    tag: str # type tag of the JSON codec
+    fields: Tuple[str, ...] # in declared order
+    packed: Tuple[str, ...] # fields packed with struct
+    other: Tuple[str, ...] # fields encoded by the codec
+    struct: struct.Struct # tag, id and packed fields
+    packed_struct: struct.Struct # packed fields only
+
+    _get_packed: Callable[[object], tuple]
+    _get_other: Callable[[object], tuple]
+    _get_fields: Callable[[object], tuple]
+    _order: List[int] # position of every field in packed + other
+    _build: Callable[[Sequence], object]
+
+    def __init__(self, cls: type, fields: Sequence[str], annotations: Dict[str, type], build: Callable[[Sequence], object]):
+        self.cls = cls
+        self.name = f'{module_name(cls)}.{cls.__qualname__}'
+        self.fields = tuple(fields)
+        self.packed = tuple(name for name in fields if annotations.get(name) in PACKED_TYPES)
+        self.other = tuple(name for name in fields if name not in self.packed)
+
+        layout = ','.join(f'{name}:{PACKED_TYPES.get(annotations.get(name), "*")}' for name in fields)
+        self.id = zlib.crc32(f'{self.name}({layout})'.encode('utf-8'))
+        self.tag = sys.intern(f'schema:{self.id:08x}')
+
+        codes = ''.join(PACKED_TYPES[annotations[name]] for name in self.packed)
+        self.struct = struct.Struct(SCHEMA_HEAD + codes)
+        self.packed_struct = struct.Struct('!' + codes)
+        self._get_packed = _getter(self.packed)
+        self._get_other = _getter(self.other)
+        self._get_fields = _getter(self.fields)
+        positions = self.packed + self.other
+        self._order = [positions.index(name) for name in fields]
+        self._build = build
+
+    def pack(self, tag: int, value: object) -> bytes:
+        """ Head of a record: tag, schema id and the packed fields """
+
+        try:
+            return self.struct.pack(tag, self.id, *self._get_packed(value))
+        except struct.error as exc:
+            raise ValueError(f'{self.name}: {exc}') from None
+
+    def unpack(self, payload: memoryview, offset: int) -> (tuple, int):
+        """ Packed fields after the schema id """
+        return self.packed_struct.unpack_from(payload, offset), offset + self.packed_struct.size
+
+    def values(self, value: object) -> tuple:
+        return self._get_fields(value)
+
+    def other_values(self, value: object) -> tuple:
+        return self._get_other(value)
+
+    def build(self, packed: Sequence, other: Sequence) -> object:
+        """ Record from the packed fields and the other fields """
+
+        values = (*packed, *other)
+        return self._build([values[position] for position in self._order])
+
+    def from_values(self, values: Sequence) -> object:
+        return self._build(values)
+
+    def __repr__(self):
+        return f'<Schema {self.name} id={self.id:08x} fields={self.fields}>'
+
+
+def _getter(fields: Sequence[str]) -> Callable[[object], tuple]:
+    """ attrgetter which always returns a tuple """
+
+    if not fields:
+        return lambda value: ()
+    if len(fields) == 1:
+        get = attrgetter(fields[0])
+        return lambda value: (get(value),)
+    return attrgetter(*fields)
+
+
+def _slots_builder(cls: type, fields: Sequence[str]) -> Callable[[Sequence], object]:
+    def build(values: Sequence) -> object:
+        record = cls.__new__(cls)
+        for name, value in zip(fields, values):
+            object.__setattr__(record, name, value)
+        return record
+    return build
+
+
+def register_schema(cls: type) -> type:
+    """
+    Send instances of a dataclass, NamedTuple or `__slots__` class as a compact record.
+    Register the same class on both peers. Can be used as a class decorator.
+    """
+
+    try:
+        annotations = typing.get_type_hints(cls)
+    except Exception:
+        annotations = getattr(cls, '__annotations__', {})
+
+    if dataclasses.is_dataclass(cls):
+        fields = [field.name for field in dataclasses.fields(cls) if field.init]
+        if len(fields) != len(dataclasses.fields(cls)):
+            raise ValueError(f'{cls.__name__}: dataclass fields with init=False are not supported')
+        build = lambda values: cls(*values)
+    elif issubclass(cls, tuple) and hasattr(cls, '_fields'):
+        fields = list(cls._fields)
+        build = lambda values: cls(*values)
+    elif '__slots__' in cls.__dict__:
+        fields = [
+            name for klass in reversed(cls.__mro__) if '__slots__' in klass.__dict__
+            for name in ((klass.__slots__,) if isinstance(klass.__slots__, str) else klass.__slots__)
+            if name not in ('__dict__', '__weakref__')
+        ]
+        build = _slots_builder(cls, fields)
+    else:
+        raise ValueError(f'{cls.__name__}: a schema must be a dataclass, NamedTuple or a class with __slots__')
+
+    schema = Schema(cls, fields, annotations, build)
+    known = SCHEMAS_BY_ID.get(schema.id)
+    if known is not None and known.name != schema.name:
+        raise ValueError(f'{schema.name}: schema id collides with {known.name}')
+
+    SCHEMAS[cls] = schema
+    SCHEMAS_BY_ID[schema.id] = schema
+    return cls
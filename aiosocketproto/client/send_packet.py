@@ -1,10 +1,34 @@
 import asyncio
+import time
+from typing import Optional, Sequence
+
+from .frame import KIND_DATA
 
 
 class SendPacket:
+    __slots__ = ('data', 'sent', 'sequence', 'attachments', 'count', 'size', 'kind', 'created', 'written')
+
     data: bytes
-    sent: asyncio.Event
+    sent: asyncio.Future # True once acknowledged, False when the connection is over before
+    sequence: Optional[int] # data frame sequence (the last one of a batch), None for legacy packets
+    attachments: Sequence[memoryview] # written after data as is (byte views)
+    count: int # data frames in the packet
+    size: int # bytes to write
+    kind: int # frame kind, 0 for legacy packets
+    created: float # perf_counter at encoding
+    written: float # perf_counter at writing to the transport
 
-    def __init__(self, data: bytes):
+    def __init__(self, data: bytes, sequence: Optional[int] = None, attachments: Sequence[memoryview] = (), count: int = 1, kind: int = KIND_DATA):
         self.data = data
-        self.sent = asyncio.Event()
+        self.sent = asyncio.get_running_loop().create_future()
+        self.sequence = sequence
+        self.attachments = attachments
+        self.count = count
+        self.size = len(data) + sum(len(attachment) for attachment in attachments)
+        self.kind = kind
+        self.created = time.perf_counter()
+        self.written = self.created
+
+    def finish(self, sent: bool):
+        if not self.sent.done():
+            self.sent.set_result(sent)
@@ -1,10 +1,17 @@
+import sys
 from abc import ABC
-from typing import TYPE_CHECKING, Type
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple, Type
+
+from .schema import SCHEMAS, SCHEMAS_BY_ID, Schema, module_name
 
 if TYPE_CHECKING:
     from .client import AsyncSocketClient
 
 SIMPLE_TYPES = (int, float, str, bool)
+PRIMITIVE_TYPES = frozenset((type(None), *SIMPLE_TYPES)) # returned as they are
+
+# handlers of subclasses are taken from these bases
+BUILTIN_HANDLERS = frozenset((type(None), *SIMPLE_TYPES, list, tuple, set, dict))
 
 CUSTOM_TYPE_HEADER = '__customtype__'
 TUPLE_TYPE_NAME = 'builtins.tuple'
@@ -54,72 +61,178 @@ class ByteArraySerializer(SerializerType):
         return bytearray.fromhex(data)
 
 
+class MemoryViewSerializer(SerializerType):
+    """ Default Memoryview Serializer (attachments are received as memoryviews) """
+
+    INSTANCE = memoryview
+
+    @classmethod
+    def serialize(cls, data: memoryview) -> str:
+        return data.hex()
+
+    @classmethod
+    def deserialize(cls, data: str) -> memoryview:
+        return memoryview(bytes.fromhex(data))
+
+
 class Serializer(ABC):
-    """ Serializer for simple data types """
+    """
+    Serializer for simple data types.
+    Values are dispatched by their exact type to a handler, the handler of a subclass of a builtin type
+    is found once by its MRO and cached. Lists and dicts of primitive values are not walked value by value.
+    """
+
+    _serializers: Dict[type, Callable[[any], any]] # handlers by exact type, filled on first use
+    _custom_types: Dict[type, Optional[Tuple[str, Type[SerializerType]]]] # tag and serializer by exact type
+    _deserializers: Dict[str, Callable[[any], any]] # by type tag
 
     def __init__(self: "AsyncSocketClient"):
         super().__init__()
+        self._reset_dispatch()
         self.add_serializer(BytesSerializer) # default bytes serializer
         self.add_serializer(ByteArraySerializer) # default bytearray serializer
+        self.add_serializer(MemoryViewSerializer) # default memoryview serializer
 
     @staticmethod
     def get_data_type_str(data: Type[any]) -> str:
-        return '{}.{}'.format(data.__module__, data.__name__)
+        return '{}.{}'.format(module_name(data), data.__name__)
+
+    def _reset_dispatch(self: "AsyncSocketClient"):
+        """ Build the dispatch tables, called when a serializer is added """
+
+        identity = _identity
+        self._serializers = {
+            type(None): identity, int: identity, float: identity, str: identity, bool: identity,
+            list: self._serialize_list,
+            tuple: self._serialize_tuple,
+            set: self._serialize_set,
+            dict: self._serialize_dict,
+        }
+        self._custom_types = {}
+        self._deserializers = {TUPLE_TYPE_NAME: self._deserialize_tuple, SET_TYPE_NAME: self._deserialize_set}
+        for data_type, serializer in self.custom_serializers.items():
+            self._deserializers[data_type] = serializer.deserialize
+
+    def _custom_type(self: "AsyncSocketClient", data_type: type) -> Optional[Tuple[str, Type[SerializerType]]]:
+        """
+        Tag and serializer of a custom type.
+        Serializers are registered for exact types: a subclass would be restored as its base by the peer.
+        """
+
+        try:
+            return self._custom_types[data_type]
+        except KeyError:
+            pass
+
+        tag = self.get_data_type_str(data_type)
+        serializer = self.custom_serializers.get(tag)
+        custom = self._custom_types[data_type] = (sys.intern(tag), serializer) if serializer else None
+        return custom
+
+    def _serializer(self: "AsyncSocketClient", data_type: type) -> Callable[[any], any]:
+        """ Find and cache the handler of a type met for the first time """
+
+        schema = SCHEMAS.get(data_type)
+        custom = self._custom_type(data_type)
+        if schema is not None:
+            handler = lambda data: self._serialize_record(schema, data)
+        elif custom is not None:
+            tag, serializer = custom
+            handler = lambda data: (CUSTOM_TYPE_HEADER, tag, serializer.serialize(data))
+        else:
+            # subclasses of the builtin types
+            handler = next((self._serializers[base] for base in data_type.__mro__ if base in BUILTIN_HANDLERS), None)
+            if handler is None:
+                raise ValueError(f'unsupported data type: {self.get_data_type_str(data_type)}')
+
+        self._serializers[data_type] = handler
+        return handler
 
     def serialize(self: "AsyncSocketClient", data: any) -> any:
-        if data is None:
-            return data
+        handler = self._serializers.get(type(data))
+        if handler is None:
+            handler = self._serializer(type(data))
+        return handler(data)
 
-        elif isinstance(data, SIMPLE_TYPES):
+    def _serialize_list(self: "AsyncSocketClient", data: list) -> list:
+        if PRIMITIVE_TYPES.issuperset(map(type, data)):
             return data
+        return self._serialize_items(data)
 
-        elif isinstance(data, list):
-            return [self.serialize(value) for value in data]
-
-        elif isinstance(data, tuple):
-            return CUSTOM_TYPE_HEADER, TUPLE_TYPE_NAME, [self.serialize(value) for value in data]
-
-        elif isinstance(data, set):
-            return CUSTOM_TYPE_HEADER, SET_TYPE_NAME, [self.serialize(value) for value in data]
+    def _serialize_tuple(self: "AsyncSocketClient", data: tuple) -> tuple:
+        return CUSTOM_TYPE_HEADER, TUPLE_TYPE_NAME, self._serialize_items(data)
 
-        elif isinstance(data, dict):
-            return {name: self.serialize(value) for name, value in data.items()}
+    def _serialize_set(self: "AsyncSocketClient", data: set) -> tuple:
+        return CUSTOM_TYPE_HEADER, SET_TYPE_NAME, self._serialize_items(data)
 
-        else:
-            data_type = self.get_data_type_str(type(data))
-            serializer = self.custom_serializers.get(data_type, None)
+    def _serialize_items(self: "AsyncSocketClient", data: any) -> list:
+        if PRIMITIVE_TYPES.issuperset(map(type, data)):
+            return list(data)
+        handlers, find = self._serializers, self._serializer
+        return [(handlers.get(type(value)) or find(type(value)))(value) for value in data]
 
-            if not serializer:
-                raise ValueError(f'unsupported data type: {data_type}')
+    def _serialize_record(self: "AsyncSocketClient", schema: Schema, data: any) -> tuple:
+        self._check_schema(schema)
+        return CUSTOM_TYPE_HEADER, schema.tag, self._serialize_items(schema.values(data))
 
-            serialized_object = serializer.serialize(data)
+    def _check_schema(self: "AsyncSocketClient", schema: Schema):
+        if schema.id not in self._peer_schemas:
+            raise ValueError(f'schema {schema.name} is not registered by the peer')
 
-            return CUSTOM_TYPE_HEADER, data_type, serialized_object
+    def _serialize_dict(self: "AsyncSocketClient", data: dict) -> dict:
+        if PRIMITIVE_TYPES.issuperset(map(type, data.values())):
+            return data
+        handlers, find = self._serializers, self._serializer
+        return {name: (handlers.get(type(value)) or find(type(value)))(value) for name, value in data.items()}
 
     def deserialize(self: "AsyncSocketClient", data: any) -> any:
-        if data is None:
+        data_type = type(data)
+        if data_type is dict:
+            return self._deserialize_dict(data)
+        elif data_type is list:
+            return self._deserialize_list(data)
+        elif data_type in PRIMITIVE_TYPES:
             return data
+        else:
+            raise ValueError(f'unsupported data type: {data_type}')
 
-        elif isinstance(data, SIMPLE_TYPES):
+    def _deserialize_list(self: "AsyncSocketClient", data: list) -> any:
+        if len(data) == 3 and data[0] == CUSTOM_TYPE_HEADER:
+            deserializer = self._deserializers.get(data[1]) or self._record_deserializer(data[1])
+            if deserializer is None:
+                raise ValueError(f'unsupported data type: {data[1]}')
+            return deserializer(data[2])
+
+        # decoded JSON is not shared, lists of primitives are taken as they are
+        if PRIMITIVE_TYPES.issuperset(map(type, data)):
             return data
+        deserialize = self.deserialize
+        return [deserialize(value) for value in data]
 
-        elif isinstance(data, list):
+    def _record_deserializer(self: "AsyncSocketClient", tag: str) -> Optional[Callable[[list], any]]:
+        """ Deserializer of a schema tag, cached on first use """
 
-            if len(data) == 3 and data[0] == CUSTOM_TYPE_HEADER:
-                if data[1] == TUPLE_TYPE_NAME:
-                    return tuple([self.deserialize(value) for value in data[2]])
-                elif data[1] == SET_TYPE_NAME:
-                    return set([self.deserialize(value) for value in data[2]])
-                elif data[1] in self.custom_serializers:
-                    deserialized_object = self.custom_serializers[data[1]].deserialize(data[2])
-                    return deserialized_object
-                else:
-                    raise ValueError(f'unsupported data type: {data[1]}')
+        if not tag.startswith('schema:'):
+            return None
+        schema = SCHEMAS_BY_ID.get(int(tag[7:], 16))
+        if schema is None:
+            return None
 
-            return [self.deserialize(value) for value in data]
+        deserializer = self._deserializers[schema.tag] = lambda data: schema.from_values(self._deserialize_list(data))
+        return deserializer
 
-        elif isinstance(data, dict):
-            return {name: self.deserialize(value) for name, value in data.items()}
+    def _deserialize_tuple(self: "AsyncSocketClient", data: list) -> tuple:
+        return tuple(self._deserialize_list(data))
 
-        else:
-            raise ValueError(f'unsupported data type: {type(data)}')
+    def _deserialize_set(self: "AsyncSocketClient", data: list) -> set:
+        return set(self._deserialize_list(data))
+
+    def _deserialize_dict(self: "AsyncSocketClient", data: dict) -> dict:
+        if PRIMITIVE_TYPES.issuperset(map(type, data.values())):
+            return data
+        deserialize = self.deserialize
+        return {name: deserialize(value) for name, value in data.items()}
+
+
+def _identity(data: any) -> any:
+    return data
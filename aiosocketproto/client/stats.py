@@ -0,0 +1,95 @@
+class FlowStats:
+    """ Backpressure counters of a connection """
+
+    send_waits: int # times send waited for the send queue to drain below the low watermark
+    send_wait_seconds: float
+    receive_pauses: int # times acknowledges were held back by a full receive queue
+    receive_pause_seconds: float
+    send_queue_peak: int # most bytes queued for sending
+    receive_queue_peak: int # most bytes received and not taken by the application
+
+    def __init__(self):
+        self.send_waits = 0
+        self.send_wait_seconds = 0.
+        self.receive_pauses = 0
+        self.receive_pause_seconds = 0.
+        self.send_queue_peak = 0
+        self.receive_queue_peak = 0
+
+    def __repr__(self):
+        return (
+            f'<FlowStats send_waits={self.send_waits} ({self.send_wait_seconds:.3f}s)'
+            f' receive_pauses={self.receive_pauses} ({self.receive_pause_seconds:.3f}s)'
+            f' send_peak={self.send_queue_peak} receive_peak={self.receive_queue_peak}>'
+        )
+
+
+class PoolStats:
+    """ Counters of a connection pool """
+
+    opened: int # connections opened
+    evicted: int # connections dropped after they were lost
+    closed_idle: int # connections above the minimum closed after being unused
+    connect_failures: int
+    acquires: int
+    acquire_waits: int # times acquire waited for a connection because none was alive
+
+    def __init__(self):
+        self.opened = 0
+        self.evicted = 0
+        self.closed_idle = 0
+        self.connect_failures = 0
+        self.acquires = 0
+        self.acquire_waits = 0
+
+    def __repr__(self):
+        return (
+            f'<PoolStats opened={self.opened} evicted={self.evicted} closed_idle={self.closed_idle}'
+            f' connect_failures={self.connect_failures} acquires={self.acquires} acquire_waits={self.acquire_waits}>'
+        )
+
+
+class OffloadStats:
+    """ Messages of a connection encoded and decoded in an executor instead of the event loop """
+
+    encoded_messages: int
+    encoded_bytes: int # payload bytes of the encoded messages
+    decoded_messages: int
+    decoded_bytes: int # payload bytes of the decoded messages
+    offloaded_seconds: float # encoding and decoding time spent in the executor, off the event loop
+
+    def __init__(self):
+        self.encoded_messages = 0
+        self.encoded_bytes = 0
+        self.decoded_messages = 0
+        self.decoded_bytes = 0
+        self.offloaded_seconds = 0.
+
+    def __repr__(self):
+        return (
+            f'<OffloadStats encoded={self.encoded_messages} ({self.encoded_bytes} bytes)'
+            f' decoded={self.decoded_messages} ({self.decoded_bytes} bytes) offloaded={self.offloaded_seconds:.3f}s>'
+        )
+
+
+class ResumeStats:
+    """ Lost connections of a resumable session """
+
+    suspended: int # times the connection was lost and the session waited for a new one
+    resumed: int # times the session continued on a new connection
+    suspended_seconds: float # time spent without a connection until resumed
+    replayed_frames: int # frames written again on a new connection, the peer had not received them
+    replayed_bytes: int
+
+    def __init__(self):
+        self.suspended = 0
+        self.resumed = 0
+        self.suspended_seconds = 0.
+        self.replayed_frames = 0
+        self.replayed_bytes = 0
+
+    def __repr__(self):
+        return (
+            f'<ResumeStats suspended={self.suspended} resumed={self.resumed} ({self.suspended_seconds:.3f}s)'
+            f' replayed={self.replayed_frames} ({self.replayed_bytes} bytes)>'
+        )
@@ -0,0 +1,465 @@
+import asyncio
+import os
+from abc import ABC
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterable, BinaryIO, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from .frame import (
+    CREDIT, CREDIT_FRAME, FLAG_ATTACHMENTS, FLAG_CLOSE, FLAG_COMPRESSED, FLAG_END, FLAG_RAW, FLAG_RESET, FRAME_HEADER,
+    FRAME_LENGTH, KIND_CREDIT, KIND_STREAM, KIND_STREAM_OPEN, pack_attachments_table, pack_frame,
+    split_attachments,
+)
+from .received_packet import ReceivedPacket
+
+if TYPE_CHECKING:
+    from .client import AsyncSocketClient
+
+
+class StreamMessage:
+    """ Encoded message being sent in chunks """
+
+    segments: Deque[memoryview] # not sent parts: head with payload, then attachments
+    remaining: int # bytes not sent
+    flags: int # data frame flags of the message
+    done: asyncio.Future # set when the last chunk is written
+
+    def __init__(self, segments: List[memoryview], flags: int):
+        self.segments = deque(segments)
+        self.remaining = sum(segment.nbytes for segment in segments)
+        self.flags = flags
+        self.done = asyncio.get_running_loop().create_future()
+
+    def take(self, size: int) -> List[memoryview]:
+        """ Views of the next `size` bytes """
+
+        views = []
+        self.remaining -= size
+        while size:
+            segment = self.segments[0]
+            if segment.nbytes <= size:
+                views.append(self.segments.popleft())
+                size -= segment.nbytes
+            else:
+                views.append(segment[:size])
+                self.segments[0] = segment[size:]
+                size = 0
+        return views
+
+
+class StreamFile:
+    """ Part of a file being sent in chunks with sendfile """
+
+    file: BinaryIO
+    offset: int # next byte to send
+    remaining: int
+    done: asyncio.Future # set when the last chunk is written
+
+    def __init__(self, file: BinaryIO, offset: int, count: int):
+        self.file = file
+        self.offset = offset
+        self.remaining = count
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class Stream:
+    """
+    Logical channel of a connection with its own receive queue.
+    Messages are sent in chunks interleaved with the other streams.
+    The peer grants bytes (credit) as its application takes the messages,
+    so a slow consumer stalls its own stream only.
+
+    A raw stream carries bytes instead of messages: chunks are written with `write` or `write_file`
+    and received as they come by iterating the stream.
+    """
+
+    client: "AsyncSocketClient"
+    id: int
+    name: str
+    raw: bool # chunks of bytes instead of messages
+    closed: bool # nothing more is sent
+
+    _credit: int # bytes the peer accepts now
+    _outgoing: Deque[Union[StreamMessage, StreamFile, None]] # to send, None - close
+    _close_flags: int
+    _scheduled: bool # waits for its turn in the sender
+    _close_sent: bool
+    _peer_closed: bool
+    _error: Optional[Exception] # raised once the queue is empty, None - closed by the peer
+    _received: asyncio.Queue[Optional[Tuple[Union[ReceivedPacket, memoryview], int]]] # messages or chunks and their sizes, None - end
+    _assembly: bytearray # message in progress
+    _queued_bytes: int # size of the messages in queue
+    _unreturned: int # received bytes not granted back to the peer
+
+    def __init__(self, client: "AsyncSocketClient", stream_id: int, name: str, raw: bool = False):
+        self.client = client
+        self.id = stream_id
+        self.name = name
+        self.raw = raw
+        self.closed = False
+
+        self._credit = client._peer_stream_window
+        self._outgoing = deque()
+        self._close_flags = FLAG_CLOSE
+        self._scheduled = False
+        self._close_sent = False
+        self._peer_closed = False
+        self._error = None
+        self._received = asyncio.Queue()
+        self._assembly = bytearray()
+        self._queued_bytes = 0
+        self._unreturned = 0
+
+    def __repr__(self):
+        return f'<Stream {self.id} {self.name!r}>'
+
+    async def send(self, **data):
+        """ Serialize and send a message, returns once it is written to the connection """
+
+        if self.raw:
+            raise TypeError('raw stream carries bytes, use write')
+        await self._send(self.client._encode_stream_message(data))
+
+    async def write(self, data: bytes):
+        """ Send a chunk of a raw stream, returns once it is written to the connection """
+
+        if not self.raw:
+            raise TypeError('stream carries messages, use send')
+        view = memoryview(data)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        if view.nbytes:
+            await self._send(StreamMessage([view], 0))
+
+    async def write_file(self, file: BinaryIO, offset: int = 0, count: Optional[int] = None):
+        """ Send a binary file (to the end by default) to a raw stream, with sendfile where supported """
+
+        if not self.raw:
+            raise TypeError('stream carries messages, use send')
+        if count is None:
+            count = os.fstat(file.fileno()).st_size - offset
+        if count > 0:
+            await self._send(StreamFile(file, offset, count))
+
+    async def receive(self) -> dict:
+        """ Waiting for income message of the stream """
+
+        if self.raw:
+            raise TypeError('raw stream carries bytes, iterate it')
+        packet = await self._next()
+        if packet is None:
+            raise self._error or ConnectionResetError('stream is closed by the peer')
+        return self.client._decode_packet(packet)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Union[dict, memoryview]:
+        """ Next message or chunk of a raw stream, until the peer closes the stream """
+
+        item = await self._next()
+        if item is None:
+            if self._error:
+                raise self._error
+            raise StopAsyncIteration
+        return item if self.raw else self.client._decode_packet(item)
+
+    def close(self):
+        """ Send the queued messages and close the stream, the peer may still send """
+
+        self._close(FLAG_CLOSE)
+
+    def abort(self):
+        """ Close the stream telling the peer that the data is incomplete """
+
+        self._close(FLAG_CLOSE | FLAG_RESET)
+
+    async def _send(self, item: Union[StreamMessage, StreamFile]):
+        if self.closed:
+            raise ConnectionResetError('stream is closed')
+        if not self.client.is_connected:
+            raise ConnectionRefusedError('connection refused')
+
+        self._outgoing.append(item)
+        self.client._schedule_stream(self)
+        await item.done
+
+    async def _next(self) -> Union[ReceivedPacket, memoryview, None]:
+        """ Take the next item of the queue and grant its bytes back, None - the stream is over """
+
+        item = await self._received.get()
+        if item is None:
+            # wake the next receiver too
+            self._received.put_nowait(None)
+            return None
+
+        data, size = item
+        self._queued_bytes -= size
+        self.client._return_credit(self)
+        return data
+
+    def _close(self, flags: int):
+        if not self.closed:
+            self.closed = True
+            self._close_flags = flags
+            self._outgoing.append(None)
+            self.client._schedule_stream(self)
+
+
+class Streams(ABC):
+    """
+    Multiplexed logical streams with credit based flow control.
+    Stream frames are not numbered in the data frames sequence, they bypass the send queue and its window.
+    """
+
+    _streams: Dict[int, Stream] # open streams by id
+    _stream_id: int # id of the last stream opened here, the initiator opens odd ids
+    _accepted_streams: asyncio.Queue[Optional[Stream]] # streams opened by the peer, None - connection is over
+    _accepted_raw_streams: asyncio.Queue[Optional[Stream]]
+    _ready_streams: Deque[Stream] # streams which may send a chunk, in turn
+    _streams_ready: asyncio.Event
+    _peer_stream_window: int # credit of a new stream granted by the peer
+
+    def __init__(self: "AsyncSocketClient"):
+        super().__init__()
+        self._streams = {}
+        self._stream_id = 0
+        self._accepted_streams = asyncio.Queue()
+        self._accepted_raw_streams = asyncio.Queue()
+        self._ready_streams = deque()
+        self._streams_ready = asyncio.Event()
+        self._peer_stream_window = 0
+
+    def open_stream(self: "AsyncSocketClient", name: str = '', raw: bool = False) -> Stream:
+        """ Open a stream, the peer gets it from `accept_stream` (`receive_stream` if raw) """
+
+        if not self._peer_stream_window:
+            raise RuntimeError('streams are not supported by the peer')
+        if not self.is_connected:
+            raise ConnectionRefusedError('connection refused')
+
+        self._stream_id += 2
+        stream = self._streams[self._stream_id] = Stream(self, self._stream_id, name, raw)
+        frame = pack_frame(KIND_STREAM_OPEN, FLAG_RAW if raw else 0, stream.id, name.encode('utf-8'))
+        self.protocol.write(frame)
+        self._frames_written(KIND_STREAM_OPEN, len(frame))
+        return stream
+
+    async def accept_stream(self: "AsyncSocketClient") -> Stream:
+        """ Waiting for a stream opened by the peer """
+        return await self._accept_stream(self._accepted_streams)
+
+    async def send_stream(self: "AsyncSocketClient", source: Union[AsyncIterable[bytes], Iterable[bytes], BinaryIO], name: str = ''):
+        """
+        Send bytes of an iterable, async iterable or binary file as a raw stream, the peer gets it from `receive_stream`.
+        Chunks are sent as they are produced, the peer grants the window, so memory stays bounded on both sides.
+        """
+
+        stream = self.open_stream(name, raw=True)
+        try:
+            if hasattr(source, 'fileno'):
+                await stream.write_file(source)
+            elif hasattr(source, '__aiter__'):
+                async for chunk in source:
+                    await stream.write(chunk)
+            else:
+                for chunk in source:
+                    await stream.write(chunk)
+        except BaseException:
+            stream.abort()
+            raise
+        stream.close()
+
+    async def receive_stream(self: "AsyncSocketClient") -> Stream:
+        """ Waiting for a raw stream of the peer, iterate it for the chunks """
+        return await self._accept_stream(self._accepted_raw_streams)
+
+    @staticmethod
+    async def _accept_stream(accepted: asyncio.Queue) -> Stream:
+        stream = await accepted.get()
+        if stream is None:
+            accepted.put_nowait(None)
+            raise ConnectionRefusedError('connection refused')
+        return stream
+
+    def _encode_stream_message(self: "AsyncSocketClient", data: dict) -> StreamMessage:
+        """ Encode with the negotiated codec, the message body has the layout of a data frame body """
+
+        attachments = []
+        payload = self.codec.encode(data, attachments)
+
+        flags = 0
+        if self.compression:
+            payload, flags = self._compress(payload)
+
+        if not attachments:
+            return StreamMessage([memoryview(payload)], flags)
+        head = pack_attachments_table(attachments) + payload
+        return StreamMessage([memoryview(head), *attachments], flags | FLAG_ATTACHMENTS)
+
+    def _schedule_stream(self: "AsyncSocketClient", stream: Stream):
+        """ Queue the stream for the sender if it has something to send and may send it """
+
+        if stream._scheduled or not stream._outgoing:
+            return
+        if stream._credit > 0 or stream._outgoing[0] is None:
+            stream._scheduled = True
+            self._ready_streams.append(stream)
+            self._streams_ready.set()
+
+    def _write_stream_chunk(self: "AsyncSocketClient", stream: Stream):
+        message = stream._outgoing[0]
+
+        if message is None:
+            stream._outgoing.popleft()
+            stream._close_sent = True
+            frame = pack_frame(KIND_STREAM, stream._close_flags, stream.id, b'')
+            self.protocol.write(frame)
+            self._frames_written(KIND_STREAM, len(frame))
+            self._forget_stream(stream)
+            return
+
+        # the peer aborts the connection on a frame over its limit
+        size = min(self.STREAM_CHUNK_SIZE, stream._credit, message.remaining, self._peer_max_frame_size - FRAME_HEADER.size)
+        chunk = message.take(size)
+        stream._credit -= size
+
+        flags = message.flags
+        if not message.remaining:
+            flags |= FLAG_END
+            stream._outgoing.popleft()
+
+        # chunks are small, one write is cheaper than a write per segment
+        head = FRAME_LENGTH.pack(FRAME_HEADER.size + size) + FRAME_HEADER.pack(KIND_STREAM, flags, stream.id)
+        self.protocol.write(b''.join((head, *chunk)))
+        self._frames_written(KIND_STREAM, len(head) + size)
+
+        if not message.remaining and not message.done.done():
+            message.done.set_result(None)
+
+    async def _send_stream_file_chunk(self: "AsyncSocketClient", stream: Stream):
+        """ Send as much of the file as the peer accepts in one frame """
+
+        part = stream._outgoing[0]
+        size = min(stream._credit, part.remaining, self._peer_max_frame_size - FRAME_HEADER.size)
+        stream._credit -= size
+
+        head = FRAME_LENGTH.pack(FRAME_HEADER.size + size) + FRAME_HEADER.pack(KIND_STREAM, 0, stream.id)
+        await self.protocol.sendfile(head, part.file, part.offset, size)
+        self._frames_written(KIND_STREAM, len(head) + size)
+        part.offset += size
+        part.remaining -= size
+
+        if not part.remaining:
+            stream._outgoing.popleft()
+            if not part.done.done():
+                part.done.set_result(None)
+
+    async def _stream_sender(self: "AsyncSocketClient"):
+        """ Write one chunk of every ready stream in turn """
+
+        ready = self._ready_streams
+        while self.is_connected:
+            if not ready:
+                self._streams_ready.clear()
+                await self._streams_ready.wait()
+                continue
+
+            stream = ready.popleft()
+            stream._scheduled = False
+            if isinstance(stream._outgoing[0], StreamFile):
+                await self._send_stream_file_chunk(stream)
+            else:
+                self._write_stream_chunk(stream)
+            self._schedule_stream(stream)
+            await self.protocol.drain()
+
+    def _return_credit(self: "AsyncSocketClient", stream: Stream):
+        """
+        Grant the received bytes back to the sender once they are not held.
+        Queued messages are held, the message in progress too unless the application waits for it.
+        """
+
+        held = stream._queued_bytes + (len(stream._assembly) if stream._received.qsize() else 0)
+        returnable = stream._unreturned - held
+        if returnable >= max(self.STREAM_WINDOW // 4, 1) and not self.transport.is_closing():
+            stream._unreturned -= returnable
+            self.protocol.write(CREDIT_FRAME.pack(FRAME_HEADER.size + CREDIT.size, KIND_CREDIT, 0, stream.id, returnable))
+            self._frames_written(KIND_CREDIT, CREDIT_FRAME.size)
+
+    def _stream_frame_received(self: "AsyncSocketClient", kind: int, flags: int, stream_id: int, body: memoryview):
+        """ Called for every stream frame """
+
+        if kind == KIND_STREAM_OPEN:
+            if stream_id in self._streams:
+                raise ConnectionError(f'stream {stream_id} is open already')
+            stream = self._streams[stream_id] = Stream(self, stream_id, str(body, 'utf-8'), bool(flags & FLAG_RAW))
+            self.logger.debug('stream %d opened by peer: %s', stream_id, stream.name)
+            (self._accepted_raw_streams if stream.raw else self._accepted_streams).put_nowait(stream)
+            return
+
+        stream = self._streams.get(stream_id)
+
+        if kind == KIND_CREDIT:
+            # the stream may be closed and forgotten here already
+            if stream is not None:
+                stream._credit += CREDIT.unpack_from(body)[0]
+                self._schedule_stream(stream)
+            return
+
+        if stream is None or stream._peer_closed:
+            raise ConnectionError(f'got frame of not open stream {stream_id}')
+
+        if flags & FLAG_CLOSE:
+            stream._peer_closed = True
+            if flags & FLAG_RESET:
+                stream._error = ConnectionResetError('stream is aborted by the peer')
+            stream._received.put_nowait(None)
+            self._forget_stream(stream)
+            return
+
+        stream._unreturned += len(body)
+        if stream.raw:
+            # chunks are delivered as they come
+            stream._queued_bytes += len(body)
+            stream._received.put_nowait((body, len(body)))
+        elif flags & FLAG_END:
+            # frames are received into own buffers, a single chunk message is used as is
+            if stream._assembly:
+                stream._assembly += body
+                body = memoryview(stream._assembly)
+                stream._assembly = bytearray()
+
+            payload, attachments = body, ()
+            if flags & FLAG_ATTACHMENTS:
+                payload, attachments = split_attachments(body)
+            stream._queued_bytes += len(body)
+            stream._received.put_nowait((ReceivedPacket(self.codec, payload, attachments, bool(flags & FLAG_COMPRESSED)), len(body)))
+        else:
+            stream._assembly += body
+
+        self._return_credit(stream)
+
+    def _forget_stream(self: "AsyncSocketClient", stream: Stream):
+        if stream._close_sent and stream._peer_closed:
+            self._streams.pop(stream.id, None)
+
+    def _streams_failed(self: "AsyncSocketClient", error: Exception):
+        """ Fail messages in flight and wake receivers of the open streams """
+
+        for stream in self._streams.values():
+            for item in stream._outgoing:
+                if item is not None and not item.done.done():
+                    item.done.set_exception(error)
+            stream._outgoing.clear()
+            if not stream._peer_closed:
+                stream._error = error
+                stream._received.put_nowait(None)
+        self._streams.clear()
+        self._ready_streams.clear()
+
+    def _streams_closed(self: "AsyncSocketClient"):
+        """ Fail the open streams and wake acceptors when the connection is over """
+
+        self._streams_failed(ConnectionRefusedError('connection refused'))
+        self._accepted_streams.put_nowait(None)
+        self._accepted_raw_streams.put_nowait(None)
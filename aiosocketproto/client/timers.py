@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import time
+import weakref
+from asyncio import AbstractEventLoop, Handle, get_running_loop
+from typing import Callable, List, Optional, Tuple
+
+RESOLUTION = 0.05 # seconds: deadlines are rounded up to it, so the timers due together fire in one wakeup
+MIN_CANCELLED = 1024 # cancelled timers are swept from the heap from this count, when they are half of it
+
+_schedulers: "weakref.WeakKeyDictionary[AbstractEventLoop, Timers]" = weakref.WeakKeyDictionary()
+
+
+class Timer:
+    """ Scheduled callback """
+
+    __slots__ = ('when', 'callback', 'cancelled')
+
+    def __init__(self, when: float, callback: Callable[[], None]):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+
+class Timers:
+    """
+    Deadlines of every session of an event loop in one heap, woken by one loop timer.
+    Time is `time.monotonic()`. A session keeps one timer and recomputes its deadline when it fires,
+    so traffic moves nothing here.
+    """
+
+    _heap: List[Tuple[float, int, Timer]]
+    _order: itertools.count # ties by insertion
+    _handle: Optional[Handle] # loop timer of the earliest deadline
+    _wakeup: float # when the loop timer fires
+    _cancelled: int # cancelled timers still in the heap
+
+    def __init__(self):
+        self._heap = []
+        self._order = itertools.count()
+        self._handle = None
+        self._wakeup = 0.
+        self._cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> Timer:
+        timer = Timer(when, callback)
+        heapq.heappush(self._heap, (when, next(self._order), timer))
+        wakeup = (int(when / RESOLUTION) + 1) * RESOLUTION
+        if self._handle is None or wakeup < self._wakeup:
+            self._set_wakeup(wakeup)
+        return timer
+
+    def cancel(self, timer: Timer):
+        """ The timer stays in the heap and is skipped, swept when many are cancelled """
+
+        if timer.cancelled:
+            return
+        timer.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > MIN_CANCELLED and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _set_wakeup(self, wakeup: float):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._wakeup = wakeup
+        # the clock of the loop may differ from the monotonic one
+        self._handle = get_running_loop().call_later(max(wakeup - time.monotonic(), 0), self._run)
+
+    def _run(self):
+        self._handle = None
+        now = time.monotonic()
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            _, _, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                self._cancelled -= 1
+            else:
+                # fired timers count as cancelled, cancelling them later changes nothing
+                timer.cancelled = True
+                due.append(timer)
+
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception as exc:
+                get_running_loop().call_exception_handler({
+                    'message': 'timer callback failed',
+                    'exception': exc,
+                })
+
+        # cancelled timers are dropped when they come up, not searched for
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        if heap and self._handle is None:
+            self._set_wakeup((int(heap[0][0] / RESOLUTION) + 1) * RESOLUTION)
+
+
+def get_timers() -> Timers:
+    """ Timers of the running event loop """
+
+    loop = get_running_loop()
+    timers = _schedulers.get(loop)
+    if timers is None:
+        timers = _schedulers[loop] = Timers()
+    return timers
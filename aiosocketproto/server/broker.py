@@ -0,0 +1,93 @@
+from typing import Dict, Iterable, List, Set
+
+from ..client import AsyncSocketClient
+
+
+def queue_body(session: AsyncSocketClient, flags: int, body: List[bytes]):
+    session._enqueue(session._frame_body(flags, body))
+
+
+class Broker:
+    """
+    Fan-out of messages to the sessions of a server.
+    A message is encoded (and compressed) once for every encoding in use by the sessions,
+    every session queues the same bytes after a frame head of its own.
+    A session whose send queue is over `SLOW_CONSUMER_BYTES` does not hold up the others:
+    the message is dropped for it or it is disconnected (`SLOW_CONSUMER`).
+    A session which cannot take the message (over the frame limit of its peer, a schema its peer does not know)
+    is skipped and counted as failed.
+    """
+
+    topics: Dict[str, Set[AsyncSocketClient]] # subscribers by topic
+    published: int # messages published
+    delivered: int # messages queued for sessions
+    dropped: int # messages skipped for slow sessions
+    disconnected: int # slow sessions closed
+    failed: int # messages not encoded or framed for a session
+
+    def __init__(self):
+        self.topics = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.failed = 0
+
+    def subscribe(self, session: AsyncSocketClient, topic: str):
+        self.topics.setdefault(topic, set()).add(session)
+        session.subscriptions.add(topic)
+
+    def unsubscribe(self, session: AsyncSocketClient, topic: str):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(session)
+            if not subscribers:
+                del self.topics[topic]
+        session.subscriptions.discard(topic)
+
+    def forget(self, session: AsyncSocketClient):
+        """ Remove an ended session from its topics """
+
+        for topic in list(session.subscriptions):
+            self.unsubscribe(session, topic)
+
+    def publish(self, sessions: Iterable[AsyncSocketClient], data: dict) -> int:
+        """ Queue the message for the sessions, return how many got it """
+
+        self.published += 1
+        bodies = {}
+        delivered = 0
+        for session in sessions:
+            # not negotiated yet or lost
+            if not session.is_connected or not (session.LEGACY or session._hello.done()):
+                continue
+
+            if session.SLOW_CONSUMER_BYTES and session._send_queue_bytes >= session.SLOW_CONSUMER_BYTES:
+                if session.SLOW_CONSUMER == 'disconnect':
+                    self.disconnected += 1
+                    session._end_session()
+                else:
+                    self.dropped += 1
+                continue
+
+            encoding = session._encoding
+            body = bodies.get(encoding)
+            try:
+                if body is None:
+                    body = bodies[encoding] = session._encode_body(data)
+                # after the messages of the session still encoded in an executor
+                session._queue_in_send_order(queue_body, session, *body)
+            except Exception as exc:
+                self.failed += 1
+                session.logger.warning('published message is not queued for the session: %s', exc)
+                continue
+            delivered += 1
+
+        self.delivered += delivered
+        return delivered
+
+    def __repr__(self):
+        return (
+            f'<Broker topics={len(self.topics)} published={self.published} delivered={self.delivered}'
+            f' dropped={self.dropped} disconnected={self.disconnected} failed={self.failed}>'
+        )
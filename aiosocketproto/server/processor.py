@@ -1,27 +1,165 @@
 import asyncio
+import json
+import logging
+import struct
+import time
 from abc import ABC
-from contextlib import closing
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from .. import AsyncSocketClient
+from ..client.protocol import FrameProtocol
 
 if TYPE_CHECKING:
     from .server import AsyncSocketServer
 
+logger = logging.getLogger(__name__)
+
 
 class Processor(ABC):
 
-    async def _connection_handler_wrapper(self: "AsyncSocketServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    def _connection_handler_wrapper(self: "AsyncSocketServer", protocol: FrameProtocol):
         """ Safe Wrapper for income connections """
+
+        peername = protocol.transport.get_extra_info('peername')
+        address = peername[0] if isinstance(peername, tuple) else None
+
+        reason = self._refusal(address)
+        if reason is None:
+            self._start_session(protocol, address)
+        elif self.resumable and not self._closing:
+            # a session waiting to be resumed holds its place already, its new connection is not limited
+            self._read_resume(protocol, address, reason)
+        else:
+            self._overflow(protocol, address, reason)
+
+    def _refusal(self: "AsyncSocketServer", address: Optional[str]) -> Optional[str]:
+        """ Why a new connection is not served at once, None - it is """
+
+        if self._closing:
+            return 'server is closing'
+        # Unix domain socket and in-memory peers have no address
+        if self.MAX_CONNECTIONS_PER_IP and address is not None and self.sessions.connections_from(address) >= self.MAX_CONNECTIONS_PER_IP:
+            return 'too many connections from the address'
+        if self.MAX_CONNECTIONS and len(self.sessions) >= self.MAX_CONNECTIONS:
+            return 'server is full'
+        return None
+
+    def _overflow(self: "AsyncSocketServer", protocol: FrameProtocol, address: Optional[str], reason: str, hello: Optional[dict] = None):
+        """ Queue or reject a connection over the limits """
+
+        if reason != 'server is full' or self.OVERFLOW != 'queue' or len(self.sessions.queue) >= self.CONNECTION_QUEUE_SIZE:
+            return self._reject(protocol, reason)
+
+        # not read until a session ends
+        protocol.transport.pause_reading()
+        timeout = asyncio.get_running_loop().call_later(self.QUEUE_TIMEOUT, self._queue_expired, protocol)
+        self.sessions.queue.append((protocol, address, hello, timeout))
+
+    def _read_resume(self: "AsyncSocketServer", protocol: FrameProtocol, address: Optional[str], reason: str):
+        """ Over the limits the handshake is read first: a connection resuming a session is handed over to it """
+
+        reader = AsyncSocketClient(protocol, self.debug_mode, **self.options)
+        reader._resumable_sessions = self.resumable
+        reader._resume_only = True
+        protocol.attach(reader._frame_received, reader._signal_received)
+
+        async def admit():
+            try:
+                await reader._wait_handshake()
+            except asyncio.CancelledError:
+                self._reject(protocol, 'server is closing')
+                raise
+            if reader._handed_over or protocol.is_closed:
+                return
+            hello = reader._hello.result() if reader._hello.done() else None
+            refusal = self._refusal(address)
+            if hello is None:
+                # a legacy or silent peer, what it sent is taken by the reader
+                self._reject(protocol, refusal or reason)
+            elif refusal is None:
+                self._start_session(protocol, address, hello)
+            else:
+                self._overflow(protocol, address, refusal, hello)
+
+        task = asyncio.create_task(admit())
+        self._admissions.add(task)
+        task.add_done_callback(self._admissions.discard)
+
+    def _start_session(self: "AsyncSocketServer", protocol: FrameProtocol, address: Optional[str], hello: Optional[dict] = None):
         async def session_wrapper():
-            with closing(writer):
-                session = AsyncSocketClient(reader, writer, self.debug_mode)
-                await session._keep_alive()
+            try:
+                session._keep_alive()
+                if hello is not None:
+                    # the handshake was read before the connection got its place
+                    session._negotiate(hello)
+                await session._wait_handshake()
+                # the connection resumed a session of this server, or asked for an unknown one
+                if session._handed_over:
+                    return
+                if session.INSTRUMENTATION is not None:
+                    session.INSTRUMENTATION.connected(session)
                 return await self.connection_handler(session)
-        self.sessions.append(asyncio.create_task(session_wrapper()))
+            finally:
+                self.broker.forget(session)
+                session._end_session()
+        session = AsyncSocketClient(protocol, self.debug_mode, **self.options)
+        session.handlers.maps.append(self.handlers)
+        session.broker = self.broker
+        session._resumable_sessions = self.resumable
+
+        task = asyncio.create_task(session_wrapper())
+        self.sessions.add(session, task, address)
+        task.add_done_callback(self._session_done)
+
+    def _session_done(self: "AsyncSocketServer", task: asyncio.Task):
+        """ Start a queued connection in the free slot """
+
+        # a handler usually ends with the error of the lost connection
+        if not task.cancelled() and task.exception():
+            logger.debug('session ended: %r', task.exception())
+
+        queue = self.sessions.queue
+        while queue and not self._closing and (not self.MAX_CONNECTIONS or len(self.sessions) < self.MAX_CONNECTIONS):
+            protocol, address, hello, timeout = queue.popleft()
+            timeout.cancel()
+            if not protocol.is_closed:
+                self._start_session(protocol, address, hello)
+
+    def _reject(self: "AsyncSocketServer", protocol: FrameProtocol, reason: str):
+        """ Close a connection which is not served, the handshake answer tells the client why """
+
+        self.sessions.rejected += 1
+        if not self.options.get('legacy'):
+            payload = json.dumps({'version': AsyncSocketClient.PROTOCOL_VERSION, 'refused': reason}).encode('utf-8')
+            protocol.write(struct.pack("!ii", AsyncSocketClient.SIGNAL_HELLO, len(payload)) + payload)
+        protocol.transport.close()
+
+    def _queue_expired(self: "AsyncSocketServer", protocol: FrameProtocol):
+        for index, (queued, *_) in enumerate(self.sessions.queue):
+            if queued is protocol:
+                del self.sessions.queue[index]
+                self._reject(protocol, 'server is full')
+                return
+
+    def _reject_queued(self: "AsyncSocketServer"):
+        while self.sessions.queue:
+            protocol, *_, timeout = self.sessions.queue.popleft()
+            timeout.cancel()
+            self._reject(protocol, 'server is closing')
+
+    async def _evict_idle(self: "AsyncSocketServer"):
+        """ Close sessions which received nothing but pings for `IDLE_TIMEOUT` """
+
+        while True:
+            await asyncio.sleep(self.IDLE_TIMEOUT / 2)
+            deadline = time.monotonic() - self.IDLE_TIMEOUT
+            for session in self.sessions:
+                if session.last_activity < deadline and not session.transport.is_closing():
+                    self.sessions.evicted += 1
+                    session._end_session()
 
     async def __aenter__(self: "AsyncSocketServer"):
         return self
 
     async def __aexit__(self: "AsyncSocketServer", exc_type, exc_value, traceback):
-        await self.close()
\ No newline at end of file
+        await self.close()
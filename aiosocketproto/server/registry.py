@@ -0,0 +1,104 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+from ..client import AsyncSocketClient
+from ..client.protocol import FrameProtocol
+
+
+class SessionRegistry:
+    """
+    Live sessions of a server.
+    A session is removed as soon as its task is done, so the registry only grows with the sessions served at once.
+    Counts are kept up to date on every change and are cheap to read.
+    """
+
+    accepted: int # sessions started
+    rejected: int # connections closed by the limits
+    evicted: int # sessions closed for being idle
+    queue: Deque[Tuple[FrameProtocol, Optional[str], Optional[dict], asyncio.TimerHandle]] # connections waiting for a free slot, with the handshake read over the limits
+
+    _sessions: Dict[int, AsyncSocketClient] # by session id
+    _tasks: Dict[int, asyncio.Task]
+    _addresses: Dict[str, int] # sessions by remote address
+    _next_id: int
+    _empty: asyncio.Event # set when no session is live
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.queue = deque()
+
+        self._sessions = {}
+        self._tasks = {}
+        self._addresses = {}
+        self._next_id = 0
+        self._empty = asyncio.Event()
+        self._empty.set()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[AsyncSocketClient]:
+        return iter(list(self._sessions.values()))
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: int) -> Optional[AsyncSocketClient]:
+        return self._sessions.get(session_id)
+
+    def connections_from(self, address: Optional[str]) -> int:
+        """ Live sessions of a remote address """
+        return self._addresses.get(address, 0)
+
+    @property
+    def tasks(self):
+        return self._tasks.values()
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        return {
+            'live': len(self._sessions),
+            'queued': len(self.queue),
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'evicted': self.evicted,
+        }
+
+    def add(self, session: AsyncSocketClient, task: asyncio.Task, address: Optional[str]):
+        self._next_id += 1
+        session_id = session.session_id = self._next_id
+        self._sessions[session_id] = session
+        self._tasks[session_id] = task
+        if address is not None:
+            self._addresses[address] = self._addresses.get(address, 0) + 1
+        self.accepted += 1
+        self._empty.clear()
+
+        task.add_done_callback(lambda _: self._remove(session_id, address))
+
+    def _remove(self, session_id: int, address: Optional[str]):
+        del self._sessions[session_id]
+        del self._tasks[session_id]
+        if address is not None:
+            left = self._addresses[address] - 1
+            if left:
+                self._addresses[address] = left
+            else:
+                del self._addresses[address]
+        if not self._sessions:
+            self._empty.set()
+
+    async def wait_empty(self, timeout: float) -> bool:
+        """ Wait until every session is over, False on timeout """
+
+        try:
+            await asyncio.wait_for(self._empty.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def __repr__(self):
+        return '<SessionRegistry {}>'.format(' '.join(f'{name}={value}' for name, value in self.counts.items()))
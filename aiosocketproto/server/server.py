@@ -1,34 +1,72 @@
 import asyncio
-from typing import List, Callable
+import contextlib
+import os
+from typing import Callable, Dict, List, Optional, Set
 
+from .broker import Broker
 from .processor import Processor
+from .registry import SessionRegistry
+from .workers import Workers
+from ..client import AsyncSocketClient
+from ..client.memory import create_memory_server
+from ..client.protocol import FrameProtocol, unix_address
 
 
-class AsyncSocketServer(Processor):
-    port: int
-    server: asyncio.Server
-    sessions: List[asyncio.Task]
+class AsyncSocketServer(Processor, Workers):
+    MAX_CONNECTIONS = 0 # sessions served at once, 0 - no limit
+    MAX_CONNECTIONS_PER_IP = 0 # sessions of one remote address, more are rejected, 0 - no limit
+    OVERFLOW = 'reject' # connections over max_connections: 'reject' closes them, 'queue' holds them until a session ends
+    CONNECTION_QUEUE_SIZE = 1024 # connections held by the 'queue' policy, more are rejected
+    QUEUE_TIMEOUT = 30 # seconds a connection may be held in the queue
+    IDLE_TIMEOUT = 0 # seconds a session may receive nothing but pings before it is closed, 0 - never
+    DRAIN_TIMEOUT = 0 # seconds close() waits for sessions to end before cancelling them
+
+    port: Optional[int] # TCP port
+    path: Optional[str] # Unix domain socket path
+    name: Optional[str] # in-memory server name
+    server: Optional[asyncio.AbstractServer] # None in the parent of workers
+    sessions: SessionRegistry # sessions of this process, empty in the parent of workers
+    broker: Broker # topics of the sessions
+    resumable: Dict[str, AsyncSocketClient] # sessions which may be resumed on a new connection, by token
     connection_handler: Callable
     debug_mode: bool
+    options: dict
+    handlers: Dict[str, Callable] # call handlers of every session
+    _closing: bool # close() was called
+    _idle_task: Optional[asyncio.Task]
+    _admissions: Set[asyncio.Task] # connections over the limits whose handshake is read
 
     @classmethod
-    async def start(cls, ports_range: List[int], connection_handler: Callable, debug_mode: bool = False):
-        """ Start a server with given ports range """
+    async def start(
+        cls, ports_range: List[int], connection_handler: Callable, debug_mode: bool = False,
+        workers: int = 0, worker_init: Optional[Callable] = None, **options
+    ):
+        """
+        Start a server with given ports range.
+        Options are applied to every session (see `AsyncSocketClient.connect`),
+        except the server settings (`max_connections=1000`, `idle_timeout=300`).
+        With `workers` sessions are served by that many worker processes listening on the port,
+        `worker_init(server)` (sync or async) is called in every worker before it accepts connections.
+        """
 
-        # constructor
-        server_wrap = cls()
-        server_wrap.sessions = []
-        server_wrap.connection_handler = connection_handler
-        server_wrap.debug_mode = debug_mode
+        server_wrap = cls._create(connection_handler, debug_mode, options)
+        server_wrap.workers = workers
+        server_wrap.worker_init = worker_init
 
         # find free port in range
         for port in ports_range:
             try:
+                if workers:
+                    await server_wrap._start_workers(port)
+                    return server_wrap
 
                 # run server
-                protocol_server = await asyncio.start_server(server_wrap._connection_handler_wrapper, '0.0.0.0', port)
+                protocol_server = await asyncio.get_running_loop().create_server(
+                    lambda: FrameProtocol(server_wrap._connection_handler_wrapper), '0.0.0.0', port
+                )
                 server_wrap.port = port
                 server_wrap.server = protocol_server
+                server_wrap._serving()
 
                 return server_wrap
 
@@ -37,21 +75,131 @@ class AsyncSocketServer(Processor):
         else:
             raise RuntimeError(f'all ports in range {ports_range} are busy')
 
+    @classmethod
+    async def start_unix(cls, path: str, connection_handler: Callable, debug_mode: bool = False, **options):
+        """
+        Start a server on a Unix domain socket, options as for `start`.
+        A path starting with '@' (or a NUL byte) is in the abstract namespace of Linux, other paths
+        are created (a stale socket file is replaced) and removed on close.
+        """
+
+        server_wrap = cls._create(connection_handler, debug_mode, options)
+        server_wrap.server = await asyncio.get_running_loop().create_unix_server(
+            lambda: FrameProtocol(server_wrap._connection_handler_wrapper), unix_address(path)
+        )
+        server_wrap.path = path
+        server_wrap._serving()
+        return server_wrap
+
+    @classmethod
+    async def start_memory(cls, name: str, connection_handler: Callable, debug_mode: bool = False, **options):
+        """ Start an in-memory server for clients of this process (`connect_memory(name)`), options as for `start` """
+
+        server_wrap = cls._create(connection_handler, debug_mode, options)
+        server_wrap.server = await create_memory_server(
+            lambda: FrameProtocol(server_wrap._connection_handler_wrapper), name
+        )
+        server_wrap.name = name
+        server_wrap._serving()
+        return server_wrap
+
+    @classmethod
+    def _create(cls, connection_handler: Callable, debug_mode: bool, options: dict) -> "AsyncSocketServer":
+        """ Server with the settings taken out of the session options """
+
+        settings = {name: options.pop(name) for name in list(options) if cls._is_setting(name)}
+        AsyncSocketClient.check_options(options)
+
+        server_wrap = cls()
+        for name, value in settings.items():
+            setattr(server_wrap, name.upper(), value)
+        server_wrap.sessions = SessionRegistry()
+        server_wrap.broker = Broker()
+        server_wrap.resumable = {}
+        server_wrap._closing = False
+        server_wrap._idle_task = None
+        server_wrap._admissions = set()
+        server_wrap.connection_handler = connection_handler
+        server_wrap.debug_mode = debug_mode
+        server_wrap.options = options
+        server_wrap.handlers = {}
+        server_wrap.workers = 0
+        server_wrap.worker_init = None
+        server_wrap.server = None
+        server_wrap.port = server_wrap.path = server_wrap.name = None
+        return server_wrap
+
+    @classmethod
+    def _is_setting(cls, name: str) -> bool:
+        setting = name.upper()
+        return not setting.startswith('_') and setting == setting.upper() and hasattr(cls, setting)
+
+    def _serving(self):
+        """ Called once the sessions of this process are accepted """
+
+        if self.IDLE_TIMEOUT:
+            self._idle_task = asyncio.create_task(self._evict_idle())
+
+    def add_handler(self, method: str, handler: Callable):
+        """ Register a call handler for every session: `handler(session, **args)`, sync or async """
+
+        if not callable(handler):
+            raise ValueError('Unsupported handler type')
+        if self.workers:
+            raise RuntimeError('workers are already started, register handlers in `worker_init`')
+        self.handlers[method] = handler
+
+    def broadcast(self, **data) -> int:
+        """
+        Send to every session, the message is encoded once.
+        Not acknowledged: returns the number of sessions it is queued for (slow ones are skipped).
+        With workers every worker sends to its own sessions: call it in a worker, not in this process.
+        """
+        self._check_sessions_here()
+        return self.broker.publish(self.sessions, data)
+
+    def publish(self, topic: str, **data) -> int:
+        """ Send to the sessions subscribed to the topic (`session.subscribe(topic)`), like `broadcast` """
+        self._check_sessions_here()
+        return self.broker.publish(self.broker.topics.get(topic, ()), data)
+
+    def _check_sessions_here(self):
+        if self.workers:
+            raise RuntimeError('sessions are served by the workers, broadcast and publish in a worker (`worker_init`)')
+
     async def idle(self):
         """ Keep the Server active """
-        await self.server.serve_forever()
+        if self.workers:
+            await asyncio.shield(self._closed)
+        else:
+            await self.server.serve_forever()
 
     async def close(self):
         """ Close the server """
 
-        try:
-            # close server
-            self.server.close()
+        if self.workers:
+            return await self._stop_workers()
 
+        # stop accepting
+        self._closing = True
+        self.server.close()
+        self._reject_queued()
+        for task in list(self._admissions):
+            task.cancel()
+        if self._idle_task:
+            self._idle_task.cancel()
+
+        # let sessions end, then force cancel of not closed tasks
+        if not self.DRAIN_TIMEOUT or not await self.sessions.wait_empty(self.DRAIN_TIMEOUT):
+            [task.done() or task.cancel() for task in self.sessions.tasks]
+
+        try:
             # waiting for closing
             await asyncio.wait_for(self.server.wait_closed(), timeout=10)
         except asyncio.TimeoutError:
             pass
 
-        # force cancel of not closed tasks
-        [task.done() or task.cancel() for task in self.sessions]
\ No newline at end of file
+        path = self.path and unix_address(self.path)
+        if path and not path.startswith('\0'):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import signal
+import socket
+from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Type
+
+from ..client.protocol import FrameProtocol
+
+if TYPE_CHECKING:
+    from .server import AsyncSocketServer
+
+logger = logging.getLogger(__name__)
+
+
+def worker_main(
+    server_type: Type["AsyncSocketServer"], connection_handler: Callable, debug_mode: bool, options: dict,
+    worker_init: Optional[Callable], port: int, listener: socket.socket,
+):
+    """ Entry of a worker process """
+
+    # stopped by the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    server = server_type._create(connection_handler, debug_mode, options)
+    server.worker_init = worker_init
+    server.port = port
+    server._listener = listener
+    asyncio.run(server._worker())
+
+
+class Workers(ABC):
+    """
+    Sessions served by several processes, one event loop each.
+    Every worker listens on the same port with `SO_REUSEPORT`, so the kernel spreads connections across them
+    (where it is not available the workers accept from one listening socket of the parent).
+    Workers are new interpreters (`spawn`): nothing of this process is inherited, neither its event loop
+    nor its connections, which would stay open in the workers after this process closes them.
+    They get the listening socket, the connection handler, `worker_init` and the options pickled,
+    so the handlers must be importable functions.
+    """
+
+    WORKER_RESTART_DELAY = 1 # seconds before a crashed worker is started again
+    WORKER_STOP_TIMEOUT = 15 # seconds a worker may take to close its sessions before it is killed
+
+    workers: int # worker processes, 0 - sessions are served by this process
+    worker_init: Optional[Callable] # called in every worker with its server
+    _processes: Dict[int, multiprocessing.Process] # running workers by number
+    _listener: Optional[socket.socket] # port held by the parent while workers listen on it
+    _supervisor: ThreadPoolExecutor # a thread per worker waits for its exit
+
+    async def _start_workers(self: "AsyncSocketServer", port: int):
+        """ Hold the port and fork the workers, raise `OSError` when the port is busy """
+
+        reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._listener.bind(('0.0.0.0', port))
+
+            # the kernel only balances between listening sockets: the parent holds the port without listening
+            if not reuse_port:
+                self._listener.listen()
+                self._listener.setblocking(False)
+        except OSError:
+            self._listener.close()
+            raise
+
+        self.port = port
+        self._processes = {}
+        self._supervisor = ThreadPoolExecutor(self.workers, thread_name_prefix='aiosocketproto-supervisor')
+        self._closed = asyncio.get_running_loop().create_future()
+        for number in range(self.workers):
+            self._start_worker(number)
+
+    def _start_worker(self: "AsyncSocketServer", number: int):
+        if self._closing:
+            return
+
+        settings = {name: value for name, value in vars(self).items() if self._is_setting(name)}
+        process = multiprocessing.get_context('spawn').Process(
+            target=worker_main, name=f'aiosocketproto-worker-{number}', daemon=True, args=(
+                type(self), self.connection_handler, self.debug_mode, {**self.options, **settings},
+                self.worker_init, self.port, self._listener,
+            ),
+        )
+        process.start()
+        self._processes[number] = process
+
+        # the sentinel of the process can not be watched by every event loop (Windows)
+        exited = asyncio.get_running_loop().run_in_executor(self._supervisor, process.join)
+        exited.add_done_callback(lambda _: self._worker_exited(number, process))
+
+    def _worker_exited(self: "AsyncSocketServer", number: int, process: multiprocessing.Process):
+        """ Supervisor: start a crashed worker again """
+
+        if self._processes.get(number) is not process or self._closing:
+            return
+
+        logger.warning('worker %d exited with code %s, restarting', number, process.exitcode)
+        asyncio.get_running_loop().call_later(self.WORKER_RESTART_DELAY, self._start_worker, number)
+
+    async def _worker(self: "AsyncSocketServer"):
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        loop.add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+
+        if self.worker_init:
+            result = self.worker_init(self)
+            if inspect.isawaitable(result):
+                await result
+
+        if self._listener.getsockopt(socket.SOL_SOCKET, socket.SO_ACCEPTCONN):
+            self.server = await loop.create_server(
+                lambda: FrameProtocol(self._connection_handler_wrapper), sock=self._listener
+            )
+        else:
+            self._listener.close()
+            self.server = await loop.create_server(
+                lambda: FrameProtocol(self._connection_handler_wrapper), '0.0.0.0', self.port, reuse_port=True
+            )
+        self._listener = None
+        self._serving()
+
+        await stop
+        await self.close()
+
+    async def _stop_workers(self: "AsyncSocketServer"):
+        """ Let every worker close its sessions, kill the ones which do not exit in time """
+
+        self._closing = True
+        loop = asyncio.get_running_loop()
+        processes: List[multiprocessing.Process] = list(self._processes.values())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = loop.time() + self.WORKER_STOP_TIMEOUT
+        while any(process.is_alive() for process in processes) and loop.time() < deadline:
+            await asyncio.sleep(.05)
+
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+            process.join()
+
+        self._supervisor.shutdown(wait=False)
+        self._listener.close()
+        self._closed.done() or self._closed.set_result(None)
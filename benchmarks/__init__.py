@@ -0,0 +1,6 @@
+"""
+Benchmarks of aiosocketproto against a loopback server.
+
+Every module runs alone (`python -m benchmarks.latency --help`), `python -m benchmarks` runs
+a set of them, saves the results as JSON and compares them with a saved baseline.
+"""
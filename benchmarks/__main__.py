@@ -0,0 +1,146 @@
+"""
+Benchmark suite.
+
+Run benchmarks, save the results as JSON and compare them with a baseline:
+
+    python -m benchmarks run [suite ...] [--quick] [--output results.json] [--baseline baseline.json]
+    python -m benchmarks compare baseline.json results.json [--threshold 0.1]
+
+Suites: throughput, latency, idle, keepalive, serializer, codec, schema, allocations (default: all of them)
+and workers (only when named). A metric is a regression when it is worse than the baseline
+by more than the threshold (a fraction); `compare` and `run --baseline` exit with status 1 then.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Coroutine, Dict, List
+
+import aiosocketproto
+
+from . import allocations, codec, idle, keepalive, latency, schema, serializer, throughput, workers
+from .common import HIGHER, Results
+
+
+async def run_workers(quick: bool, port: int) -> Results:
+    results = Results()
+    for count in sorted({1, os.cpu_count() or 1}):
+        rate = await workers.run(count, 2, 4, 4, 2 if quick else 5, port)
+        results.add(f'workers.{count}.calls/s', rate)
+        print(f'workers {count:>3}: {rate:>10.0f} calls/s')
+    return results
+
+
+SUITES: Dict[str, Callable[[bool, int], Coroutine]] = {
+    'throughput': lambda quick, port: throughput.run(throughput.SIZES, .5 if quick else 2, 16, port),
+    'latency': lambda quick, port: latency.run(2000 if quick else 10000, 64, port),
+    'idle': lambda quick, port: idle.run([1000] if quick else [1000, 10000], 2 if quick else 5, port),
+    'keepalive': lambda quick, port: keepalive.run(200 if quick else 1000, 1, 2 if quick else 5, 200 if quick else 1000, port),
+    'serializer': lambda quick, port: serializer.run(.2 if quick else 1),
+    'codec': lambda quick, port: codec.run(.2 if quick else 1),
+    'schema': lambda quick, port: schema.run(.2 if quick else 1, 1000),
+    'allocations': lambda quick, port: allocations.run(2000 if quick else 10000, 64, 200 if quick else 1000),
+    'workers': run_workers,
+}
+DEFAULT_SUITES = [name for name in SUITES if name != 'workers']
+
+
+def run(suites: List[str], quick: bool, port: int) -> dict:
+    results = Results()
+    for name in suites:
+        print(f'== {name}')
+        results.update(asyncio.run(SUITES[name](quick, port)))
+
+    return {
+        'meta': {
+            'version': aiosocketproto.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': quick,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """ Print the change of every metric of both runs, return names of the regressions """
+
+    regressions = []
+    print(f'{"metric":<48} {"baseline":>12} {"current":>12} {"change":>8}')
+    for name, metric in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<48} {"-":>12} {metric["value"]:>12.4g}      new')
+            continue
+
+        old, new = base['value'], metric['value']
+        change = (new - old) / old if old else 0.
+        # positive is better
+        gain = change if metric['better'] == HIGHER else -change
+        mark = ''
+        if gain < -threshold:
+            mark = '  REGRESSION'
+            regressions.append(name)
+        elif gain > threshold:
+            mark = '  improved'
+        print(f'{name:<48} {old:>12.4g} {new:>12.4g} {change * 100:>+7.1f}%{mark}')
+
+    missing = baseline['results'].keys() - current['results'].keys()
+    if missing:
+        print(f'{len(missing)} metric(s) of the baseline are not in this run')
+    if baseline.get('meta', {}).get('platform') != current.get('meta', {}).get('platform'):
+        print('note: the runs were made on different platforms')
+    print(f'{len(regressions)} regression(s) over {threshold * 100:.0f}%')
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks')
+    run_parser.add_argument('suites', nargs='*', metavar='suite', help=', '.join(SUITES))
+    run_parser.add_argument('--quick', action='store_true', help='shorter runs, fewer samples and sessions')
+    run_parser.add_argument('--output', help='save results to a JSON file')
+    run_parser.add_argument('--baseline', help='compare with the results in a JSON file')
+    run_parser.add_argument('--threshold', type=float, default=.1)
+    run_parser.add_argument('--port', type=int, default=9900)
+
+    compare_parser = commands.add_parser('compare', help='compare saved results with a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=.1)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        unknown = set(args.suites) - SUITES.keys()
+        if unknown:
+            parser.error(f'unknown suites: {", ".join(sorted(unknown))}')
+        current = run(args.suites or DEFAULT_SUITES, args.quick, args.port)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(current, file, indent=2)
+        if not args.baseline:
+            return
+        baseline = load(args.baseline)
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+
+    if compare(baseline, current, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
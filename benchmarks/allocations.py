@@ -0,0 +1,143 @@
+"""
+Allocations benchmark.
+
+Memory blocks and bytes allocated per message, traced with `tracemalloc` over the in-memory transport:
+
+- send: what an encoded packet holds while it waits for its acknowledge (and may be written again),
+  and the peak of traced memory while messages are sent one after another
+- receive: what a received message holds while it waits in the queue for `receive`
+- idle: bytes held by a connected session which sends nothing
+
+    python -m benchmarks.allocations [--messages 10000] [--size 64] [--sessions 1000]
+"""
+import argparse
+import asyncio
+import tracemalloc
+from typing import List, Tuple
+
+import aiosocketproto
+
+from .common import LOWER, Results
+
+
+def traced() -> Tuple[int, int]:
+    """ Traced blocks and bytes """
+
+    statistics = tracemalloc.take_snapshot().statistics('filename')
+    return sum(stat.count for stat in statistics), sum(stat.size for stat in statistics)
+
+
+def difference(before: Tuple[int, int], count: int) -> Tuple[float, float]:
+    """ Blocks and bytes allocated since `before`, per item """
+
+    blocks, size = traced()
+    return (blocks - before[0]) / count, (size - before[1]) / count
+
+
+async def hold(socket: aiosocketproto.AsyncSocketClient):
+    """ Messages stay in the receive queue """
+
+    await socket.protocol.closed
+
+
+async def echo(socket: aiosocketproto.AsyncSocketClient):
+    while True:
+        message = await socket.receive()
+        await socket.send(**message)
+
+
+async def measure_send(messages: int, size: int) -> Tuple[float, float, float]:
+    server = await aiosocketproto.start_memory_server('allocations', echo)
+    client = await aiosocketproto.connect_memory('allocations')
+    payload = b'x' * size
+
+    # warm up
+    for _ in range(100):
+        await client.send(data=payload)
+        await client.receive()
+
+    tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    for _ in range(messages):
+        await client.send(data=payload)
+        await client.receive()
+    peak = tracemalloc.get_traced_memory()[1] - current
+
+    # packets are not sent, their sequences would be missing on the server
+    before = traced()
+    packets = [client._encode_packet({'data': payload}) for _ in range(messages)]
+    blocks, allocated = difference(before, messages)
+    del packets
+
+    client.transport.abort()
+    await server.close()
+    return blocks, allocated, peak
+
+
+async def measure_receive(messages: int, size: int) -> Tuple[float, float]:
+    server = await aiosocketproto.start_memory_server('allocations', hold, receive_queue_size=0, receive_queue_bytes=0)
+    client = await aiosocketproto.connect_memory('allocations')
+    session = next(iter(server.sessions))
+    payload = b'x' * size
+
+    before = traced()
+    for _ in range(messages):
+        await client.send(data=payload)
+    while session._received_packets.qsize() < messages:
+        await asyncio.sleep(.01)
+    result = difference(before, messages)
+
+    await client.close()
+    await server.close()
+    return result
+
+
+async def measure_idle(sessions: int) -> float:
+    server = await aiosocketproto.start_memory_server('allocations', hold)
+    await asyncio.sleep(0)
+
+    before = traced()
+    clients: List[aiosocketproto.AsyncSocketClient] = [await aiosocketproto.connect_memory('allocations') for _ in range(sessions)]
+    await asyncio.sleep(.1)
+    per_session = difference(before, sessions)[1]
+
+    for client in clients:
+        await client.close()
+    await server.close()
+    return per_session
+
+
+async def run(messages: int, size: int, sessions: int) -> Results:
+    results = Results()
+    tracemalloc.start()
+    try:
+        send_blocks, send_bytes, peak = await measure_send(messages, size)
+        receive_blocks, receive_bytes = await measure_receive(messages, size)
+        idle_bytes = await measure_idle(sessions)
+    finally:
+        tracemalloc.stop()
+
+    results.add('allocations.send.blocks/message', send_blocks, LOWER)
+    results.add('allocations.send.bytes/message', send_bytes, LOWER)
+    results.add('allocations.send.peak_bytes', peak, LOWER)
+    results.add('allocations.receive.blocks/message', receive_blocks, LOWER)
+    results.add('allocations.receive.bytes/message', receive_bytes, LOWER)
+    results.add('allocations.idle.bytes/session', idle_bytes, LOWER)
+
+    print(f'send:    {send_blocks:>8.2f} blocks {send_bytes:>10.0f} bytes per message, peak {peak / 1024:.0f} KB')
+    print(f'receive: {receive_blocks:>8.2f} blocks {receive_bytes:>10.0f} bytes per message')
+    print(f'idle:    {idle_bytes / 1024:>8.1f} KB per session ({sessions} sessions)')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=64, help='payload bytes')
+    parser.add_argument('--sessions', type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.size, args.sessions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Codec benchmark.
+
+Compares encode/decode throughput and wire size of the payload codecs.
+
+    python -m benchmarks.codec [--seconds 1]
+"""
+import argparse
+import asyncio
+import os
+
+from aiosocketproto import AsyncSocketClient
+from aiosocketproto.client.codec import REGISTRY
+from aiosocketproto.client.protocol import FrameProtocol
+
+from .common import LOWER, Results, measure
+
+PAYLOADS = {
+    'small dict': lambda: {'id': 12345, 'name': 'user', 'active': True, 'score': 0.5},
+    'nested': lambda: {'rows': [{'id': i, 'tags': ('a', 'b'), 'value': i * .5} for i in range(1000)]},
+    'bytes 64K': lambda: {'data': os.urandom(64 * 1024)},
+    'bytes 4M': lambda: {'data': os.urandom(4 * 1024 * 1024)},
+}
+
+
+async def run(seconds: float) -> Results:
+    client = AsyncSocketClient(FrameProtocol())
+    results = Results()
+
+    print(f'{"payload":<12} {"codec":<8} {"wire size":>12} {"encode/s":>12} {"decode/s":>12}')
+    for payload_name, factory in PAYLOADS.items():
+        data = factory()
+        for codec_name, codec_type in REGISTRY.items():
+            codec = codec_type(client)
+            attachments = []
+            payload = codec.encode(data, attachments)
+            size = len(payload) + sum(len(attachment) for attachment in attachments)
+            encode_rate = measure(lambda: codec.encode(data, []), seconds)
+            decode_rate = measure(lambda: codec.decode(memoryview(payload), attachments), seconds)
+            name = f'codec.{payload_name.replace(" ", "_")}.{codec_name}'
+            results.add(f'{name}.encode/s', encode_rate)
+            results.add(f'{name}.decode/s', decode_rate)
+            results.add(f'{name}.wire_bytes', size, LOWER)
+            print(f'{payload_name:<12} {codec_name:<8} {size:>12} {encode_rate:>12.1f} {decode_rate:>12.1f}')
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds))
+
+
+if __name__ == '__main__':
+    main()
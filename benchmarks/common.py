@@ -0,0 +1,62 @@
+"""
+Helpers shared by the benchmarks: timing, percentiles, process memory and the results format.
+
+A result is a named value and the direction which is better, so runs can be compared:
+
+    {"latency.message.p99_ms": {"value": 0.41, "better": "lower"}}
+"""
+import os
+import resource
+import time
+from typing import Dict, Sequence
+
+HIGHER = 'higher'
+LOWER = 'lower'
+
+
+class Results(Dict[str, Dict[str, object]]):
+    """ Values of a benchmark run by metric name """
+
+    def add(self, name: str, value: float, better: str = HIGHER):
+        self[name] = {'value': round(value, 6), 'better': better}
+
+
+def measure(function, seconds: float) -> float:
+    """ Calls per second """
+    calls, begin = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - begin) < seconds:
+        function()
+        calls += 1
+    return calls / elapsed
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    """ Nearest-rank percentile of sorted values """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def size_name(size: int) -> str:
+    for unit, scale in (('MB', 1024 * 1024), ('KB', 1024)):
+        if size >= scale and size % scale == 0:
+            return f'{size // scale}{unit}'
+    return f'{size}B'
+
+
+def rss() -> int:
+    """ Resident memory of this process in bytes """
+
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # peak, not current: still grows with sessions held open
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def raise_files_limit(files: int):
+    """ Open files limit of this process up to `files` (at most to the hard limit) """
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < files:
+        wanted = files if hard == resource.RLIM_INFINITY else min(files, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
@@ -0,0 +1,117 @@
+"""
+Idle sessions benchmark.
+
+Memory and CPU of a server holding many connections which send nothing.
+The clients live in a child process, so the numbers are those of the server process alone
+(and neither process needs more than one file descriptor per session).
+
+    python -m benchmarks.idle [--sessions 1000 10000] [--idle 5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from typing import Sequence
+
+import aiosocketproto
+
+from .common import LOWER, Results, raise_files_limit, rss
+
+CONNECT_BATCH = 100 # connections opened at once, below the listen backlog
+
+
+async def hold(port: int, sessions: int, options: dict, control):
+    """ Open the connections, then report own CPU time between the commands of the parent """
+
+    clients = []
+    for begin in range(0, sessions, CONNECT_BATCH):
+        batch = range(begin, min(begin + CONNECT_BATCH, sessions))
+        clients.extend(await asyncio.gather(*(aiosocketproto.connect('127.0.0.1', port, **options) for _ in batch)))
+
+    loop = asyncio.get_running_loop()
+    control.send('ready')
+    await loop.run_in_executor(None, control.recv)
+    cpu_begin = time.process_time()
+    await loop.run_in_executor(None, control.recv)
+    control.send(time.process_time() - cpu_begin)
+
+    for client in clients:
+        await client.close()
+
+
+def client_process(port: int, sessions: int, options: dict, control):
+    raise_files_limit(sessions + 100)
+    asyncio.run(hold(port, sessions, options, control))
+
+
+class Sessions:
+    """ Connections to a server held by a child process """
+
+    def __init__(self, port: int, sessions: int, **options):
+        context = multiprocessing.get_context('fork')
+        self._control, child_control = context.Pipe()
+        self._process = context.Process(target=client_process, args=(port, sessions, options, child_control))
+
+    async def open(self):
+        self._process.start()
+        if await self._receive() != 'ready':
+            raise RuntimeError('client process failed')
+
+    async def measure(self, seconds: float) -> (float, float):
+        """ CPU seconds of this process and of the clients during `seconds` """
+
+        self._control.send('begin')
+        cpu_begin = time.process_time()
+        await asyncio.sleep(seconds)
+        cpu = time.process_time() - cpu_begin
+        self._control.send('end')
+        return cpu, await self._receive()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._process.join)
+
+    async def _receive(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self._control.recv)
+
+
+async def run(counts: Sequence[int], idle: float, port: int) -> Results:
+    async def connection(socket: aiosocketproto.AsyncSocketClient):
+        await socket.protocol.closed
+
+    results = Results()
+    print(f'{"sessions":>8} {"rss/session KB":>15} {"idle cpu %":>11}')
+    for sessions in counts:
+        raise_files_limit(sessions + 100)
+        server = await aiosocketproto.start_server(range(port, port + 100), connection)
+        memory_begin = rss()
+
+        clients = Sessions(server.port, sessions)
+        await clients.open()
+        while len(server.sessions) < sessions:
+            await asyncio.sleep(.1)
+        await asyncio.sleep(1)
+        per_session = (rss() - memory_begin) / sessions
+        cpu, _ = await clients.measure(idle)
+
+        results.add(f'idle.{sessions}.rss_per_session_KB', per_session / 1024, LOWER)
+        results.add(f'idle.{sessions}.cpu_percent', cpu / idle * 100, LOWER)
+        print(f'{sessions:>8} {per_session / 1024:>15.1f} {cpu / idle * 100:>11.2f}')
+
+        await clients.close()
+        await server.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--idle', type=float, default=5, help='seconds of measurement')
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.idle, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Keep-alive benchmark.
+
+Cost of pings: CPU of the server and client processes while idle sessions ping every `--interval`
+seconds, per ping (either side of a session may ping, one ping per interval resets both timers),
+and the round trip of a single ping.
+
+    python -m benchmarks.keepalive [--sessions 1000] [--interval 1] [--idle 5] [--samples 1000]
+"""
+import argparse
+import asyncio
+import time
+
+import aiosocketproto
+
+from .common import LOWER, Results, percentile, raise_files_limit
+from .idle import Sessions
+
+
+async def run(sessions: int, interval: float, idle: float, samples: int, port: int) -> Results:
+    async def connection(socket: aiosocketproto.AsyncSocketClient):
+        await socket.protocol.closed
+
+    raise_files_limit(sessions + 100)
+    server = await aiosocketproto.start_server(range(port, port + 100), connection, ping_interval=interval)
+
+    clients = Sessions(server.port, sessions, ping_interval=interval)
+    await clients.open()
+    # timers of the sessions spread over the interval
+    await asyncio.sleep(interval * 2)
+    server_cpu, client_cpu = await clients.measure(idle)
+    pings = sessions * idle / interval
+    await clients.close()
+
+    client = await aiosocketproto.connect('127.0.0.1', server.port)
+    latencies = []
+    for _ in range(samples):
+        begin = time.perf_counter()
+        await client._ping()
+        latencies.append(time.perf_counter() - begin)
+    latencies.sort()
+    await client.close()
+    await server.close()
+
+    results = Results()
+    results.add('keepalive.server_cpu_us_per_ping', server_cpu / pings * 1e6, LOWER)
+    results.add('keepalive.client_cpu_us_per_ping', client_cpu / pings * 1e6, LOWER)
+    results.add('keepalive.ping_p50_ms', percentile(latencies, .5) * 1000, LOWER)
+    results.add('keepalive.ping_p99_ms', percentile(latencies, .99) * 1000, LOWER)
+    print(f'sessions:         {sessions}, ping every {interval} s')
+    print(f'server cpu/ping:  {server_cpu / pings * 1e6:.1f} us')
+    print(f'client cpu/ping:  {client_cpu / pings * 1e6:.1f} us')
+    print(f'ping p50:         {percentile(latencies, .5) * 1000:.3f} ms')
+    print(f'ping p99:         {percentile(latencies, .99) * 1000:.3f} ms')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--interval', type=float, default=1, help='ping interval in seconds')
+    parser.add_argument('--idle', type=float, default=5, help='seconds of measurement')
+    parser.add_argument('--samples', type=int, default=1000, help='timed pings')
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.interval, args.idle, args.samples, args.port))
+
+
+if __name__ == '__main__':
+    main()
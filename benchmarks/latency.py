@@ -0,0 +1,101 @@
+"""
+Round-trip latency benchmark.
+
+One message at a time to a server which echoes it back: a message answered by a message
+(`send` + `receive`) and a call answered by its result (`call`). Reports p50, p99 and p99.9
+for every transport: TCP over loopback, Unix domain socket and in-memory.
+
+    python -m benchmarks.latency [--samples 10000] [--size 64] [--transports tcp unix memory]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Sequence
+
+import aiosocketproto
+
+from .common import LOWER, Results, percentile
+
+PERCENTILES = {'p50': .5, 'p99': .99, 'p999': .999}
+TRANSPORTS = ('tcp', 'unix', 'memory')
+
+
+async def connection(socket: aiosocketproto.AsyncSocketClient):
+    while True:
+        message = await socket.receive()
+        await socket.send(**message)
+
+
+async def start(transport: str, port: int) -> (aiosocketproto.AsyncSocketServer, aiosocketproto.AsyncSocketClient):
+    """ Echo server and a client connected to it """
+
+    if transport == 'tcp':
+        server = await aiosocketproto.start_server(range(port, port + 100), connection)
+        client = await aiosocketproto.connect('127.0.0.1', server.port)
+    elif transport == 'unix':
+        path = os.path.join(tempfile.gettempdir(), f'aiosocketproto-benchmark-{os.getpid()}.sock')
+        server = await aiosocketproto.start_unix_server(path, connection)
+        client = await aiosocketproto.connect_unix(path)
+    elif transport == 'memory':
+        server = await aiosocketproto.start_memory_server('benchmark', connection)
+        client = await aiosocketproto.connect_memory('benchmark')
+    else:
+        raise ValueError(f'unknown transport: {transport}')
+
+    server.add_handler('echo', lambda session, **data: data)
+    return server, client
+
+
+async def run(samples: int, size: int, port: int, transports: Sequence[str] = TRANSPORTS) -> Results:
+    results = Results()
+    print(f'{"transport":<10} {"mode":<8} {"p50 ms":>8} {"p99 ms":>8} {"p999 ms":>8}')
+    for transport in transports:
+        server, client = await start(transport, port)
+        await measure(client, transport, samples, size, results)
+        await client.close()
+        await server.close()
+    return results
+
+
+async def measure(client: aiosocketproto.AsyncSocketClient, transport: str, samples: int, size: int, results: Results):
+    payload = b'x' * size
+
+    async def message():
+        await client.send(data=payload)
+        await client.receive()
+
+    async def call():
+        await client.call('echo', data=payload)
+
+    for mode, round_trip in (('message', message), ('call', call)):
+        # warm up
+        for _ in range(min(samples, 100)):
+            await round_trip()
+
+        latencies = []
+        for _ in range(samples):
+            begin = time.perf_counter()
+            await round_trip()
+            latencies.append(time.perf_counter() - begin)
+        latencies.sort()
+
+        values = {name: percentile(latencies, fraction) * 1000 for name, fraction in PERCENTILES.items()}
+        for name, value in values.items():
+            results.add(f'latency.{transport}.{mode}.{name}_ms', value, LOWER)
+        print(f'{transport:<10} {mode:<8} {values["p50"]:>8.3f} {values["p99"]:>8.3f} {values["p999"]:>8.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=64, help='payload bytes')
+    parser.add_argument('--transports', nargs='+', choices=TRANSPORTS, default=TRANSPORTS)
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+    asyncio.run(run(args.samples, args.size, args.port, args.transports))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Message schema benchmark.
+
+Compares a fixed-shape record sent through a hand-written `SerializerType` (the record as a dict)
+with the same record registered by `register_schema`: encode/decode rate and wire size per codec.
+
+    python -m benchmarks.schema [--seconds 1] [--records 1000]
+"""
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+
+from aiosocketproto import AsyncSocketClient, SerializerType, register_schema
+from aiosocketproto.client.codec import REGISTRY
+from aiosocketproto.client.protocol import FrameProtocol
+from aiosocketproto.client.schema import SCHEMAS_BY_ID
+
+from .common import LOWER, Results, measure
+
+
+@dataclass
+class Trade:
+    id: int
+    symbol: str
+    price: float
+    quantity: int
+    buy: bool
+
+
+@dataclass
+class Quote:
+    id: int
+    symbol: str
+    price: float
+    quantity: int
+    buy: bool
+
+
+class QuoteSerializer(SerializerType):
+    INSTANCE = Quote
+
+    @classmethod
+    def serialize(cls, data: Quote) -> dict:
+        return asdict(data)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> Quote:
+        return Quote(**data)
+
+
+async def run(seconds: float, records: int) -> Results:
+    register_schema(Trade)
+    client = AsyncSocketClient(FrameProtocol())
+    client.add_serializer(QuoteSerializer)
+    client._peer_schemas = frozenset(SCHEMAS_BY_ID)
+
+    messages = {
+        'serializer': {'items': [Quote(i, 'ABC', i * .5, i, i % 2 == 0) for i in range(records)]},
+        'schema': {'items': [Trade(i, 'ABC', i * .5, i, i % 2 == 0) for i in range(records)]},
+    }
+
+    results = Results()
+    print(f'{"codec":<8} {"type":<12} {"wire size":>10} {"encode/s":>10} {"decode/s":>10}')
+    for codec_name, codec_type in REGISTRY.items():
+        codec = codec_type(client)
+        for kind, data in messages.items():
+            payload = codec.encode(data, [])
+            assert codec.decode(memoryview(payload), []) == data
+            encode_rate = measure(lambda: codec.encode(data, []), seconds)
+            decode_rate = measure(lambda: codec.decode(memoryview(payload), []), seconds)
+            results.add(f'schema.{codec_name}.{kind}.encode/s', encode_rate)
+            results.add(f'schema.{codec_name}.{kind}.decode/s', decode_rate)
+            results.add(f'schema.{codec_name}.{kind}.wire_bytes', len(payload), LOWER)
+            print(f'{codec_name:<8} {kind:<12} {len(payload):>10} {encode_rate:>10.1f} {decode_rate:>10.1f}')
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=1)
+    parser.add_argument('--records', type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds, args.records))
+
+
+if __name__ == '__main__':
+    main()
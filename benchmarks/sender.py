@@ -0,0 +1,63 @@
+"""
+Sender loop benchmark.
+
+Measures CPU consumed by idle sessions and the latency of a single send
+(from `send()` call to `receive()` on the peer).
+
+    python -m benchmarks.sender [--sessions 500] [--idle 5] [--messages 500]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiosocketproto
+
+
+async def run(sessions: int, idle: float, messages: int, port: int):
+    received = asyncio.Queue()
+
+    async def connection(socket: aiosocketproto.AsyncSocketClient):
+        while True:
+            await socket.receive()
+            received.put_nowait(time.perf_counter())
+
+    server = await aiosocketproto.start_server(range(port, port + 100), connection)
+    clients = [await aiosocketproto.connect('127.0.0.1', server.port) for _ in range(sessions)]
+
+    # idle CPU
+    await asyncio.sleep(1)
+    cpu_begin, wall_begin = time.process_time(), time.perf_counter()
+    await asyncio.sleep(idle)
+    cpu_usage = (time.process_time() - cpu_begin) / (time.perf_counter() - wall_begin)
+
+    # send latency
+    latencies = []
+    for _ in range(messages):
+        begin = time.perf_counter()
+        await clients[0].send(data=b'x' * 64)
+        latencies.append(await received.get() - begin)
+
+    latencies.sort()
+    print(f'sessions:       {sessions}')
+    print(f'idle cpu:       {cpu_usage * 100:.2f}%')
+    print(f'latency p50:    {statistics.median(latencies) * 1000:.3f} ms')
+    print(f'latency p99:    {latencies[int(len(latencies) * .99) - 1] * 1000:.3f} ms')
+
+    for client in clients:
+        await client.close()
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--idle', type=float, default=5)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.idle, args.messages, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Serializer benchmark.
+
+Measures `serialize` and `deserialize` (the type walk of the JSON codec, without JSON itself)
+on nested payloads of 10k+ values.
+
+    python -m benchmarks.serializer [--seconds 1]
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from aiosocketproto import AsyncSocketClient, SerializerType
+from aiosocketproto.client.protocol import FrameProtocol
+
+from .common import Results, measure
+
+
+class DatetimeSerializer(SerializerType):
+    INSTANCE = datetime
+
+    @classmethod
+    def serialize(cls, data: datetime) -> str:
+        return data.isoformat()
+
+    @classmethod
+    def deserialize(cls, data: str) -> datetime:
+        return datetime.fromisoformat(data)
+
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+PAYLOADS = {
+    'records': lambda: {'rows': [
+        {'id': i, 'name': f'user {i}', 'active': i % 2 == 0, 'score': i * .5, 'parent': None}
+        for i in range(10000)
+    ]},
+    'numbers': lambda: {'series': [[float(i + j) for j in range(100)] for i in range(100)]},
+    'mixed': lambda: {'rows': [
+        {'id': i, 'tags': ('a', 'b', 'c'), 'groups': {1, 2}, 'created': NOW, 'values': [i, i + 1, i + 2]}
+        for i in range(2500)
+    ]},
+}
+
+
+async def run(seconds: float) -> Results:
+    client = AsyncSocketClient(FrameProtocol())
+    client.add_serializer(DatetimeSerializer)
+
+    results = Results()
+    print(f'{"payload":<10} {"serialize/s":>12} {"deserialize/s":>14}')
+    for payload_name, factory in PAYLOADS.items():
+        data = factory()
+
+        # deserialize gets what JSON gives back
+        serialized = json.loads(json.dumps(client.serialize(data)))
+        assert client.deserialize(serialized) == data
+
+        serialize_rate = measure(lambda: client.serialize(data), seconds)
+        deserialize_rate = measure(lambda: client.deserialize(serialized), seconds)
+        results.add(f'serializer.{payload_name}.serialize/s', serialize_rate)
+        results.add(f'serializer.{payload_name}.deserialize/s', deserialize_rate)
+        print(f'{payload_name:<10} {serialize_rate:>12.1f} {deserialize_rate:>14.1f}')
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Throughput benchmark.
+
+Messages and megabytes per second from a client to a loopback server, by payload size.
+Several sends are in flight at once, so the window is full and the round trip does not limit the rate.
+
+    python -m benchmarks.throughput [--sizes 64 1024 65536 1048576 67108864] [--seconds 2] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import time
+from typing import Sequence
+
+import aiosocketproto
+
+from .common import Results, size_name
+
+SIZES = (64, 1024, 64 * 1024, 1024 * 1024, 64 * 1024 * 1024)
+
+
+async def measure_size(client: aiosocketproto.AsyncSocketClient, size: int, seconds: float, concurrency: int) -> (int, float):
+    """ Messages sent in about `seconds` (at least one by every sender) and the time they took """
+
+    payload = b'x' * size
+    deadline = time.perf_counter() + seconds
+    sent = 0
+
+    async def sender():
+        nonlocal sent
+        while True:
+            await client.send(data=payload)
+            sent += 1
+            if time.perf_counter() >= deadline:
+                return
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return sent, time.perf_counter() - begin
+
+
+async def run(sizes: Sequence[int], seconds: float, concurrency: int, port: int) -> Results:
+    async def connection(socket: aiosocketproto.AsyncSocketClient):
+        while True:
+            await socket.receive()
+
+    server = await aiosocketproto.start_server(range(port, port + 100), connection)
+    client = await aiosocketproto.connect('127.0.0.1', server.port)
+
+    results = Results()
+    print(f'{"payload":>8} {"messages/s":>12} {"MB/s":>10}')
+    for size in sizes:
+        # large payloads fill the send queue with a few messages
+        senders = max(1, min(concurrency, client.SEND_QUEUE_BYTES // size))
+        sent, elapsed = await measure_size(client, size, seconds, senders)
+        rate = sent / elapsed
+        results.add(f'throughput.{size_name(size)}.messages/s', rate)
+        results.add(f'throughput.{size_name(size)}.MB/s', rate * size / 1e6)
+        print(f'{size_name(size):>8} {rate:>12.1f} {rate * size / 1e6:>10.2f}')
+
+    await client.close()
+    await server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--concurrency', type=int, default=16, help='sends in flight')
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.seconds, args.concurrency, args.port))
+
+
+if __name__ == '__main__':
+    main()
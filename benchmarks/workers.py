@@ -0,0 +1,92 @@
+"""
+Server workers benchmark.
+
+Measures calls per second served by 1..N worker processes. The load comes from client processes,
+so the clients are not the bottleneck; each call decodes and encodes a nested payload on the server.
+
+    python -m benchmarks.workers [--workers 1 2 4] [--clients 4] [--connections 8] [--seconds 5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import aiosocketproto
+
+PAYLOAD = {'rows': [{'id': i, 'name': f'row {i}', 'value': i * .5} for i in range(50)]}
+
+
+async def connection(socket: aiosocketproto.AsyncSocketClient):
+    await socket.protocol.closed
+
+
+def worker_init(server: aiosocketproto.AsyncSocketServer):
+    server.add_handler('echo', lambda session, rows: rows)
+
+
+async def load(port: int, connections: int, concurrency: int, seconds: float) -> int:
+    clients = [await aiosocketproto.connect('127.0.0.1', port) for _ in range(connections)]
+    deadline = time.perf_counter() + seconds
+    calls = 0
+
+    async def caller(client: aiosocketproto.AsyncSocketClient):
+        nonlocal calls
+        while time.perf_counter() < deadline:
+            await client.call('echo', **PAYLOAD)
+            calls += 1
+
+    await asyncio.gather(*(caller(client) for client in clients for _ in range(concurrency)))
+    for client in clients:
+        await client.close()
+    return calls
+
+
+def client_process(port: int, connections: int, concurrency: int, seconds: float, results: multiprocessing.Queue):
+    results.put(asyncio.run(load(port, connections, concurrency, seconds)))
+
+
+async def run(workers: int, clients: int, connections: int, concurrency: int, seconds: float, port: int) -> float:
+    server = await aiosocketproto.start_server(
+        range(port, port + 100), connection, workers=workers, worker_init=worker_init
+    )
+    await asyncio.sleep(.5)
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(target=client_process, args=(server.port, connections, concurrency, seconds, results))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+
+    loop = asyncio.get_running_loop()
+    calls = sum([await loop.run_in_executor(None, results.get) for _ in processes])
+    for process in processes:
+        process.join()
+
+    await server.close()
+    return calls / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=4, help='client processes')
+    parser.add_argument('--connections', type=int, default=8, help='connections of every client process')
+    parser.add_argument('--concurrency', type=int, default=4, help='calls in flight on every connection')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--port', type=int, default=9900)
+    args = parser.parse_args()
+
+    print(f'cpu cores: {os.cpu_count()}')
+    baseline = None
+    for workers in args.workers:
+        rate = asyncio.run(run(workers, args.clients, args.connections, args.concurrency, args.seconds, args.port))
+        baseline = baseline or rate
+        print(f'workers {workers:>3}: {rate:>10.0f} calls/s  x{rate / baseline:.2f}')
+
+
+if __name__ == '__main__':
+    main()
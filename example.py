@@ -83,7 +83,7 @@ class Example:
             print(type_name.rjust(20), time.time() - self.start_timestamp, data['data'])
 
         # example delay
-        # the connection keeps active, a ping is sent every PING_INTERVAL seconds
+        # the connection keeps active, a ping is sent when nothing comes for PING_INTERVAL seconds
         print(
             '\n'
             'Done!'
@@ -13,7 +13,7 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/webdenisenko/aiosocketproto",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=('benchmarks', 'benchmarks.*')),
     classifiers=[
         "Programming Language :: Python :: 3.10",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,57 @@
+import unittest
+
+from aiosocketproto.client.codec import BinaryCodec
+from aiosocketproto.client.offload import CodecHost
+
+MESSAGE = {
+    'none': None, 'flags': [True, False], 'int': -42, 'big': 2 ** 80, 'float': 1.5, 'text': 'zażółć',
+    'bytes': b'\x00\x01', 'bytearray': bytearray(b'xyz'), 'tuple': (1, 'a'), 'set': {3},
+    'nested': {'list': [{'a': 1}, [2.5, None]], 7: 'not a str key'},
+    'large': b'\xff' * 100,
+}
+
+
+def codec(attachment_size: int = 64) -> BinaryCodec:
+    return CodecHost(BinaryCodec, (), frozenset(), attachment_size).codec
+
+
+class BinaryCodecTest(unittest.TestCase):
+
+    def round_trip(self, data: dict, attachment_size: int = 64):
+        attachments = []
+        payload = codec(attachment_size).encode(data, attachments)
+        return payload, attachments, codec(attachment_size).decode(memoryview(payload), attachments)
+
+    def test_round_trip(self):
+        _, attachments, decoded = self.round_trip(MESSAGE)
+        self.assertEqual(len(attachments), 1)
+        self.assertEqual(bytes(decoded.pop('large')), MESSAGE['large'])
+        self.assertEqual(decoded, {name: value for name, value in MESSAGE.items() if name != 'large'})
+        self.assertIs(type(decoded['bytearray']), bytearray)
+
+    def test_round_trip_without_attachments(self):
+        _, attachments, decoded = self.round_trip(MESSAGE, attachment_size=0)
+        self.assertEqual(attachments, [])
+        self.assertEqual(decoded, MESSAGE)
+
+    def test_truncated(self):
+        attachments = []
+        payload = codec().encode(MESSAGE, attachments)
+        for end in range(len(payload)):
+            with self.subTest(end=end), self.assertRaisesRegex(ValueError, 'malformed binary payload'):
+                codec().decode(memoryview(payload[:end]), attachments)
+
+    def test_trailing_bytes(self):
+        payload = codec().encode({'a': 1}, [])
+        with self.assertRaisesRegex(ValueError, 'malformed binary payload'):
+            codec().decode(memoryview(payload + b'\x00'), [])
+
+    def test_missing_attachment(self):
+        attachments = []
+        payload = codec().encode({'large': MESSAGE['large']}, attachments)
+        with self.assertRaisesRegex(ValueError, 'malformed binary payload'):
+            codec().decode(memoryview(payload), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+from aiosocketproto.client.compression import ALGORITHMS
+
+LIMIT = 64 * 1024
+
+
+class DecompressionLimitTest(unittest.IsolatedAsyncioTestCase):
+    """ A few compressed bytes of the peer do not expand over the frame size limit """
+
+    def test_algorithms(self):
+        for name, algorithm in ALGORITHMS.items():
+            with self.subTest(algorithm=name):
+                compression = algorithm(max_size=LIMIT)
+                payload = b'\0' * LIMIT
+                self.assertEqual(compression.decompress(compression.compress(payload)), payload)
+
+                bomb = compression.compress(b'\0' * (LIMIT * 100))
+                self.assertLess(len(bomb), LIMIT)
+                with self.assertRaisesRegex(ValueError, 'over the limit'):
+                    compression.decompress(bomb)
+
+    async def test_zip_bomb(self):
+        results = asyncio.Queue()
+
+        async def handler(session: aiosocketproto.AsyncSocketClient):
+            for _ in range(2):
+                try:
+                    results.put_nowait(await session.receive())
+                except ValueError as exc:
+                    results.put_nowait(exc)
+
+        server = await aiosocketproto.start_memory_server('bomb', handler, compression=('zlib',), max_frame_size=LIMIT)
+        client = await aiosocketproto.connect_memory('bomb', compression=('zlib',))
+        try:
+            await client.send(text='x' * LIMIT * 100)
+            await client.send(text='fine')
+            self.assertIsInstance(await results.get(), ValueError)
+            # the session goes on
+            self.assertEqual(await results.get(), {'text': 'fine'})
+        finally:
+            await client.close()
+            await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
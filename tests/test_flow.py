@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+
+RECEIVE_QUEUE_SIZE = 8
+SEND_QUEUE_SIZE = 16
+WINDOW_SIZE = 4
+
+
+class FlowControlTest(unittest.IsolatedAsyncioTestCase):
+    """ Bounded send and receive queues: a consumer which does not take messages stops the sender """
+
+    async def asyncSetUp(self):
+        sessions = asyncio.Queue()
+
+        async def handler(session: aiosocketproto.AsyncSocketClient):
+            sessions.put_nowait(session)
+            await session.protocol.closed
+
+        self.server = await aiosocketproto.start_memory_server('flow', handler, receive_queue_size=RECEIVE_QUEUE_SIZE)
+        self.client = await aiosocketproto.connect_memory('flow', window_size=WINDOW_SIZE, send_queue_size=SEND_QUEUE_SIZE)
+        self.session = await sessions.get()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def stall(self, count: int) -> list:
+        """ Send `count` messages while the session takes none """
+
+        sends = [asyncio.create_task(self.client.send(i=i)) for i in range(count)]
+        await asyncio.sleep(.2)
+        return sends
+
+    async def test_stalled_consumer_stays_bounded(self):
+        sends = await self.stall(200)
+
+        # acknowledges are held back, the window of the client is full and its sends wait
+        self.assertIsNotNone(self.session._receive_blocked_at)
+        self.assertLessEqual(self.session._received_packets.qsize(), RECEIVE_QUEUE_SIZE + WINDOW_SIZE)
+        self.assertEqual(self.client._in_flight, WINDOW_SIZE)
+        self.assertLessEqual(self.client._queue_send.qsize(), SEND_QUEUE_SIZE)
+        self.assertGreater(self.client.flow_stats.send_waits, 0)
+        self.assertFalse(any(send.done() for send in sends[-100:]))
+
+        # nothing is lost once the consumer goes on
+        received = [(await self.session.receive())['i'] for _ in range(200)]
+        self.assertEqual(received, list(range(200)))
+        await asyncio.wait_for(asyncio.gather(*sends), 5)
+        self.assertIsNone(self.session._receive_blocked_at)
+
+    async def test_low_watermark(self):
+        sends = await self.stall(50)
+        self.assertEqual(self.session.flow_stats.receive_pauses, 1)
+
+        # acknowledges are released only below the low watermark of the receive queue
+        received = []
+        while self.session._received_packets.qsize() >= RECEIVE_QUEUE_SIZE * self.session.LOW_WATERMARK:
+            self.assertIsNotNone(self.session._receive_blocked_at)
+            received.append((await self.session.receive())['i'])
+        self.assertIsNone(self.session._receive_blocked_at)
+
+        while len(received) < 50:
+            received.append((await self.session.receive())['i'])
+        self.assertEqual(received, list(range(50)))
+        await asyncio.wait_for(asyncio.gather(*sends), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import struct
+import unittest
+
+from aiosocketproto.client.frame import pack_attachments_table, split_attachments
+
+
+class AttachmentsTableTest(unittest.TestCase):
+    """ Data frame bodies with attachments """
+
+    def test_split(self):
+        attachments = [memoryview(b'abc'), memoryview(b''), memoryview(b'defgh')]
+        body = memoryview(pack_attachments_table(attachments) + b'payload' + b'abcdefgh')
+        payload, views = split_attachments(body)
+        self.assertEqual(bytes(payload), b'payload')
+        self.assertEqual([bytes(view) for view in views], [b'abc', b'', b'defgh'])
+
+    def test_malformed(self):
+        for body in (
+            b'\x00',
+            struct.pack('!H', 3) + b'\x00\x00\x00\x01',
+            struct.pack('!HI', 1, 100) + b'payload',
+            struct.pack('!HII', 2, 2 ** 32 - 1, 2 ** 32 - 1),
+        ):
+            with self.subTest(body=body), self.assertRaisesRegex(ConnectionError, 'malformed attachments table'):
+                split_attachments(memoryview(body))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import logging
+import unittest
+
+from aiosocketproto.client.log import SessionLogger
+
+
+class SessionLoggerTest(unittest.TestCase):
+
+    def test_levels(self):
+        debug, session = SessionLogger(True), SessionLogger(False)
+        with self.assertLogs('aiosocketproto', logging.DEBUG) as logs:
+            debug.debug('frame %d', 1)
+            session.error('failed')
+        self.assertEqual([record.getMessage() for record in logs.records], [f'[{debug.extra["session"]:x}] frame 1', f'[{session.extra["session"]:x}] failed'])
+
+    def test_disabled(self):
+        logging.disable(logging.CRITICAL)
+        try:
+            with self.assertNoLogs('aiosocketproto'):
+                SessionLogger(True).error('not logged')
+                SessionLogger(False).error('not logged')
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+
+
+class OffloadTest(unittest.IsolatedAsyncioTestCase):
+    """ Messages encoded in an executor """
+
+    async def test_process_pool_keeps_no_connection_open(self):
+        ended = asyncio.get_running_loop().create_future()
+
+        async def handler(session: aiosocketproto.AsyncSocketClient):
+            await session.receive()
+            await session.protocol.closed
+            ended.set_result(None)
+
+        server = await aiosocketproto.start_server(range(9950, 9990), handler)
+        client = await aiosocketproto.connect('127.0.0.1', server.port, offload_threshold=1000, offload_executor='process')
+        try:
+            await client.send(data='x' * 100_000)
+            await client.close()
+            # a pool process started by the send does not hold the socket of the client
+            await asyncio.wait_for(ended, 2)
+        finally:
+            await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+
+
+async def wait_closed(session: aiosocketproto.AsyncSocketClient):
+    await session.protocol.closed
+
+
+async def until(condition, timeout: float = 3):
+    """ Wait for `condition()` to be true """
+
+    async def poll():
+        while not condition():
+            await asyncio.sleep(.02)
+    await asyncio.wait_for(poll(), timeout)
+
+
+class PoolTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await aiosocketproto.start_server(range(9950, 9990), wait_closed)
+        self.server.add_handler('echo', lambda session, value: value)
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    def pool(self, **options) -> aiosocketproto.AsyncSocketClientPool:
+        pool = aiosocketproto.AsyncSocketClientPool(('127.0.0.1', self.server.port), **options)
+        pool.HEALTH_INTERVAL = .05
+        return pool
+
+    async def test_least_busy(self):
+        async with self.pool(min_size=2, max_size=2) as pool:
+            first = await pool.acquire()
+            second = await pool.acquire()
+            self.assertIsNot(first, second)
+
+            pool.release(second)
+            self.assertIs(await pool.acquire(), second)
+
+    async def test_grows_when_busy(self):
+        async with self.pool(min_size=1, max_size=2) as pool:
+            first = await pool.acquire()
+            # every connection is busy, the next one is opened in the background
+            self.assertIs(await pool.acquire(), first)
+            await until(lambda: pool.size == 2)
+            self.assertIsNot(await pool.acquire(), first)
+            self.assertEqual(await pool.call('echo', value=1), 1)
+
+    async def test_evicts_lost(self):
+        async with self.pool(min_size=1, max_size=1) as pool:
+            lost = pool.connections[0]
+            next(iter(self.server.sessions)).transport.abort()
+
+            await until(lambda: pool.connections and pool.connections[0] is not lost and pool.connections[0].is_connected)
+            self.assertEqual(pool.stats.evicted, 1)
+            self.assertEqual(await pool.call('echo', value=2), 2)
+            await until(lambda: not pool._close_tasks)
+
+    async def test_closes_idle(self):
+        pool = self.pool(min_size=1, max_size=3)
+        pool.IDLE_TIMEOUT = .1
+        async with pool:
+            # every acquire of a busy connection opens one more
+            clients = [await pool.acquire()]
+            while pool.size < 3:
+                await asyncio.sleep(.02)
+                clients.append(await pool.acquire())
+            for client in clients:
+                pool.release(client)
+            clients = set(clients)
+
+            await until(lambda: pool.size == 1 and not pool._close_tasks)
+            self.assertEqual(pool.stats.closed_idle, 2)
+            self.assertEqual(sum(not client.is_connected for client in clients), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
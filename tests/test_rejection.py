@@ -0,0 +1,37 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+
+
+async def wait_closed(session: aiosocketproto.AsyncSocketClient):
+    await session.protocol.closed
+
+
+class RejectionTest(unittest.IsolatedAsyncioTestCase):
+    """ A connection the server does not serve fails with the reason """
+
+    async def test_server_full(self):
+        server = await aiosocketproto.start_memory_server('rejection', wait_closed, max_connections=1)
+        client = await aiosocketproto.connect_memory('rejection')
+        try:
+            with self.assertRaisesRegex(ConnectionRefusedError, 'server is full'):
+                await aiosocketproto.connect_memory('rejection')
+            self.assertEqual(server.sessions.rejected, 1)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_connections_per_ip(self):
+        server = await aiosocketproto.start_server(range(9950, 9990), wait_closed, max_connections_per_ip=1)
+        client = await aiosocketproto.connect('127.0.0.1', server.port)
+        try:
+            with self.assertRaisesRegex(ConnectionRefusedError, 'too many connections'):
+                await asyncio.wait_for(aiosocketproto.connect('127.0.0.1', server.port), 5)
+        finally:
+            await client.close()
+            await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+
+
+async def echo(session: aiosocketproto.AsyncSocketClient):
+    while True:
+        await session.send(**await session.receive())
+
+
+class ResumeTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_send_on_closing_connection(self):
+        server = await aiosocketproto.start_server(range(9950, 9990), echo, resume_timeout=3)
+        client = await aiosocketproto.connect('127.0.0.1', server.port, resume_timeout=3)
+        try:
+            client.transport.abort()
+            while not client.protocol.is_closed:
+                await asyncio.sleep(0)
+            # the connection is over, the session is not suspended yet: the frame is written again after the resume
+            self.assertFalse(client._suspended)
+            await client.send(i=1)
+            self.assertEqual(await asyncio.wait_for(client.receive(), 2), {'i': 1})
+            self.assertEqual(client.resume_stats.resumed, 1)
+        finally:
+            await client.close()
+            await server.close()
+
+
+class ResumeLimitTest(unittest.IsolatedAsyncioTestCase):
+    """ A session holds its place in the connection limits of the server while it waits to be resumed """
+
+    async def check(self, server: aiosocketproto.AsyncSocketServer, client: aiosocketproto.AsyncSocketClient, connect):
+        try:
+            await client.send(i=1)
+            self.assertEqual(await client.receive(), {'i': 1})
+            client.transport.abort()
+
+            await client.send(i=2)
+            self.assertEqual(await asyncio.wait_for(client.receive(), 2), {'i': 2})
+            self.assertEqual(client.resume_stats.resumed, 1)
+            self.assertEqual(server.sessions.rejected, 0)
+
+            # another connection is still over the limit
+            with self.assertRaises(ConnectionRefusedError):
+                await asyncio.wait_for(connect(), 5)
+            self.assertEqual(server.sessions.rejected, 1)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_max_connections(self):
+        server = await aiosocketproto.start_memory_server('resume-limit', echo, max_connections=1, resume_timeout=3)
+        connect = lambda: aiosocketproto.connect_memory('resume-limit', resume_timeout=3)
+        await self.check(server, await connect(), connect)
+
+    async def test_max_connections_per_ip(self):
+        server = await aiosocketproto.start_server(range(9950, 9990), echo, max_connections_per_ip=1, resume_timeout=3)
+        connect = lambda: aiosocketproto.connect('127.0.0.1', server.port, resume_timeout=3)
+        await self.check(server, await connect(), connect)
+
+    async def test_queued(self):
+        server = await aiosocketproto.start_memory_server(
+            'resume-queue', echo, max_connections=1, overflow='queue', queue_timeout=0.5, resume_timeout=3
+        )
+        connect = lambda: aiosocketproto.connect_memory('resume-queue', resume_timeout=3)
+        await self.check(server, await connect(), connect)
+
+
+if __name__ == '__main__':
+    unittest.main()
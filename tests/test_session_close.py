@@ -0,0 +1,37 @@
+import unittest
+
+import aiosocketproto
+
+
+async def receive_and_return(session: aiosocketproto.AsyncSocketClient):
+    await session.send(a=1)
+    await session.receive()
+
+
+class SessionCloseTest(unittest.IsolatedAsyncioTestCase):
+    """ A session closed right after it took a message still acknowledges it """
+
+    async def check(self, server: aiosocketproto.AsyncSocketServer, client: aiosocketproto.AsyncSocketClient):
+        try:
+            self.assertEqual(await client.receive(), {'a': 1})
+            # the handler returns as soon as it has the message, the send must not fail
+            await client.send(b=2)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_tcp(self):
+        for _ in range(5):
+            server = await aiosocketproto.start_server(range(9950, 9990), receive_and_return)
+            client = await aiosocketproto.connect('127.0.0.1', server.port)
+            await self.check(server, client)
+
+    async def test_memory(self):
+        for _ in range(5):
+            server = await aiosocketproto.start_memory_server('session-close', receive_and_return)
+            client = await aiosocketproto.connect_memory('session-close')
+            await self.check(server, client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import aiosocketproto
+from aiosocketproto.client.frame import KIND_ACK, KIND_DATA
+
+
+class Recorder(aiosocketproto.Instrumentation):
+    """ Data frames in flight after every write, acknowledges received """
+
+    def __init__(self):
+        self.in_flight = []
+        self.acks = 0
+
+    def frame_sent(self, session, kind, size, frames):
+        if kind == KIND_DATA:
+            self.in_flight.append(session._in_flight)
+
+    def frame_received(self, session, kind, size):
+        if kind == KIND_ACK:
+            self.acks += 1
+
+
+async def wait_closed(session: aiosocketproto.AsyncSocketClient):
+    await session.protocol.closed
+
+
+class WindowTest(unittest.IsolatedAsyncioTestCase):
+    """ Sliding window of data frames and cumulative acknowledges """
+
+    async def connect(self, server_options: dict, **options) -> aiosocketproto.AsyncSocketClient:
+        self.recorder = Recorder()
+        self.server = await aiosocketproto.start_memory_server('window', wait_closed, **server_options)
+        self.client = await aiosocketproto.connect_memory('window', instrumentation=self.recorder, **options)
+        return self.client
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_window_limits_in_flight(self):
+        client = await self.connect({'ack_delay': .2}, window_size=4)
+        sends = asyncio.gather(*(client.send(i=i) for i in range(20)))
+
+        # nothing is acknowledged before the delay, the rest waits to be written
+        await asyncio.sleep(.05)
+        self.assertEqual(client._in_flight, 4)
+        self.assertEqual(len(self.recorder.in_flight), 4)
+
+        await asyncio.wait_for(sends, 5)
+        self.assertEqual(max(self.recorder.in_flight), 4)
+        self.assertEqual(client.unacknowledged, 0)
+
+    async def test_ack_every(self):
+        client = await self.connect({'ack_delay': 1, 'ack_every': 8})
+
+        # acknowledged at once every 8 frames, long before the delay
+        await asyncio.wait_for(asyncio.gather(*(client.send(i=i) for i in range(16))), .5)
+        self.assertEqual(self.recorder.acks, 2)
+
+    async def test_one_ack_per_read(self):
+        client = await self.connect({})
+
+        # a batch is written at once and read at once, one acknowledge covers it
+        self.assertEqual(await client.send_many([{'i': i} for i in range(16)]), [None] * 16)
+        self.assertEqual(self.recorder.acks, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import unittest
+
+import aiosocketproto
+
+
+async def pid(session: aiosocketproto.AsyncSocketClient):
+    await session.send(pid=os.getpid())
+    await session.protocol.closed
+
+
+class WorkersTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_workers(self):
+        server = await aiosocketproto.start_server(range(9950, 9990), pid, workers=2)
+        try:
+            # the sessions are served by the workers, not by this process
+            with self.assertRaises(RuntimeError):
+                server.broadcast(a=1)
+            with self.assertRaises(RuntimeError):
+                server.publish('topic', a=1)
+
+            client = await asyncio.wait_for(self.connect(server.port), 20)
+            self.assertNotEqual((await client.receive())['pid'], os.getpid())
+            await client.close()
+
+            # a crashed worker is started again
+            process = server._processes[0]
+            process.kill()
+            await asyncio.wait_for(self.restarted(server, process), 10)
+        finally:
+            await server.close()
+        self.assertFalse(any(process.is_alive() for process in server._processes.values()))
+
+    async def connect(self, port: int) -> aiosocketproto.AsyncSocketClient:
+        # the workers are started in the background
+        while True:
+            try:
+                return await aiosocketproto.connect('127.0.0.1', port)
+            except OSError:
+                await asyncio.sleep(.1)
+
+    async def restarted(self, server: aiosocketproto.AsyncSocketServer, process):
+        while server._processes[0] is process or not server._processes[0].is_alive():
+            await asyncio.sleep(.05)
+
+
+if __name__ == '__main__':
+    unittest.main()